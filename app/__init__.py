@@ -12,24 +12,43 @@ migrate = Migrate()
 # login_manager = LoginManager() # Убираем Flask-Login
 
 
-def create_app():
+def create_app(config_object=None):
     app = Flask(__name__)
-    app.config['SECRET_KEY'] = 'your_secret_key_here'
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///db.sqlite3'
-    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-    app.config['UPLOAD_FOLDER'] = 'app/static/uploads/student_photos'
-    app.config['ALLOWED_EXTENSIONS'] = {'png', 'jpg', 'jpeg'}
-    app.config['MAX_CONTENT_LENGTH'] = 32 * 1024 * 1024  # 32 MB
+    # Конфигурация: класс из app.config (по умолчанию выбирается через APP_CONFIG)
+    # или словарь с переопределениями поверх него
+    from .config import get_config
+    if config_object is None or isinstance(config_object, str):
+        app.config.from_object(get_config(config_object))
+    elif isinstance(config_object, dict):
+        app.config.from_object(get_config())
+        app.config.from_mapping(config_object)
+    else:
+        app.config.from_object(config_object)
 
     # Ensure the upload folder exists
     if not os.path.exists(app.config['UPLOAD_FOLDER']):
         os.makedirs(app.config['UPLOAD_FOLDER'])
 
     db.init_app(app)
-    migrate.init_app(app, db)
+    from .database import include_object
+    migrate.init_app(app, db, include_object=include_object)
+
+    from .database import configure_engine
+    configure_engine(app, db)
+
+    from .instrumentation import init_instrumentation
+    init_instrumentation(app, db)
+
+    from .cache import cache
+    cache.init_app(app)
+
+    from .assets import init_assets # Отпечатки статических файлов, сжатие ответов, кеш шаблонов
+    init_assets(app)
     # login_manager.init_app(app) # Убираем Flask-Login
 
     from . import models  # Импорт моделей после инициализации расширений
+    from .counters import register_counter_events
+    register_counter_events(db.session)
     # from .auth import bp as auth_bp # Убираем импорт auth blueprint
     # app.register_blueprint(auth_bp) # Убираем регистрацию auth blueprint
 
@@ -52,6 +71,27 @@ def create_app():
     from .routes.export_import import export_import_bp
     app.register_blueprint(export_import_bp)
 
+    from .routes.photos import photos_bp
+    app.register_blueprint(photos_bp)
+
+    from .routes.api import api_bp # JSON API для интеграций
+    app.register_blueprint(api_bp)
+
+    from .routes.jobs import jobs_bp # Статус и результаты фоновых задач
+    app.register_blueprint(jobs_bp)
+    from .jobs import init_jobs
+    init_jobs(app)
+
+    from .cli import register_commands
+    register_commands(app)
+
+    if app.config.get('ACADEMIC_AUTO_ROLLOVER'):
+        from .academic import ensure_rollover
+
+        @app.before_request
+        def academic_rollover():
+            ensure_rollover(db.session)
+
     @app.context_processor
     def inject_current_year():
         return {'current_year': datetime.datetime.utcnow().year}
@@ -0,0 +1,96 @@
+import datetime
+import threading
+
+from flask import current_app
+from sqlalchemy import case, literal, update
+
+from app.cache import cache
+from app.models import Group
+
+# Учебный календарь: текущий учебный год определяется по дате и месяцу начала
+# учебного года (ACADEMIC_YEAR_START_MONTH) либо задается явно (ACADEMIC_YEAR).
+# Курс и статус групп хранятся в Group.course/Group.status и пересчитываются
+# одним UPDATE при смене учебного года (flask rollover), а не при каждом запросе.
+
+STATUS_STUDYING = "Учится"
+STATUS_GRADUATED = "Выпущена"
+
+group_table = Group.__table__
+
+
+def current_academic_year(today=None):
+    fixed_year = current_app.config.get('ACADEMIC_YEAR')
+    if fixed_year:
+        return fixed_year
+    today = today or datetime.date.today()
+    start_month = current_app.config.get('ACADEMIC_YEAR_START_MONTH', 9)
+    return today.year if today.month >= start_month else today.year - 1
+
+
+def compute_course(year, duration, academic_year):
+    # (учебный год - год поступления + 1), ограниченное [1, duration]
+    return min(max(academic_year - year + 1, 1), duration)
+
+
+def compute_status(year, duration, academic_year):
+    return STATUS_GRADUATED if academic_year - year + 1 > duration else STATUS_STUDYING
+
+
+def course_expr(academic_year, table=group_table):
+    raw_course = literal(academic_year) - table.c.year + 1
+    return case(
+        (raw_course < 1, 1),
+        (raw_course > table.c.duration, table.c.duration),
+        else_=raw_course
+    )
+
+
+def status_expr(academic_year, table=group_table):
+    raw_course = literal(academic_year) - table.c.year + 1
+    return case((raw_course > table.c.duration, STATUS_GRADUATED), else_=STATUS_STUDYING)
+
+
+# Размер пачки id групп в rollover(group_ids=...) — ограничение числа параметров запроса
+ROLLOVER_CHUNK_SIZE = 500
+
+
+def rollover(connection, academic_year, group_ids=None):
+    # Один UPDATE на все группы (или на группы group_ids — пачками); строки, где курс
+    # и статус уже верные, не трогаются. Возвращает число измененных групп.
+    course, status = course_expr(academic_year), status_expr(academic_year)
+    statement = (
+        update(group_table)
+        .where((group_table.c.course != course) | (group_table.c.status.is_distinct_from(status)))
+        .values(course=course, status=status)
+    )
+    if group_ids is None:
+        return connection.execute(statement).rowcount
+    group_ids = list(group_ids)
+    changed = 0
+    for start in range(0, len(group_ids), ROLLOVER_CHUNK_SIZE):
+        chunk = group_ids[start:start + ROLLOVER_CHUNK_SIZE]
+        changed += connection.execute(statement.where(group_table.c.id.in_(chunk))).rowcount
+    return changed
+
+
+# Год, до которого уже выполнен rollover в этом процессе (для автоматического перехода)
+_applied_year = None
+_applied_lock = threading.Lock()
+
+
+def ensure_rollover(session):
+    # Вызывается перед запросом: при смене учебного года (в сентябре) или первом
+    # запросе процесса выполняет rollover. В остальное время — только сравнение чисел.
+    global _applied_year
+    academic_year = current_academic_year()
+    if _applied_year == academic_year:
+        return 0
+    with _applied_lock:
+        if _applied_year == academic_year:
+            return 0
+        changed = rollover(session.connection(), academic_year)
+        session.commit()
+        _applied_year = academic_year
+    if changed:
+        cache.clear()
+    return changed
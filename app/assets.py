@@ -0,0 +1,198 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+import threading
+
+from flask import abort, current_app, request, send_from_directory
+from jinja2 import FileSystemBytecodeCache
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:  # brotli не установлен — только gzip
+    brotli = None
+
+# Статические файлы с отпечатком: url_for('static', filename='css/app.css') дает
+# /static/css/app.<хеш содержимого>.css. Такой URL отдается с Cache-Control
+# immutable на год — после изменения файла меняется и URL. Предсжатые копии
+# (<файл>.br, <файл>.gz) создаются при развертывании командой flask assets-build
+# и отдаются вместо исходного файла, если браузер принимает это сжатие.
+# Здесь же — сжатие динамических ответов и кеш байткода шаблонов Jinja.
+
+ASSET_HASH_LENGTH = 12
+FINGERPRINTED_RE = re.compile(r'^(?P<base>.+)\.(?P<hash>[0-9a-f]{%d})(?P<ext>\.[^./]+)$' % ASSET_HASH_LENGTH)
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+# Кодировка -> расширение предсжатой копии, в порядке предпочтения
+PRECOMPRESSED = (('br', '.br'), ('gzip', '.gz'))
+# Что имеет смысл сжимать: картинки и шрифты уже сжаты
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.mjs', '.json', '.svg', '.txt', '.map', '.html')
+COMPRESSIBLE_MIMETYPES = {
+    'text/html', 'text/plain', 'text/css', 'text/csv', 'application/json', 'application/javascript',
+    'text/javascript', 'image/svg+xml', 'application/xml',
+}
+
+_hashes = {}
+_hashes_lock = threading.Lock()
+
+
+def _static_path(filename):
+    path = safe_join(current_app.static_folder, filename)
+    return path if path is not None and os.path.isfile(path) else None
+
+
+def _is_upload(path):
+    # Загруженные фото лежат в static, но отдаются через /photos
+    upload_folder = os.path.abspath(current_app.config['UPLOAD_FOLDER'])
+    return os.path.abspath(path).startswith(upload_folder + os.sep)
+
+
+def asset_hash(filename):
+    # Хеш содержимого файла из static; пересчитывается только при изменении файла
+    path = _static_path(filename)
+    if path is None or _is_upload(path):
+        return None
+    stat = os.stat(path)
+    key = (path, stat.st_mtime_ns, stat.st_size)
+    digest = _hashes.get(key)
+    if digest is None:
+        with open(path, 'rb') as f:
+            digest = hashlib.sha256(f.read()).hexdigest()[:ASSET_HASH_LENGTH]
+        with _hashes_lock:
+            _hashes[key] = digest
+    return digest
+
+
+def fingerprinted_name(filename):
+    digest = asset_hash(filename)
+    if digest is None:
+        return filename
+    base, extension = os.path.splitext(filename)
+    return f'{base}.{digest}{extension}'
+
+
+def _accepts(encoding):
+    return request.accept_encodings.quality(encoding) > 0
+
+
+def send_asset(filename):
+    # Замена стандартного обработчика /static/<filename>
+    immutable = False
+    match = FINGERPRINTED_RE.match(filename)
+    if match:
+        original = match['base'] + match['ext']
+        if asset_hash(original) is not None:
+            # Старый хеш (страница закеширована до развертывания) — отдается текущий
+            # файл, но без долгого кеширования
+            immutable = asset_hash(original) == match['hash']
+            filename = original
+    path = _static_path(filename)
+    if path is None:
+        abort(404)
+
+    max_age = IMMUTABLE_MAX_AGE if immutable else current_app.get_send_file_max_age(filename)
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    encoding = next((encoding for encoding, suffix in PRECOMPRESSED
+                     if os.path.isfile(path + suffix) and _accepts(encoding)), None)
+    if encoding is not None:
+        response = send_from_directory(current_app.static_folder, filename + dict(PRECOMPRESSED)[encoding],
+                                       mimetype=mimetype, max_age=max_age)
+        response.headers['Content-Encoding'] = encoding
+    else:
+        response = send_from_directory(current_app.static_folder, filename, mimetype=mimetype, max_age=max_age)
+    if filename.endswith(COMPRESSIBLE_EXTENSIONS):
+        response.vary.add('Accept-Encoding')
+    if immutable:
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+    return response
+
+
+def build_assets(static_folder, upload_folder):
+    # Предсжатые копии статических файлов (flask assets-build). Возвращает список
+    # обработанных файлов относительно static_folder.
+    built = []
+    upload_folder = os.path.abspath(upload_folder)
+    for root, _, files in os.walk(static_folder):
+        if os.path.abspath(root) == upload_folder or os.path.abspath(root).startswith(upload_folder + os.sep):
+            continue
+        for name in files:
+            if not name.endswith(COMPRESSIBLE_EXTENSIONS):
+                continue
+            path = os.path.join(root, name)
+            with open(path, 'rb') as f:
+                data = f.read()
+            variants = {'.gz': gzip.compress(data, compresslevel=9, mtime=0)}
+            if brotli is not None:
+                variants['.br'] = brotli.compress(data, quality=11)
+            for suffix, compressed in variants.items():
+                # Сжатая копия не нужна, если она не меньше исходного файла
+                if len(compressed) < len(data):
+                    with open(path + suffix, 'wb') as f:
+                        f.write(compressed)
+                elif os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+            built.append(os.path.relpath(path, static_folder))
+    return sorted(built)
+
+
+def compile_templates(app):
+    # Компилирует все шаблоны заранее, чтобы заполнить кеш байткода. Возвращает их число.
+    names = app.jinja_env.list_templates(extensions=('html',))
+    for name in names:
+        app.jinja_env.get_template(name)
+    return len(names)
+
+
+def compress_response(response, min_size, level=6, brotli_quality=4):
+    # Сжимает тело ответа, если браузер принимает gzip или br. Потоковые ответы и
+    # файлы (send_file) не трогает: файлы сжаты заранее или уже сжаты по формату
+    if (response.direct_passthrough or response.is_streamed or response.status_code != 200
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+    data = response.get_data()
+    if len(data) < min_size:
+        return response
+    if brotli is not None and _accepts('br'):
+        response.set_data(brotli.compress(data, quality=brotli_quality))
+        response.headers['Content-Encoding'] = 'br'
+    elif _accepts('gzip'):
+        response.set_data(gzip.compress(data, compresslevel=level, mtime=0))
+        response.headers['Content-Encoding'] = 'gzip'
+    else:
+        response.vary.add('Accept-Encoding')
+        return response
+    response.vary.add('Accept-Encoding')
+    # Сжатое тело — другое представление: ETag становится слабым (W/"..."),
+    # If-None-Match по-прежнему дает 304
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+def init_assets(app):
+    if app.config.get('JINJA_BYTECODE_CACHE', True):
+        directory = app.config.get('JINJA_CACHE_DIR') or os.path.join(app.instance_path, 'jinja_cache')
+        os.makedirs(directory, exist_ok=True)
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(directory)
+
+    if app.config.get('ASSETS_FINGERPRINT', True):
+        app.view_functions['static'] = send_asset
+
+        @app.url_defaults
+        def fingerprint_static_url(endpoint, values):
+            if endpoint == 'static' and 'filename' in values:
+                values['filename'] = fingerprinted_name(values['filename'])
+
+    if app.config.get('COMPRESS_ENABLED', True):
+        min_size = app.config.get('COMPRESS_MIN_SIZE', 1024)
+        level = app.config.get('COMPRESS_LEVEL', 6)
+        brotli_quality = app.config.get('COMPRESS_BROTLI_QUALITY', 4)
+
+        @app.after_request
+        def compress(response):
+            return compress_response(response, min_size, level, brotli_quality)
@@ -0,0 +1,114 @@
+import datetime
+
+from sqlalchemy import select, update
+
+from app import db
+from app.counters import recount_counters
+from app.deletion import delete_groups
+from app.models import Group, Student
+
+# Массовые операции над студентами: перевод в другую группу, слияние групп и
+# изменение поля у набора студентов. Каждая выполняется одним UPDATE, счетчики
+# затронутых групп и факультетов пересчитываются один раз на пакет. commit и
+# сброс кеша (app.cache.invalidate_groups) — на вызывающем коде.
+# Ошибки входных данных — ValueError с текстом для пользователя.
+
+group_table = Group.__table__
+student_table = Student.__table__
+
+
+def _parse_date(value):
+    try:
+        return datetime.datetime.strptime(value.strip(), '%Y-%m-%d').date()
+    except ValueError:
+        raise ValueError('Неверный формат даты. Используйте ГГГГ-ММ-ДД.')
+
+
+def _parse_text(value):
+    value = value.strip()
+    if not value:
+        raise ValueError('Значение не может быть пустым.')
+    return value
+
+
+# Поля, которые можно изменить сразу у нескольких студентов: поле -> (название, разбор значения).
+# ФИО и email у каждого студента свои, группа меняется переводом (transfer_students)
+BULK_EDIT_FIELDS = {
+    'date_of_birth': ('Дата рождения', _parse_date),
+    'phone_number': ('Номер телефона', _parse_text),
+}
+
+
+class BulkResult:
+    def __init__(self, updated, groups):
+        self.updated = updated
+        # Затронутые группы и их факультеты — для сброса кеша страниц
+        self.group_ids = {group_id for group_id, _ in groups}
+        self.faculty_ids = {faculty_id for _, faculty_id in groups}
+
+
+def _student_ids(student_ids):
+    try:
+        ids = sorted({int(student_id) for student_id in student_ids})
+    except (TypeError, ValueError):
+        raise ValueError('Неверный список студентов.')
+    if not ids:
+        raise ValueError('Не выбран ни один студент.')
+    return ids
+
+
+def _student_groups(condition):
+    # (id группы, id факультета) для студентов, удовлетворяющих условию
+    return set(db.session.execute(
+        select(group_table.c.id, group_table.c.faculty_id).distinct()
+        .join(student_table, student_table.c.group_id == group_table.c.id)
+        .where(condition)
+    ).tuples())
+
+
+def _get_group(group_id, message):
+    group = db.session.execute(
+        select(group_table.c.id, group_table.c.faculty_id).where(group_table.c.id == group_id)
+    ).one_or_none()
+    if group is None:
+        raise ValueError(message)
+    return tuple(group)
+
+
+def transfer_students(student_ids, target_group_id):
+    # Перевод выбранных студентов в группу target_group_id
+    ids = _student_ids(student_ids)
+    target = _get_group(target_group_id, 'Группа для перевода не найдена.')
+    moving = student_table.c.id.in_(ids) & (student_table.c.group_id != target[0])
+    groups = _student_groups(moving)
+    updated = db.session.execute(update(student_table).where(moving).values(group_id=target[0])).rowcount
+    if updated:
+        groups.add(target)
+        recount_counters(db.session.connection(), group_ids={group_id for group_id, _ in groups})
+    return BulkResult(updated, groups)
+
+
+def merge_groups(source_group_id, target_group_id):
+    # Все студенты группы source переводятся в target, группа source удаляется
+    source = _get_group(source_group_id, 'Группа не найдена.')
+    target = _get_group(target_group_id, 'Группа для объединения не найдена.')
+    if source == target:
+        raise ValueError('Группу нельзя объединить саму с собой.')
+    updated = db.session.execute(
+        update(student_table).where(student_table.c.group_id == source[0]).values(group_id=target[0])
+    ).rowcount
+    delete_groups([source[0]])
+    recount_counters(db.session.connection(), group_ids={target[0]})
+    return BulkResult(updated, {source, target})
+
+
+def bulk_update_students(student_ids, field, value):
+    # Одно и то же значение поля field у выбранных студентов
+    if field not in BULK_EDIT_FIELDS:
+        raise ValueError('Это поле нельзя изменить у нескольких студентов сразу.')
+    ids = _student_ids(student_ids)
+    value = BULK_EDIT_FIELDS[field][1](value or '')
+    selected = student_table.c.id.in_(ids)
+    groups = _student_groups(selected)
+    updated = db.session.execute(update(student_table).where(selected).values({field: value})).rowcount
+    return BulkResult(updated, groups)
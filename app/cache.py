@@ -0,0 +1,285 @@
+import functools
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from flask import Response, current_app, request, session
+
+# Кеш отрендеренных страниц списков. Ключ — маршрут + параметры URL +
+# версии тегов, от которых зависит страница (например 'faculty:3').
+# Инвалидация не ищет ключи, а меняет версию тега: старые записи больше
+# не находятся и вытесняются по LRU/TTL.
+
+# Параметры строки запроса, влияющие на содержимое списков, и их значения
+# по умолчанию (такие значения равносильны отсутствию параметра)
+CACHED_QUERY_ARGS = {
+    'search_query': '',
+    'sort_by': 'default',
+    'order': 'asc',
+    'page': '1',
+    'after': '',
+    'before': '',
+}
+
+# Тег, от которого зависят все страницы (сброс всего кеша)
+ALL_TAG = 'all'
+
+
+class NullCache:
+    def get(self, key):
+        return None
+
+    def set(self, key, value, ttl=None):
+        pass
+
+    def get_tag_version(self, tag):
+        return '0'
+
+    def bump_tag(self, tag):
+        pass
+
+
+class MemoryCache:
+    # LRU с TTL в памяти процесса. Версии тегов хранятся отдельно и не вытесняются,
+    # иначе вытесненный тег "вернул" бы устаревшие страницы.
+    # Каждый рабочий процесс имеет свой кеш: инвалидация в одном процессе не видна
+    # другим, поэтому при нескольких процессах (WEB_CONCURRENCY > 1) он не
+    # используется — нужен filesystem или redis.
+
+    def __init__(self, max_entries=512, default_ttl=60):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self._entries = OrderedDict()
+        self._tags = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at is not None and expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.default_ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_tag_version(self, tag):
+        return self._tags.get(tag, '0')
+
+    def bump_tag(self, tag):
+        with self._lock:
+            self._tags[tag] = uuid.uuid4().hex
+
+
+class FileSystemCache:
+    # Общий для всех процессов кеш в каталоге; каждая запись — отдельный файл
+
+    def __init__(self, directory, default_ttl=300):
+        self.directory = directory
+        self.default_ttl = default_ttl
+        os.makedirs(os.path.join(directory, 'tags'), exist_ok=True)
+
+    def _path(self, key, kind='entries'):
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, kind, digest[:2], digest)
+
+    def _write(self, path, payload):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Запись через временный файл + os.replace, чтобы читатель не увидел половину файла
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(fd, 'wb') as f:
+            f.write(payload)
+        os.replace(tmp_path, path)
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                expires_at, value = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+        if expires_at is not None and expires_at < time.time():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        return value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.default_ttl if ttl is None else ttl
+        expires_at = time.time() + ttl if ttl else None
+        self._write(self._path(key), pickle.dumps((expires_at, value), pickle.HIGHEST_PROTOCOL))
+
+    def get_tag_version(self, tag):
+        try:
+            with open(self._path(tag, 'tags'), 'r', encoding='ascii') as f:
+                return f.read() or '0'
+        except OSError:
+            return '0'
+
+    def bump_tag(self, tag):
+        self._write(self._path(tag, 'tags'), uuid.uuid4().hex.encode('ascii'))
+
+
+class RedisCache:
+    # Redis (или совместимый сервер: KeyDB, Valkey); нужен пакет redis
+
+    def __init__(self, url, default_ttl=300, prefix='students-cache:'):
+        import redis
+        self.client = redis.Redis.from_url(url)
+        self.default_ttl = default_ttl
+        self.prefix = prefix
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        return pickle.loads(value) if value is not None else None
+
+    def set(self, key, value, ttl=None):
+        ttl = self.default_ttl if ttl is None else ttl
+        self.client.set(self.prefix + key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), ex=ttl or None)
+
+    def get_tag_version(self, tag):
+        value = self.client.get(self.prefix + 'tag:' + tag)
+        return value.decode('ascii') if value is not None else '0'
+
+    def bump_tag(self, tag):
+        self.client.incr(self.prefix + 'tag:' + tag)
+
+
+class ResponseCache:
+    def __init__(self, app=None):
+        self.backend = NullCache()
+        self.hits = 0
+        self.misses = 0
+        self._stats_lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        cache_type = app.config.get('CACHE_TYPE', 'memory')
+        ttl = app.config.get('CACHE_DEFAULT_TTL', 60)
+        if cache_type == 'memory':
+            workers = os.environ.get('WEB_CONCURRENCY')
+            if workers and workers.isdigit() and int(workers) > 1:
+                raise ValueError(f'CACHE_TYPE=memory не подходит для нескольких процессов '
+                                 f'(WEB_CONCURRENCY={workers}): используйте filesystem или redis')
+            self.backend = MemoryCache(app.config.get('CACHE_MAX_ENTRIES', 512), ttl)
+        elif cache_type == 'filesystem':
+            directory = app.config.get('CACHE_DIR') or os.path.join(app.instance_path, 'cache')
+            self.backend = FileSystemCache(directory, ttl)
+        elif cache_type == 'redis':
+            self.backend = RedisCache(app.config.get('CACHE_REDIS_URL', 'redis://localhost:6379/0'), ttl)
+        elif cache_type in ('null', None):
+            self.backend = NullCache()
+        else:
+            raise ValueError(f'Неизвестный CACHE_TYPE: {cache_type}')
+        app.extensions['response_cache'] = self
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'backend': type(self.backend).__name__,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / total, 4) if total else 0.0,
+        }
+
+    def _count(self, hit):
+        with self._stats_lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def invalidate(self, *tags):
+        for tag in tags:
+            self.backend.bump_tag(tag)
+
+    def clear(self):
+        self.backend.bump_tag(ALL_TAG)
+
+    def _make_key(self, tags):
+        view_args = sorted((request.view_args or {}).items())
+        query_args = []
+        for name, default in CACHED_QUERY_ARGS.items():
+            value = request.args.get(name, '').strip()
+            if value and value != default:
+                query_args.append((name, value))
+        versions = [(tag, self.backend.get_tag_version(tag)) for tag in (ALL_TAG, *tags)]
+        raw = repr((request.endpoint, view_args, query_args, versions))
+        return 'view:' + hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+    def cached_view(self, tags=None):
+        # tags(**view_args) -> список тегов, от которых зависит страница
+        def decorator(view):
+            @functools.wraps(view)
+            def wrapper(*args, **kwargs):
+                # Страницы с flash-сообщениями не кешируются и не берутся из кеша
+                if request.method != 'GET' or session.get('_flashes'):
+                    return view(*args, **kwargs)
+                key = self._make_key(tags(**kwargs) if tags else [])
+                cached = self.backend.get(key)
+                if cached is not None:
+                    self._count(hit=True)
+                    body, mimetype = cached
+                    response = Response(body, mimetype=mimetype)
+                    response.headers['X-Cache'] = 'HIT'
+                    return response
+                self._count(hit=False)
+                response = current_app.make_response(view(*args, **kwargs))
+                if response.status_code == 200 and not response.is_streamed:
+                    self.backend.set(key, (response.get_data(), response.mimetype))
+                response.headers['X-Cache'] = 'MISS'
+                return response
+            return wrapper
+        return decorator
+
+
+cache = ResponseCache()
+
+
+# Теги страниц и их инвалидация обработчиками записи
+def faculty_tag(faculty_id):
+    return f'faculty:{faculty_id}'
+
+
+def group_tag(group_id):
+    return f'group:{group_id}'
+
+
+# Названия факультетов показываются в шапке страниц групп и студентов
+FACULTY_NAMES_TAG = 'faculty-names'
+FACULTIES_TAG = 'faculties'
+
+
+def invalidate_faculty(faculty_id, renamed=False):
+    tags = [FACULTIES_TAG, faculty_tag(faculty_id)]
+    if renamed:
+        tags.append(FACULTY_NAMES_TAG)
+    cache.invalidate(*tags)
+
+
+def invalidate_group(faculty_id, group_id):
+    cache.invalidate(FACULTIES_TAG, faculty_tag(faculty_id), group_tag(group_id))
+
+
+def invalidate_groups(faculty_ids, group_ids):
+    # Массовые операции: все затронутые страницы сбрасываются одним вызовом
+    cache.invalidate(FACULTIES_TAG, *map(faculty_tag, faculty_ids), *map(group_tag, group_ids))
@@ -0,0 +1,158 @@
+import datetime
+
+import click
+from sqlalchemy import select
+
+from app import db
+from app.academic import current_academic_year, rollover
+from app.assets import build_assets, compile_templates
+from app.bulk import BULK_EDIT_FIELDS, bulk_update_students, merge_groups, transfer_students
+from app.cache import cache, invalidate_faculty, invalidate_groups
+from app.counters import recount_counters
+from app.group_names import create_groups
+from app.importer import import_workbook
+from app.jobs import cleanup_jobs
+from app.models import DeletedRecord, Faculty, Student
+from app.seed import seed_database
+from app.search import rebuild_search_index
+
+
+def register_commands(app):
+    @app.cli.command('import-excel')
+    @click.argument('path', type=click.Path(exists=True, dir_okay=False))
+    @click.option('--batch-size', default=1000, show_default=True, help='Строк в одной пачке/транзакции.')
+    def import_excel_command(path, batch_size):
+        """Импорт факультетов, групп и студентов из файла формата экспорта."""
+        with open(path, 'rb') as fileobj:
+            report = import_workbook(fileobj, batch_size=batch_size)
+        cache.clear()
+        for sheet, written in report.written.items():
+            click.echo(f'{sheet}: записано {written}, пропущено {report.skipped[sheet]}')
+        for error in report.errors:
+            click.echo(f'{error["sheet"]}, строка {error["row"]}: {error["message"]}', err=True)
+        if not report.ok:
+            raise SystemExit(1)
+
+    @app.cli.command('recount')
+    def recount_command():
+        """Пересчитать счетчики групп и студентов у факультетов и групп."""
+        recount_counters(db.session.connection())
+        db.session.commit()
+        cache.clear()
+        click.echo('Счетчики пересчитаны.')
+
+    @app.cli.command('search-reindex')
+    def search_reindex_command():
+        """Перестроить индекс полнотекстового поиска."""
+        rebuild_search_index(db.session.connection())
+        db.session.commit()
+        click.echo('Индекс поиска перестроен.')
+
+    @app.cli.command('rollover')
+    @click.option('--year', type=int, default=None,
+                  help='Учебный год (по умолчанию — текущий: ACADEMIC_YEAR или по календарю).')
+    def rollover_command(year):
+        """Пересчитать курс и статус всех групп для учебного года."""
+        academic_year = year or current_academic_year()
+        changed = rollover(db.session.connection(), academic_year)
+        db.session.commit()
+        if changed:
+            cache.clear()
+        click.echo(f'Учебный год {academic_year}/{academic_year + 1}: обновлено групп — {changed}.')
+
+    @app.cli.command('create-groups')
+    @click.argument('faculty_id', type=int)
+    @click.argument('year', type=int)
+    @click.option('--count', default=1, show_default=True, help='Сколько групп создать.')
+    @click.option('--duration', default=4, show_default=True, help='Срок обучения, лет.')
+    def create_groups_command(faculty_id, year, count, duration):
+        """Создать набор групп факультета для года поступления."""
+        faculty = db.session.get(Faculty, faculty_id)
+        if faculty is None:
+            raise click.ClickException(f'Факультет с id {faculty_id} не найден.')
+        groups = create_groups(faculty, year, duration, count)
+        db.session.commit()
+        invalidate_faculty(faculty.id)
+        click.echo(f'Создано групп: {len(groups)} ({", ".join(group.name for group in groups)}).')
+
+    @app.cli.command('seed')
+    @click.option('--faculties', default=10, show_default=True, help='Сколько факультетов создать.')
+    @click.option('--groups-per-faculty', default=10, show_default=True, help='Групп на факультет.')
+    @click.option('--students', default=1000, show_default=True, help='Сколько студентов создать.')
+    @click.option('--seed', 'random_seed', default=0, show_default=True, help='Seed генератора случайных чисел.')
+    def seed_command(faculties, groups_per_faculty, students, random_seed):
+        """Заполнить базу синтетическими факультетами, группами и студентами."""
+        created = seed_database(faculties, groups_per_faculty, students, seed=random_seed)
+        cache.clear()
+        click.echo(f'Создано: факультетов — {created["faculties"]}, групп — {created["groups"]}, '
+                   f'студентов — {created["students"]}.')
+
+    @app.cli.command('jobs-cleanup')
+    @click.option('--hours', default=24, show_default=True, help='Удалить завершенные задачи старше N часов.')
+    def jobs_cleanup_command(hours):
+        """Удалить завершенные фоновые задачи и файлы их результатов."""
+        removed = cleanup_jobs(hours * 3600)
+        click.echo(f'Удалено задач: {removed}.')
+
+    @app.cli.command('prune-tombstones')
+    @click.option('--days', default=90, show_default=True, help='Удалить отметки об удалении старше N дней.')
+    def prune_tombstones_command(days):
+        """Удалить старые отметки об удаленных строках (для экспорта ?since=)."""
+        cutoff = datetime.datetime.utcnow() - datetime.timedelta(days=days)
+        removed = DeletedRecord.query.filter(DeletedRecord.deleted_at < cutoff).delete(synchronize_session=False)
+        db.session.commit()
+        click.echo(f'Удалено отметок: {removed}.')
+
+    def _bulk_student_ids(student_ids, from_group):
+        # id из аргументов и/или все студенты группы --from-group
+        ids = set(student_ids)
+        if from_group is not None:
+            ids.update(db.session.scalars(select(Student.id).where(Student.group_id == from_group)))
+        return ids
+
+    def _run_bulk(operation, *args):
+        try:
+            result = operation(*args)
+        except ValueError as error:
+            db.session.rollback()
+            raise click.ClickException(str(error))
+        db.session.commit()
+        invalidate_groups(result.faculty_ids, result.group_ids)
+        return result
+
+    @app.cli.command('transfer-students')
+    @click.argument('target_group_id', type=int)
+    @click.argument('student_ids', type=int, nargs=-1)
+    @click.option('--from-group', type=int, default=None, help='Перевести всех студентов этой группы.')
+    def transfer_students_command(target_group_id, student_ids, from_group):
+        """Перевести студентов в группу TARGET_GROUP_ID одним UPDATE."""
+        result = _run_bulk(transfer_students, _bulk_student_ids(student_ids, from_group), target_group_id)
+        click.echo(f'Переведено студентов: {result.updated}.')
+
+    @app.cli.command('merge-groups')
+    @click.argument('source_group_id', type=int)
+    @click.argument('target_group_id', type=int)
+    def merge_groups_command(source_group_id, target_group_id):
+        """Перевести всех студентов группы SOURCE в TARGET и удалить SOURCE."""
+        result = _run_bulk(merge_groups, source_group_id, target_group_id)
+        click.echo(f'Группа {source_group_id} объединена с {target_group_id}: переведено студентов — {result.updated}.')
+
+    @app.cli.command('bulk-edit-students')
+    @click.argument('field', type=click.Choice(sorted(BULK_EDIT_FIELDS)))
+    @click.argument('value')
+    @click.argument('student_ids', type=int, nargs=-1)
+    @click.option('--from-group', type=int, default=None, help='Изменить у всех студентов этой группы.')
+    def bulk_edit_students_command(field, value, student_ids, from_group):
+        """Задать полю FIELD значение VALUE у выбранных студентов одним UPDATE."""
+        result = _run_bulk(bulk_update_students, _bulk_student_ids(student_ids, from_group), field, value)
+        click.echo(f'Изменено студентов: {result.updated}.')
+
+    @app.cli.command('assets-build')
+    def assets_build_command():
+        """Создать предсжатые копии (.gz, .br) статических файлов и скомпилировать шаблоны."""
+        built = build_assets(app.static_folder, app.config['UPLOAD_FOLDER'])
+        for name in built:
+            click.echo(name)
+        click.echo(f'Сжато файлов: {len(built)}.')
+        if app.jinja_env.bytecode_cache is not None:
+            click.echo(f'Скомпилировано шаблонов: {compile_templates(app)}.')
@@ -0,0 +1,156 @@
+from collections import Counter
+
+from sqlalchemy import bindparam, event, func, inspect, select, update
+from sqlalchemy.orm import configure_mappers
+
+from app.models import Faculty, Group, Student
+
+# Денормализованные счетчики Faculty.num_groups, Faculty.num_students и
+# Group.num_students. После каждого flush сессии к счетчикам затронутых групп и
+# факультетов прибавляются изменения (+1/-1 на студента, ±num_students при переносе
+# или удалении группы) в той же транзакции, поэтому счетчики не расходятся с данными
+# ни при каком откате. Полный пересчет (recount_counters) — для импорта, массовых
+# операций мимо сессии и flask recount.
+
+faculty_table = Faculty.__table__
+group_table = Group.__table__
+student_table = Student.__table__
+
+
+def recount_counters(connection, group_ids=None, faculty_ids=None):
+    # group_ids/faculty_ids = None — пересчитать все строки.
+    # Факультеты затронутых групп пересчитываются автоматически.
+    group_students = select(func.count(student_table.c.id)) \
+        .where(student_table.c.group_id == group_table.c.id).scalar_subquery()
+    group_stmt = update(group_table).values(num_students=group_students)
+
+    faculty_groups = select(func.count(group_table.c.id)) \
+        .where(group_table.c.faculty_id == faculty_table.c.id).scalar_subquery()
+    faculty_students = select(func.count(student_table.c.id)) \
+        .select_from(student_table.join(group_table, student_table.c.group_id == group_table.c.id)) \
+        .where(group_table.c.faculty_id == faculty_table.c.id).scalar_subquery()
+    faculty_stmt = update(faculty_table).values(num_groups=faculty_groups, num_students=faculty_students)
+
+    if group_ids is not None or faculty_ids is not None:
+        group_ids = set(group_ids or ())
+        faculty_ids = set(faculty_ids or ())
+        if not group_ids and not faculty_ids:
+            return
+        group_stmt = group_stmt.where(group_table.c.id.in_(group_ids))
+        faculty_stmt = faculty_stmt.where(
+            faculty_table.c.id.in_(faculty_ids) |
+            faculty_table.c.id.in_(select(group_table.c.faculty_id).where(group_table.c.id.in_(group_ids)))
+        )
+
+    if group_ids is None or group_ids:
+        connection.execute(group_stmt)
+    connection.execute(faculty_stmt)
+
+
+def _old_and_new(obj, column, relationship):
+    # Прежнее и текущее значение внешнего ключа, измененного в этом flush (или None)
+    state = inspect(obj)
+    history = state.attrs[column].history
+    if history.deleted:
+        old = history.deleted[0]
+    else:
+        # Значение задано через связь (student.group = ...): прежний объект — в ее истории
+        related = state.attrs[relationship].history.deleted
+        old = related[0].id if related and related[0] is not None else None
+    new = getattr(obj, column)
+    return (old, new) if old is not None and old != new else None
+
+
+# Изменение счетчиков: группа -> студенты, факультет -> (группы, студенты)
+_group_students = update(group_table).where(group_table.c.id == bindparam('group_id')) \
+    .values(num_students=group_table.c.num_students + bindparam('delta'))
+_faculty_by_group = update(faculty_table) \
+    .where(faculty_table.c.id == select(group_table.c.faculty_id)
+           .where(group_table.c.id == bindparam('group_id')).scalar_subquery()) \
+    .values(num_students=faculty_table.c.num_students + bindparam('delta'))
+_faculty_counts = update(faculty_table).where(faculty_table.c.id == bindparam('faculty_id')) \
+    .values(num_groups=faculty_table.c.num_groups + bindparam('groups_delta'),
+            num_students=faculty_table.c.num_students + bindparam('students_delta'))
+_faculty_moved_group = update(faculty_table).where(faculty_table.c.id == bindparam('faculty_id')) \
+    .values(num_groups=faculty_table.c.num_groups + bindparam('sign'),
+            num_students=faculty_table.c.num_students + bindparam('sign') * (
+                select(group_table.c.num_students).where(group_table.c.id == bindparam('group_id'))
+                .scalar_subquery()))
+
+
+def _before_flush(session, flush_context, instances):
+    # Удаленные в flush строки потом уже не прочитать: группа студента и число
+    # студентов удаляемой группы запоминаются заранее
+    session.info['_counters_deleted'] = [
+        (type(obj), obj.group_id if isinstance(obj, Student) else obj.faculty_id,
+         obj.num_students if isinstance(obj, Group) else 1)
+        for obj in session.deleted if isinstance(obj, (Student, Group))
+    ]
+
+
+def _after_flush(session, flush_context):
+    group_students = Counter()  # группа -> изменение числа студентов
+    faculty_groups, faculty_students = Counter(), Counter()  # факультет -> изменение
+    moved_groups = []  # (группа, прежний факультет, новый факультет)
+
+    for obj in session.new:
+        if isinstance(obj, Student):
+            group_students[obj.group_id] += 1
+        elif isinstance(obj, Group):
+            faculty_groups[obj.faculty_id] += 1
+    for kind, parent_id, students in session.info.pop('_counters_deleted', ()):
+        if kind is Student:
+            group_students[parent_id] -= 1
+        else:
+            faculty_groups[parent_id] -= 1
+            faculty_students[parent_id] -= students
+    for obj in session.dirty:
+        if isinstance(obj, Student):
+            change = _old_and_new(obj, 'group_id', 'group')
+            if change:
+                group_students[change[0]] -= 1
+                group_students[change[1]] += 1
+        elif isinstance(obj, Group):
+            change = _old_and_new(obj, 'faculty_id', 'faculty')
+            if change:
+                moved_groups.append((obj.id, *change))
+
+    connection = session.connection()
+    # Перенос группы — до изменений по студентам: переносится число студентов на
+    # начало flush, а студенты, добавленные в этом flush, попадут в новый факультет
+    for group_id, old_faculty_id, new_faculty_id in moved_groups:
+        connection.execute(_faculty_moved_group, [
+            {'faculty_id': old_faculty_id, 'group_id': group_id, 'sign': -1},
+            {'faculty_id': new_faculty_id, 'group_id': group_id, 'sign': 1},
+        ])
+    faculties = [{'faculty_id': faculty_id, 'groups_delta': faculty_groups[faculty_id],
+                  'students_delta': faculty_students[faculty_id]}
+                 for faculty_id in faculty_groups.keys() | faculty_students.keys()
+                 if faculty_id is not None and (faculty_groups[faculty_id] or faculty_students[faculty_id])]
+    if faculties:
+        connection.execute(_faculty_counts, faculties)
+    groups = [{'group_id': group_id, 'delta': delta}
+              for group_id, delta in group_students.items() if group_id is not None and delta]
+    if groups:
+        connection.execute(_group_students, groups)
+        connection.execute(_faculty_by_group, groups)
+
+
+def _keep_old_value(target, value, oldvalue, initiator):
+    pass
+
+
+# Внешние ключи, при изменении которых переносится счетчик. active_history: прежнее
+# значение загружается при присваивании, даже если объект истек после commit
+_TRACKED_ATTRIBUTES = ((Student, 'group_id'), (Student, 'group'), (Group, 'faculty_id'), (Group, 'faculty'))
+
+
+def register_counter_events(session):
+    configure_mappers()  # связи student.group и group.faculty объявлены через backref
+    for model, name in _TRACKED_ATTRIBUTES:
+        attribute = getattr(model, name)
+        if not event.contains(attribute, 'set', _keep_old_value):
+            event.listen(attribute, 'set', _keep_old_value, active_history=True)
+    if not event.contains(session, 'after_flush', _after_flush):
+        event.listen(session, 'before_flush', _before_flush)
+        event.listen(session, 'after_flush', _after_flush)
@@ -0,0 +1,32 @@
+from sqlalchemy import event
+
+
+def _sqlite_pragma_listener(pragmas):
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                if value is not None:
+                    cursor.execute(f'PRAGMA {name}={value}')
+        finally:
+            cursor.close()
+    return set_sqlite_pragmas
+
+
+def configure_engine(app, db):
+    # Настройка соединений под конкретную СУБД; вызывается из create_app
+    with app.app_context():
+        engine = db.engine
+        if engine.dialect.name == 'sqlite':
+            event.listen(engine, 'connect', _sqlite_pragma_listener(app.config.get('SQLITE_PRAGMAS', {})))
+
+
+# Таблицы FTS5 поиска (и их служебные таблицы search_fts_data и т.п.) создаются
+# миграцией вручную и не описаны моделями — autogenerate не должен их удалять
+SEARCH_TABLE_PREFIXES = ('search_fts', 'search_trigram')
+
+
+def include_object(obj, name, type_, reflected, compare_to):
+    if type_ == 'table' and reflected and compare_to is None and name.startswith(SEARCH_TABLE_PREFIXES):
+        return False
+    return True
@@ -0,0 +1,46 @@
+from sqlalchemy import delete, select
+
+from app import db
+from app.counters import recount_counters
+from app.models import Faculty, Group, Student
+
+# Удаление групп и факультетов одним DELETE: студентов и группы удаляет СУБД
+# (ON DELETE CASCADE, миграция e7c2a9f4b615), объекты в сессию не загружаются.
+# Триггеры поиска и отметки deleted_record срабатывают и для каскадных удалений.
+# Функции не делают commit; возвращают имена фотографий удаленных студентов,
+# которые после commit передаются в app.photos.release_photos_later.
+
+faculty_table = Faculty.__table__
+group_table = Group.__table__
+student_table = Student.__table__
+
+
+def _student_photos(condition):
+    return set(db.session.scalars(
+        select(student_table.c.photo_filename).distinct()
+        .where(condition, student_table.c.photo_filename.is_not(None))
+    ))
+
+
+def delete_groups(group_ids):
+    group_ids = list(group_ids)
+    if not group_ids:
+        return set()
+    photos = _student_photos(student_table.c.group_id.in_(group_ids))
+    faculty_ids = set(db.session.scalars(
+        delete(group_table).where(group_table.c.id.in_(group_ids)).returning(group_table.c.faculty_id)
+    ))
+    # Счетчики факультетов — одним UPDATE (ORM-события при bulk DELETE не срабатывают)
+    recount_counters(db.session.connection(), faculty_ids=faculty_ids)
+    return photos
+
+
+def delete_faculties(faculty_ids):
+    faculty_ids = list(faculty_ids)
+    if not faculty_ids:
+        return set()
+    photos = _student_photos(student_table.c.group_id.in_(
+        select(group_table.c.id).where(group_table.c.faculty_id.in_(faculty_ids))
+    ))
+    db.session.execute(delete(faculty_table).where(faculty_table.c.id.in_(faculty_ids)))
+    return photos
@@ -0,0 +1,290 @@
+import csv
+import datetime
+import io
+import json
+import os
+
+from openpyxl import Workbook
+from sqlalchemy import Date, DateTime, Integer, func, select
+
+from app import db
+from app.models import DeletedRecord, Faculty, Group, Student
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow не установлен — форматы Parquet и Arrow недоступны
+    pa = pc = pq = None
+
+# Сколько строк читается из БД за один раз (yield_per) и пишется одним куском в поток
+EXPORT_CHUNK_SIZE = 1000
+
+# Листы/таблицы экспорта: имя листа, ключ для CSV/NDJSON и выгружаемые столбцы.
+# Порядок и названия столбцов совпадают с прежним экспортом через pandas.
+EXPORT_TABLES = [
+    ('Faculties', 'faculties', [Faculty.id, Faculty.name, Faculty.short_name, Faculty.description]),
+    ('Groups', 'groups', [Group.id, Group.name, Group.year, Group.duration, Group.faculty_id,
+                          Group.course, Group.status]),
+    ('Students', 'students', [Student.id, Student.full_name, Student.date_of_birth,
+                              Student.phone_number, Student.email, Student.group_id]),
+]
+
+# Удаленные строки (отметки deleted_record) — только в инкрементальном экспорте
+DELETED_TABLE = ('Deleted', 'deleted', [DeletedRecord.id, DeletedRecord.table_name,
+                                        DeletedRecord.record_id, DeletedRecord.deleted_at])
+
+
+def export_tables(since=None):
+    # Полный экспорт — три таблицы; с since — измененные строки и удаленные
+    return EXPORT_TABLES + [DELETED_TABLE] if since is not None else EXPORT_TABLES
+
+
+def get_export_table(key, since=None):
+    for sheet_name, table_key, columns in export_tables(since):
+        if table_key == key:
+            return sheet_name, table_key, columns
+    return None
+
+
+def parse_since(value):
+    # ISO 8601; без часового пояса — UTC. Возвращает naive datetime в UTC (как в БД).
+    # '+' в незакодированной строке запроса приходит пробелом
+    moment = datetime.datetime.fromisoformat(value.strip().replace(' ', '+'))
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return moment
+
+
+def export_watermark(lag):
+    # Значение since для следующего инкрементального экспорта: время начала
+    # выгрузки минус lag секунд, чтобы не потерять строки из транзакций, которые
+    # начались раньше, а зафиксированы позже. Часть строк может прийти повторно.
+    moment = datetime.datetime.utcnow() - datetime.timedelta(seconds=lag)
+    return moment.isoformat(timespec='microseconds') + 'Z'
+
+
+# Колоночные форматы: расширение файла и MIME-тип
+COLUMNAR_FORMATS = {
+    'parquet': ('parquet', 'application/vnd.apache.parquet'),
+    'arrow': ('arrow', 'application/vnd.apache.arrow.file'),
+}
+
+# Строковые столбцы с небольшим набором значений выгружаются как dictionary
+# (category в pandas); остальные типы определяются по типу столбца в модели
+DICTIONARY_COLUMNS = {'status', 'table_name'}
+
+# Таблицы, которые при разбиении по факультетам пишутся наборами
+# <таблица>/faculty_id=<id>/*.parquet (hive-разбиение, его понимают DuckDB и pandas)
+PARTITIONED_TABLES = ('groups', 'students')
+
+
+def columnar_available():
+    return pa is not None
+
+
+def _changed_since(stmt, columns, since):
+    table = columns[0].table
+    column = table.c.updated_at if 'updated_at' in table.c else table.c.deleted_at
+    return stmt.where(column >= since)
+
+
+def _column_names(columns):
+    return [column.key for column in columns]
+
+
+def _plain_value(value):
+    # Даты выгружаются строкой ISO, как и раньше
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
+
+
+def _table_select(columns, since=None, with_faculty=False):
+    # С since — только строки, измененные (удаленные) начиная с этого момента.
+    # with_faculty добавляет студентам faculty_id группы (для разбиения по факультетам)
+    stmt = select(*columns).order_by(columns[0])
+    if since is not None:
+        stmt = _changed_since(stmt, columns, since)
+    if with_faculty and columns[0].table is Student.__table__:
+        stmt = stmt.add_columns(Group.faculty_id).join_from(Student, Group, Student.group_id == Group.id)
+    return stmt
+
+
+def _count_rows(tables, since=None):
+    total = 0
+    for _, _, columns in tables:
+        stmt = select(func.count()).select_from(columns[0].table)
+        if since is not None:
+            stmt = _changed_since(stmt, columns, since)
+        total += db.session.execute(stmt).scalar_one()
+    return total
+
+
+def iter_table_chunks(columns, chunk_size=EXPORT_CHUNK_SIZE, since=None):
+    # Строки таблицы порциями: в памяти одновременно не больше chunk_size строк
+    stmt = _table_select(columns, since).execution_options(yield_per=chunk_size)
+    result = db.session.execute(stmt)
+    for partition in result.partitions():
+        yield [tuple(_plain_value(value) for value in row) for row in partition]
+
+
+def write_xlsx(fileobj, chunk_size=EXPORT_CHUNK_SIZE, progress=None, since=None):
+    # write-only книга openpyxl сбрасывает строки во временные файлы по мере
+    # добавления и не держит весь лист в памяти.
+    # progress(записано строк, всего строк) вызывается после каждой порции.
+    tables = export_tables(since)
+    total = _count_rows(tables, since) if progress is not None else 0
+    done = 0
+    workbook = Workbook(write_only=True)
+    for sheet_name, _, columns in tables:
+        sheet = workbook.create_sheet(title=sheet_name)
+        sheet.append(_column_names(columns))
+        for chunk in iter_table_chunks(columns, chunk_size, since):
+            for row in chunk:
+                sheet.append(row)
+            done += len(chunk)
+            if progress is not None:
+                progress(done, total)
+    workbook.save(fileobj)
+
+
+def iter_csv(columns, chunk_size=EXPORT_CHUNK_SIZE, since=None):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(_column_names(columns))
+    for chunk in iter_table_chunks(columns, chunk_size, since):
+        writer.writerows(chunk)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def iter_ndjson(chunk_size=EXPORT_CHUNK_SIZE, since=None):
+    # Все таблицы в одном потоке; таблица указывается в поле "table"
+    for _, table_key, columns in export_tables(since):
+        names = _column_names(columns)
+        for chunk in iter_table_chunks(columns, chunk_size, since):
+            yield ''.join(
+                json.dumps({'table': table_key, **dict(zip(names, row))}, ensure_ascii=False) + '\n'
+                for row in chunk
+            )
+
+
+def _arrow_type(column):
+    if column.key in DICTIONARY_COLUMNS:
+        return pa.dictionary(pa.int32(), pa.string())
+    if isinstance(column.type, DateTime):
+        return pa.timestamp('us', tz='UTC')  # в БД время хранится в UTC
+    if isinstance(column.type, Date):
+        return pa.date32()
+    if isinstance(column.type, Integer):
+        return pa.int32()
+    return pa.string()
+
+
+def _arrow_dictionaries(columns):
+    # Словарь значений — один на всю выгрузку: в файле Arrow IPC у всех пакетов
+    # строк dictionary-столбца должен быть один и тот же словарь
+    dictionaries = {}
+    for column in columns:
+        if column.key in DICTIONARY_COLUMNS:
+            values = db.session.execute(
+                select(column).where(column.is_not(None)).distinct().order_by(column)
+            ).scalars().all()
+            dictionaries[column.key] = (pa.array(values, pa.string()),
+                                        {value: index for index, value in enumerate(values)})
+    return dictionaries
+
+
+def iter_record_batches(columns, schema, chunk_size=EXPORT_CHUNK_SIZE, since=None, with_faculty=False):
+    # Пакеты строк Arrow (RecordBatch) по chunk_size строк
+    dictionaries = _arrow_dictionaries(columns)
+    stmt = _table_select(columns, since, with_faculty).execution_options(yield_per=chunk_size)
+    for partition in db.session.execute(stmt).partitions():
+        arrays = []
+        for index, field in enumerate(schema):
+            values = [row[index] for row in partition]
+            if field.name in dictionaries:
+                dictionary, positions = dictionaries[field.name]
+                indices = pa.array([None if value is None else positions[value] for value in values], pa.int32())
+                arrays.append(pa.DictionaryArray.from_arrays(indices, dictionary))
+            else:
+                arrays.append(pa.array(values, field.type))
+        yield pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def _open_writer(path, export_format, schema):
+    if export_format == 'parquet':
+        return pq.ParquetWriter(path, schema, compression='zstd')
+    return pa.ipc.new_file(path, schema)
+
+
+def _write_table_file(path, export_format, schema, batches):
+    with _open_writer(path, export_format, schema) as writer:
+        for batch in batches:
+            writer.write_batch(batch)
+
+
+def _write_partitioned(directory, export_format, schema, batches):
+    # Файл на факультет: <directory>/faculty_id=<id>/part-0.<расширение>. Столбец
+    # faculty_id в файл не пишется — значение берется из имени каталога (hive)
+    extension = COLUMNAR_FORMATS[export_format][0]
+    position = schema.get_field_index('faculty_id')
+    file_schema = schema.remove(position)
+    writers = {}
+    try:
+        for batch in batches:
+            faculty_ids = batch.column(position)
+            for faculty_id in pc.unique(faculty_ids).to_pylist():
+                rows = batch.filter(pc.equal(faculty_ids, faculty_id))
+                if faculty_id not in writers:
+                    partition_dir = os.path.join(directory, f'faculty_id={faculty_id}')
+                    os.makedirs(partition_dir, exist_ok=True)
+                    writers[faculty_id] = _open_writer(os.path.join(partition_dir, f'part-0.{extension}'),
+                                                       export_format, file_schema)
+                writers[faculty_id].write_batch(pa.RecordBatch.from_arrays(
+                    [rows.column(index) for index in range(rows.num_columns) if index != position],
+                    schema=file_schema,
+                ))
+    finally:
+        for writer in writers.values():
+            writer.close()
+
+
+def write_columnar(directory, export_format, table_key=None, partition=False, since=None,
+                   chunk_size=EXPORT_CHUNK_SIZE, progress=None):
+    # Пишет таблицы экспорта в directory в формате parquet или arrow (Arrow IPC):
+    # <таблица>.<расширение>, а при partition — наборы, разбитые по факультетам
+    # (см. PARTITIONED_TABLES). table_key ограничивает выгрузку одной таблицей.
+    # Возвращает список созданных путей относительно directory.
+    extension = COLUMNAR_FORMATS[export_format][0]
+    tables = [table for table in export_tables(since) if table_key is None or table[1] == table_key]
+    total = _count_rows(tables, since) if progress is not None else 0
+    done = 0
+    written = []
+
+    def counted(batches):
+        nonlocal done
+        for batch in batches:
+            yield batch
+            done += batch.num_rows
+            if progress is not None:
+                progress(done, total)
+
+    for _, key, columns in tables:
+        partitioned = partition and key in PARTITIONED_TABLES
+        fields = [pa.field(column.key, _arrow_type(column), nullable=column.nullable) for column in columns]
+        if partitioned and key == 'students':
+            fields.append(pa.field('faculty_id', pa.int32(), nullable=False))
+        schema = pa.schema(fields)
+        batches = counted(iter_record_batches(columns, schema, chunk_size, since, with_faculty=partitioned))
+        if partitioned:
+            _write_partitioned(os.path.join(directory, key), export_format, schema, batches)
+            written.append(key)
+        else:
+            _write_table_file(os.path.join(directory, f'{key}.{extension}'), export_format, schema, batches)
+            written.append(f'{key}.{extension}')
+    return written
@@ -0,0 +1,93 @@
+import re
+
+from sqlalchemy import func, select
+
+from app import db
+from app.academic import compute_course, compute_status, current_academic_year
+from app.models import Faculty, Group, GroupNameSequence
+
+# Имена групп "<сокращение>-<номер>-<две цифры года>". Номер берется из счетчика
+# group_name_sequence для пары (факультет, год) одним INSERT ... ON CONFLICT DO UPDATE
+# ... RETURNING: выдача атомарна (строка счетчика блокируется до конца транзакции),
+# поэтому два одновременных запроса не получат один номер. Уникальность имени
+# дополнительно гарантирует uq_group_faculty_id_name.
+
+sequence_table = GroupNameSequence.__table__
+
+
+def group_name(short_name, index, year):
+    return f'{short_name}-{index}-{str(year)[-2:]}'
+
+
+def _insert(table):
+    if db.engine.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(table)
+
+
+def allocate_group_indexes(connection, faculty_id, year, count=1):
+    # Резервирует count номеров подряд; возвращает их список. Если счетчика для
+    # пары еще нет, он начинается после числа уже существующих групп этого года.
+    existing = select(func.count(Group.id)) \
+        .where(Group.faculty_id == faculty_id, Group.year == year).scalar_subquery()
+    stmt = _insert(sequence_table).values(faculty_id=faculty_id, year=year, last_index=existing + count)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[sequence_table.c.faculty_id, sequence_table.c.year],
+        set_={'last_index': sequence_table.c.last_index + count}
+    ).returning(sequence_table.c.last_index)
+    last_index = connection.execute(stmt).scalar_one()
+    return list(range(last_index - count + 1, last_index + 1))
+
+
+def next_group_name(faculty, year):
+    index, = allocate_group_indexes(db.session.connection(), faculty.id, year)
+    return group_name(faculty.short_name, index, year)
+
+
+def create_groups(faculty, year, duration, count):
+    # Набор из count групп одного года поступления; номера выдаются одним запросом.
+    # Группы добавляются в сессию, commit выполняет вызывающий код.
+    academic_year = current_academic_year()
+    course = compute_course(year, duration, academic_year)
+    status = compute_status(year, duration, academic_year)
+    groups = [
+        Group(name=group_name(faculty.short_name, index, year), year=year, duration=duration,
+              faculty_id=faculty.id, course=course, status=status)
+        for index in allocate_group_indexes(db.session.connection(), faculty.id, year, count)
+    ]
+    db.session.add_all(groups)
+    return groups
+
+
+def sync_group_name_sequences(connection):
+    # Поднимает счетчики до наибольших номеров в именах существующих групп
+    # (после импорта из Excel, где имена приходят из файла)
+    last_indexes = {}
+    rows = connection.execute(
+        select(Group.faculty_id, Group.year, Group.name, Faculty.short_name)
+        .join(Faculty, Faculty.id == Group.faculty_id)
+    )
+    for faculty_id, year, name, short_name in rows:
+        match = re.fullmatch(rf'{re.escape(short_name)}-(\d+)-{str(year)[-2:]}', name)
+        if match:
+            key = (faculty_id, year)
+            last_indexes[key] = max(last_indexes.get(key, 0), int(match.group(1)))
+    if not last_indexes:
+        return
+    current = {
+        (faculty_id, year): last_index
+        for faculty_id, year, last_index in connection.execute(select(sequence_table))
+    }
+    values = [
+        {'faculty_id': faculty_id, 'year': year, 'last_index': last_index}
+        for (faculty_id, year), last_index in last_indexes.items()
+        if last_index > current.get((faculty_id, year), 0)
+    ]
+    if values:
+        stmt = _insert(sequence_table)
+        connection.execute(stmt.on_conflict_do_update(
+            index_elements=[sequence_table.c.faculty_id, sequence_table.c.year],
+            set_={'last_index': stmt.excluded.last_index}
+        ), values)
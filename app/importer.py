@@ -0,0 +1,263 @@
+import pandas as pd
+from sqlalchemy import select
+
+from app import db
+from app.academic import current_academic_year, rollover
+from app.counters import recount_counters
+from app.group_names import sync_group_name_sequences
+from app.models import Faculty, Group, Student
+
+# Сколько строк уходит в одну пачку INSERT ... ON CONFLICT (и одну транзакцию)
+IMPORT_BATCH_SIZE = 1000
+
+# Листы в том же виде, в каком их выгружает export_excel
+IMPORT_SHEETS = {
+    'Faculties': ['id', 'name', 'short_name', 'description'],
+    'Groups': ['id', 'name', 'year', 'duration', 'faculty_id', 'course', 'status'],
+    'Students': ['id', 'full_name', 'date_of_birth', 'phone_number', 'email', 'group_id'],
+}
+
+
+class ImportReport:
+    def __init__(self):
+        self.errors = []  # {'sheet', 'row', 'message'}; row — номер строки в Excel
+        self.written = {'Faculties': 0, 'Groups': 0, 'Students': 0}
+        self.skipped = {'Faculties': 0, 'Groups': 0, 'Students': 0}
+
+    @property
+    def ok(self):
+        return not self.errors
+
+    def to_dict(self):
+        return {'written': self.written, 'skipped': self.skipped, 'errors': self.errors}
+
+    def add_errors(self, sheet, df, mask, message):
+        # Ошибка для каждой строки, отмеченной в mask
+        for index in df.index[mask]:
+            self.errors.append({'sheet': sheet, 'row': int(index) + 2, 'message': message})
+
+
+def read_workbook(fileobj):
+    sheets = pd.read_excel(fileobj, sheet_name=None, dtype=object)
+    missing = [name for name in IMPORT_SHEETS if name not in sheets]
+    if missing:
+        raise ValueError(f'В файле нет листов: {", ".join(missing)}.')
+    frames = {}
+    for name, columns in IMPORT_SHEETS.items():
+        df = sheets[name]
+        absent = [column for column in columns if column not in df.columns]
+        if absent:
+            raise ValueError(f'На листе {name} нет столбцов: {", ".join(absent)}.')
+        frames[name] = df[columns]
+    return frames
+
+
+def _blank(series):
+    return series.isna() | (series.astype(str).str.strip() == '')
+
+
+def _as_int(series):
+    return pd.to_numeric(series, errors='coerce').astype('Int64')
+
+
+def _as_str(series):
+    # Телефоны и т.п. pandas может прочитать как числа — приводим к строке без '.0'
+    def convert(value):
+        if pd.isna(value):
+            return None
+        if isinstance(value, float) and value.is_integer():
+            value = int(value)
+        return str(value).strip()
+    return series.map(convert)
+
+
+def _existing_ids(column, ids):
+    found = set()
+    ids = list(ids)
+    for start in range(0, len(ids), IMPORT_BATCH_SIZE):
+        chunk = ids[start:start + IMPORT_BATCH_SIZE]
+        found.update(db.session.execute(select(column).where(column.in_(chunk))).scalars())
+    return found
+
+
+def _validate_faculties(df, report):
+    sheet = 'Faculties'
+    df = df.assign(id=_as_int(df['id']), name=_as_str(df['name']),
+                   short_name=_as_str(df['short_name']), description=_as_str(df['description']))
+    bad = pd.Series(False, index=df.index)
+    checks = [
+        (df['id'].isna(), 'Не указан или некорректен id.'),
+        (_blank(df['name']) | _blank(df['short_name']), 'Название и сокращение обязательны.'),
+        (df['id'].duplicated(keep=False) & df['id'].notna(), 'id повторяется в файле.'),
+        (df['name'].duplicated(keep=False) | df['short_name'].duplicated(keep=False),
+         'Название или сокращение повторяется в файле.'),
+    ]
+    for mask, message in checks:
+        mask = mask.fillna(True).astype(bool) & ~bad
+        report.add_errors(sheet, df, mask, message)
+        bad |= mask
+    return df[~bad]
+
+
+def _validate_groups(df, report, faculty_ids):
+    sheet = 'Groups'
+    df = df.assign(id=_as_int(df['id']), name=_as_str(df['name']), year=_as_int(df['year']),
+                   duration=_as_int(df['duration']), faculty_id=_as_int(df['faculty_id']),
+                   course=_as_int(df['course']), status=_as_str(df['status']))
+    known_faculties = set(faculty_ids) | _existing_ids(Faculty.id, df['faculty_id'].dropna().unique().tolist())
+
+    # Имя группы уникально в пределах факультета (uq_group_faculty_id_name)
+    name_owners = {}
+    faculty_list = df['faculty_id'].dropna().unique().tolist()
+    for start in range(0, len(faculty_list), IMPORT_BATCH_SIZE):
+        chunk = faculty_list[start:start + IMPORT_BATCH_SIZE]
+        for faculty_id, name, group_id in db.session.execute(
+            select(Group.faculty_id, Group.name, Group.id).where(Group.faculty_id.in_(chunk))
+        ):
+            name_owners[(faculty_id, name)] = group_id
+    owner_ids = pd.Series(
+        [name_owners.get((f, n)) if pd.notna(f) else None for f, n in zip(df['faculty_id'], df['name'])],
+        index=df.index, dtype='Int64'
+    )
+    name_taken = owner_ids.notna() & (owner_ids != df['id'])
+
+    bad = pd.Series(False, index=df.index)
+    checks = [
+        (df['id'].isna(), 'Не указан или некорректен id.'),
+        (_blank(df['name']), 'Не указано название группы.'),
+        (df[['year', 'duration', 'course', 'faculty_id']].isna().any(axis=1),
+         'Год, срок обучения, курс и факультет должны быть целыми числами.'),
+        (df['id'].duplicated(keep=False) & df['id'].notna(), 'id повторяется в файле.'),
+        (~df['faculty_id'].isin(known_faculties), 'Факультет с таким id не найден.'),
+        (df.duplicated(['faculty_id', 'name'], keep=False) | name_taken,
+         'Группа с таким названием уже есть на этом факультете.'),
+    ]
+    for mask, message in checks:
+        mask = mask.fillna(True).astype(bool) & ~bad
+        report.add_errors(sheet, df, mask, message)
+        bad |= mask
+    return df[~bad]
+
+
+def _validate_students(df, report, group_ids):
+    sheet = 'Students'
+    dates = pd.to_datetime(df['date_of_birth'], errors='coerce', format='ISO8601')
+    df = df.assign(id=_as_int(df['id']), full_name=_as_str(df['full_name']),
+                   date_of_birth=dates.dt.date, phone_number=_as_str(df['phone_number']),
+                   email=_as_str(df['email']), group_id=_as_int(df['group_id']))
+    known_groups = set(group_ids) | _existing_ids(Group.id, df['group_id'].dropna().unique().tolist())
+
+    # Email уникален: он не должен принадлежать в БД другому студенту
+    emails = df['email'].dropna().unique().tolist()
+    owners = {}
+    for start in range(0, len(emails), IMPORT_BATCH_SIZE):
+        chunk = emails[start:start + IMPORT_BATCH_SIZE]
+        owners.update(db.session.execute(
+            select(Student.email, Student.id).where(Student.email.in_(chunk))
+        ).tuples().all())
+    owner_ids = df['email'].map(owners).astype('Int64')
+    email_taken = owner_ids.notna() & (df['id'].isna() | (owner_ids != df['id']))
+
+    bad = pd.Series(False, index=df.index)
+    checks = [
+        (_blank(df['full_name']) | _blank(df['phone_number']) | _blank(df['email']),
+         'ФИО, телефон и email обязательны.'),
+        (dates.isna(), 'Неверный формат даты рождения. Используйте ГГГГ-ММ-ДД.'),
+        (df['id'].duplicated(keep=False) & df['id'].notna(), 'id повторяется в файле.'),
+        (df['email'].duplicated(keep=False), 'Email повторяется в файле.'),
+        (email_taken, 'Студент с таким email уже существует.'),
+        (~df['group_id'].isin(known_groups), 'Группа с таким id не найдена.'),
+    ]
+    for mask, message in checks:
+        mask = mask.fillna(True).astype(bool) & ~bad
+        report.add_errors(sheet, df, mask, message)
+        bad |= mask
+    return df[~bad]
+
+
+def _records(df):
+    # NaN/NA -> None, numpy-типы -> обычные типы Python
+    return [
+        {key: (None if pd.isna(value) else (value.item() if hasattr(value, 'item') else value))
+         for key, value in row.items()}
+        for row in df.to_dict('records')
+    ]
+
+
+def _upsert_statement(table, columns):
+    if db.engine.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    stmt = insert(table)
+    # Обновляются только столбцы из файла (например, photo_filename не затирается)
+    return stmt.on_conflict_do_update(
+        index_elements=[table.c.id],
+        set_={name: stmt.excluded[name] for name in columns if name != 'id'}
+    )
+
+
+def _write_batches(table, records, batch_size, on_batch=None):
+    # on_batch(n) вызывается после commit каждой пачки из n строк
+    if not records:
+        return 0
+    upsert = _upsert_statement(table, records[0].keys())
+    written = 0
+    for start in range(0, len(records), batch_size):
+        batch = records[start:start + batch_size]
+        # Строки без id (новые студенты) — обычный INSERT, остальные — upsert по id
+        with_id = [record for record in batch if record.get('id') is not None]
+        without_id = [{k: v for k, v in record.items() if k != 'id'}
+                      for record in batch if record.get('id') is None]
+        try:
+            if with_id:
+                db.session.execute(upsert, with_id)
+            if without_id:
+                db.session.execute(table.insert(), without_id)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        written += len(batch)
+        if on_batch is not None:
+            on_batch(len(batch))
+    return written
+
+
+def import_workbook(fileobj, batch_size=IMPORT_BATCH_SIZE, progress=None):
+    # progress(записано, всего) — после каждой записанной пачки (для фоновой задачи)
+    report = ImportReport()
+    frames = read_workbook(fileobj)
+
+    faculties = _validate_faculties(frames['Faculties'], report)
+    groups = _validate_groups(frames['Groups'], report, faculties['id'].tolist())
+    students = _validate_students(frames['Students'], report, groups['id'].tolist())
+
+    for sheet, valid in (('Faculties', faculties), ('Groups', groups), ('Students', students)):
+        report.skipped[sheet] = len(frames[sheet]) - len(valid)
+    sheet_order = list(IMPORT_SHEETS)
+    report.errors.sort(key=lambda error: (sheet_order.index(error['sheet']), error['row']))
+
+    total = len(faculties) + len(groups) + len(students)
+    done = 0
+
+    def on_batch(count):
+        nonlocal done
+        done += count
+        if progress is not None:
+            progress(done, total)
+
+    report.written['Faculties'] = _write_batches(Faculty.__table__, _records(faculties), batch_size, on_batch)
+    report.written['Groups'] = _write_batches(Group.__table__, _records(groups), batch_size, on_batch)
+    report.written['Students'] = _write_batches(Student.__table__, _records(students), batch_size, on_batch)
+
+    # Пакетная запись идет мимо событий сессии — счетчики пересчитываются одним проходом,
+    # курс и статус импортированных групп приводятся к текущему учебному году (остальные
+    # группы не трогаются: учебный год мог быть задан вручную, flask rollover --year),
+    # а счетчики номеров групп — к именам из файла
+    if any(report.written.values()):
+        recount_counters(db.session.connection())
+        rollover(db.session.connection(), current_academic_year(), group_ids=groups['id'].tolist())
+        sync_group_name_sequences(db.session.connection())
+        db.session.commit()
+    return report
@@ -0,0 +1,245 @@
+import json
+import logging
+import re
+import threading
+import time
+from collections import Counter
+
+from flask import before_render_template, current_app, g, has_request_context, request, template_rendered
+from sqlalchemy import event
+
+# Замеры по каждому запросу: общее время, число и суммарное время SQL-запросов
+# (события курсора SQLAlchemy), время рендеринга шаблонов. Результат уходит в
+# заголовок Server-Timing, строку лога app.requests (JSON) и метрики /metrics.
+# Детектор N+1 предупреждает, если один и тот же запрос (с точностью до
+# параметров) выполнен за запрос больше NPLUSONE_THRESHOLD раз.
+
+request_logger = logging.getLogger('app.requests')
+nplusone_logger = logging.getLogger('app.nplusone')
+
+# Границы корзин гистограммы длительности запросов, секунды
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.statements = Counter()
+        self._template_started = []
+
+
+class MetricsRegistry:
+    # Метрики процесса в текстовом формате Prometheus. У каждого рабочего
+    # процесса свой набор значений — Prometheus опрашивает их по отдельности.
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}  # (имя, метки) -> значение
+        self._histograms = {}  # (имя, метки) -> [счетчики корзин, сумма, количество]
+        self._help = {}
+
+    def describe(self, name, kind, help_text):
+        self._help[name] = (kind, help_text)
+
+    def inc(self, name, labels, value=1.0):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0.0) + value
+
+    def observe(self, name, labels, value):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            buckets, total, count = self._histograms.get(key, ([0] * len(DURATION_BUCKETS), 0.0, 0))
+            for index, bound in enumerate(DURATION_BUCKETS):
+                if value <= bound:
+                    buckets[index] += 1
+            self._histograms[key] = (buckets, total + value, count + 1)
+
+    @staticmethod
+    def _labels(labels, extra=()):
+        pairs = list(labels) + list(extra)
+        if not pairs:
+            return ''
+        escaped = []
+        for name, value in pairs:
+            value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+            escaped.append(f'{name}="{value}"')
+        return '{' + ','.join(escaped) + '}'
+
+    def render(self, extra_counters=()):
+        # extra_counters — [(имя, метки, значение)], вычисляемые в момент опроса
+        lines = []
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {key: (list(b), s, c) for key, (b, s, c) in self._histograms.items()}
+        for name, labels, value in extra_counters:
+            counters[(name, tuple(sorted(labels.items())))] = value
+
+        described = set()
+        def header(name):
+            if name not in described and name in self._help:
+                kind, help_text = self._help[name]
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} {kind}')
+            described.add(name)
+
+        for (name, labels), value in sorted(counters.items()):
+            header(name)
+            lines.append(f'{name}{self._labels(labels)} {value:g}')
+        for (name, labels), (buckets, total, count) in sorted(histograms.items()):
+            header(name)
+            for bound, bucket_count in zip(DURATION_BUCKETS, buckets):
+                lines.append(f'{name}_bucket{self._labels(labels, [("le", f"{bound:g}")])} {bucket_count}')
+            lines.append(f'{name}_bucket{self._labels(labels, [("le", "+Inf")])} {count}')
+            lines.append(f'{name}_sum{self._labels(labels)} {total:g}')
+            lines.append(f'{name}_count{self._labels(labels)} {count}')
+        return '\n'.join(lines) + '\n'
+
+
+metrics = MetricsRegistry()
+metrics.describe('http_requests_total', 'counter', 'HTTP-запросы по маршруту и коду ответа.')
+metrics.describe('http_request_duration_seconds', 'histogram', 'Время обработки запроса.')
+metrics.describe('db_queries_total', 'counter', 'SQL-запросы, выполненные при обработке запросов.')
+metrics.describe('db_query_duration_seconds_total', 'counter', 'Суммарное время SQL-запросов.')
+metrics.describe('template_render_seconds_total', 'counter', 'Суммарное время рендеринга шаблонов.')
+metrics.describe('nplusone_warnings_total', 'counter', 'Запросы, в которых сработал детектор N+1.')
+metrics.describe('response_cache_hits_total', 'counter', 'Попадания в кеш страниц.')
+metrics.describe('response_cache_misses_total', 'counter', 'Промахи кеша страниц.')
+
+
+# Списки параметров IN (?, ?, ?) разной длины считаются одним запросом
+_IN_LIST_RE = re.compile(r'\((?:\s*(?:\?|%\(\w+\)s|%s|:\w+)\s*,)+\s*(?:\?|%\(\w+\)s|%s|:\w+)\s*\)')
+_SPACE_RE = re.compile(r'\s+')
+
+
+def statement_shape(statement):
+    return _IN_LIST_RE.sub('(?)', _SPACE_RE.sub(' ', statement).strip())
+
+
+_SERVER_TIMING_DB_RE = re.compile(r'db;dur=[\d.]+;desc="(\d+) queries"')
+
+
+def query_count(response):
+    # Число SQL-запросов из заголовка Server-Timing ответа (None, если замеры выключены)
+    for value in response.headers.getlist('Server-Timing'):
+        match = _SERVER_TIMING_DB_RE.match(value)
+        if match:
+            return int(match.group(1))
+    return None
+
+
+def _current():
+    return g.get('_request_metrics') if has_request_context() else None
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current() is not None:
+        conn.info.setdefault('_query_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    current = _current()
+    started = conn.info.get('_query_started')
+    if current is None or not started:
+        return
+    current.sql_time += time.perf_counter() - started.pop()
+    current.sql_count += 1
+    current.statements[statement_shape(statement)] += 1
+
+
+def _handle_error(context):
+    # Запрос завершился ошибкой — after_cursor_execute не будет вызван, отметка
+    # начала снимается, иначе время следующих запросов соединения сместилось бы
+    connection = context.connection
+    started = connection.info.get('_query_started') if connection is not None else None
+    if started:
+        started.pop()
+
+
+def _before_render_template(sender, template, context, **extra):
+    current = _current()
+    if current is not None:
+        current._template_started.append(time.perf_counter())
+
+
+def _template_rendered(sender, template, context, **extra):
+    current = _current()
+    if current is not None and current._template_started:
+        current.template_time += time.perf_counter() - current._template_started.pop()
+
+
+def log_view_error():
+    # Трассировка исключения, перехваченного представлением (ошибка показана
+    # пользователю через flash), с методом и путем запроса
+    current_app.logger.exception('Ошибка при обработке %s %s', request.method, request.path)
+
+
+def configure_logging(app):
+    # Логгеры app.requests и app.nplusone — дочерние для app.logger (логгер "app")
+    # и пишут через его обработчик в stderr, одна строка на событие
+    app.logger.setLevel(app.config.get('LOG_LEVEL', 'INFO'))
+
+
+def init_instrumentation(app, db):
+    configure_logging(app)
+    if not app.config.get('INSTRUMENTATION_ENABLED', True):
+        return
+
+    with app.app_context():
+        engine = db.engine
+    if not event.contains(engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(engine, 'handle_error', _handle_error)
+    before_render_template.connect(_before_render_template, app)
+    template_rendered.connect(_template_rendered, app)
+
+    @app.before_request
+    def start_request_metrics():
+        g._request_metrics = RequestMetrics()
+
+    @app.after_request
+    def finish_request_metrics(response):
+        current = g.pop('_request_metrics', None)
+        if current is None:
+            return response
+        duration = time.perf_counter() - current.started
+        endpoint = request.endpoint or 'unknown'
+
+        response.headers.add('Server-Timing', f'app;dur={duration * 1000:.1f}')
+        response.headers.add('Server-Timing',
+                             f'db;dur={current.sql_time * 1000:.1f};desc="{current.sql_count} queries"')
+        if current.template_time:
+            response.headers.add('Server-Timing', f'tpl;dur={current.template_time * 1000:.1f}')
+
+        labels = {'endpoint': endpoint}
+        metrics.inc('http_requests_total', {**labels, 'method': request.method, 'status': response.status_code})
+        metrics.observe('http_request_duration_seconds', labels, duration)
+        metrics.inc('db_queries_total', labels, current.sql_count)
+        metrics.inc('db_query_duration_seconds_total', labels, current.sql_time)
+        metrics.inc('template_render_seconds_total', labels, current.template_time)
+
+        threshold = app.config.get('NPLUSONE_THRESHOLD', 10)
+        repeated = {shape: count for shape, count in current.statements.items() if count > threshold}
+        if repeated:
+            metrics.inc('nplusone_warnings_total', labels)
+            for shape, count in repeated.items():
+                nplusone_logger.warning(json.dumps({
+                    'endpoint': endpoint, 'path': request.path, 'count': count, 'statement': shape,
+                }, ensure_ascii=False))
+
+        request_logger.info(json.dumps({
+            'method': request.method,
+            'path': request.path,
+            'endpoint': endpoint,
+            'status': response.status_code,
+            'duration_ms': round(duration * 1000, 2),
+            'sql_count': current.sql_count,
+            'sql_ms': round(current.sql_time * 1000, 2),
+            'template_ms': round(current.template_time * 1000, 2),
+            'cache': response.headers.get('X-Cache'),
+        }, ensure_ascii=False))
+        return response
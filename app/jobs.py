@@ -0,0 +1,238 @@
+import datetime
+import logging
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app
+from sqlalchemy import delete, func, insert, select, update
+
+from app import db
+from app.models import Job
+
+# Фоновые задачи без внешнего брокера: очередь — таблица job, исполнитель — пул
+# потоков процесса (JOBS_WORKERS). Задача ставится в очередь одной строкой и сразу
+# передается в пул; запускает ее тот процесс, который первым переведет строку из
+# queued в running (один UPDATE), поэтому при нескольких рабочих процессах задача
+# выполняется один раз. Пока задача выполняется, отдельный поток раз в
+# JOBS_HEARTBEAT_INTERVAL обновляет job.heartbeat_at. Задачи, оставшиеся в очереди
+# или в running без heartbeat дольше JOBS_STALE_AFTER (процесс остановлен),
+# подбираются при первом запросе следующего процесса.
+# Результат — JSON в job.result и, при необходимости, файл в JOBS_FOLDER.
+
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_SUCCEEDED = 'succeeded'
+JOB_FAILED = 'failed'
+JOB_FINISHED = (JOB_SUCCEEDED, JOB_FAILED)
+
+logger = logging.getLogger('app.jobs')
+
+job_table = Job.__table__
+
+_handlers = {}
+_executor = None
+_executor_lock = threading.Lock()
+_resumed = False
+
+
+class JobError(Exception):
+    # Ожидаемая ошибка задачи (например, неверный файл): текст показывается
+    # пользователю, в лог трассировка не пишется
+    pass
+
+
+def job_handler(kind):
+    # Регистрирует функцию handler(job, **params) для задач вида kind.
+    # Возвращаемое значение (JSON) сохраняется в job.result.
+    def decorator(func):
+        _handlers[kind] = func
+        return func
+    return decorator
+
+
+def _now():
+    return datetime.datetime.utcnow()
+
+
+def jobs_folder():
+    folder = current_app.config.get('JOBS_FOLDER') or os.path.join(current_app.instance_path, 'jobs')
+    os.makedirs(folder, exist_ok=True)
+    return folder
+
+
+def _update(job_id, *conditions, **values):
+    # Короткая отдельная транзакция: статус виден сразу, независимо от сессии задачи
+    values['updated_at'] = _now()
+    with db.engine.begin() as connection:
+        return connection.execute(
+            update(job_table).where(job_table.c.id == job_id, *conditions).values(**values)
+        ).rowcount
+
+
+class JobContext:
+    # Передается обработчику первым аргументом
+    def __init__(self, job_id, kind):
+        self.id = job_id
+        self.kind = kind
+        self._progress = 0
+
+    def progress(self, percent, message=None):
+        # Пишет в БД только при изменении на целый процент. Выполняется в отдельной
+        # транзакции — в SQLite не вызывать, пока сессия задачи держит незавершенную запись.
+        percent = max(0, min(int(percent), 99))
+        if percent > self._progress or message is not None:
+            self._progress = max(percent, self._progress)
+            values = {'progress': self._progress, 'heartbeat_at': _now()}
+            if message is not None:
+                values['message'] = message[:255]
+            _update(self.id, **values)
+
+    def result_path(self, extension):
+        return os.path.join(jobs_folder(), f'{self.id}.{extension}')
+
+    def file_result(self, path, download_name, mimetype, **extra):
+        return {'file': os.path.basename(path), 'download_name': download_name,
+                'mimetype': mimetype, **extra}
+
+
+def _get_executor(app):
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=app.config.get('JOBS_WORKERS', 2),
+                                           thread_name_prefix='jobs')
+        return _executor
+
+
+def _submit(app, job_id):
+    if app.config.get('JOBS_EAGER'):
+        run_job(app, job_id)
+    else:
+        _get_executor(app).submit(run_job, app, job_id)
+
+
+def enqueue(kind, **params):
+    # Ставит задачу в очередь и возвращает ее id. Строка записывается в отдельной
+    # транзакции и не зависит от commit/rollback сессии вызывающего кода.
+    # При JOBS_EAGER задача выполняется сразу, в текущем потоке.
+    if kind not in _handlers:
+        raise ValueError(f'Неизвестный вид задачи: {kind}')
+    job_id = uuid.uuid4().hex
+    now = _now()
+    with db.engine.begin() as connection:
+        connection.execute(insert(job_table).values(
+            id=job_id, kind=kind, status=JOB_QUEUED, progress=0, params=params,
+            created_at=now, updated_at=now,
+        ))
+    _submit(current_app._get_current_object(), job_id)
+    return job_id
+
+
+def _heartbeat(app, job_id, stop):
+    # Поток-спутник выполняемой задачи: отмечает, что процесс жив, даже если задача
+    # долго не сообщает о прогрессе (чтение большого файла, долгий запрос)
+    interval = app.config.get('JOBS_HEARTBEAT_INTERVAL', 30)
+    with app.app_context():
+        while not stop.wait(interval):
+            try:
+                _update(job_id, job_table.c.status == JOB_RUNNING, heartbeat_at=_now())
+            except Exception:  # noqa: BLE001 — например, SQLite занят записью задачи
+                logger.warning('Не удалось обновить heartbeat задачи %s', job_id, exc_info=True)
+
+
+def run_job(app, job_id):
+    with app.app_context():
+        stop = threading.Event()
+        try:
+            now = _now()
+            if not _update(job_id, job_table.c.status == JOB_QUEUED, status=JOB_RUNNING,
+                           started_at=now, heartbeat_at=now):
+                return  # задачу уже взял другой процесс или поток
+            threading.Thread(target=_heartbeat, args=(app, job_id, stop), daemon=True,
+                             name=f'jobs-heartbeat-{job_id[:8]}').start()
+            kind, params = db.session.execute(
+                select(job_table.c.kind, job_table.c.params).where(job_table.c.id == job_id)
+            ).one()
+            db.session.rollback()
+            try:
+                result = _handlers[kind](JobContext(job_id, kind), **params)
+            except JobError as error:
+                db.session.rollback()
+                _update(job_id, status=JOB_FAILED, error=str(error), finished_at=_now())
+            except Exception as error:
+                db.session.rollback()
+                logger.exception('Фоновая задача %s (%s) завершилась с ошибкой', job_id, kind)
+                _update(job_id, status=JOB_FAILED, error=str(error) or type(error).__name__,
+                        finished_at=_now())
+            else:
+                _update(job_id, status=JOB_SUCCEEDED, progress=100, result=result, finished_at=_now())
+        finally:
+            stop.set()
+            db.session.remove()
+
+
+def get_job(job_id):
+    return db.session.get(Job, job_id)
+
+
+def result_file(job):
+    # Путь к файлу результата завершенной задачи или None
+    if job.status != JOB_SUCCEEDED or not job.result or not job.result.get('file'):
+        return None
+    path = os.path.join(jobs_folder(), os.path.basename(job.result['file']))
+    return path if os.path.exists(path) else None
+
+
+def resume_jobs(app):
+    # Возвращает в очередь задачи в running без heartbeat дольше JOBS_STALE_AFTER
+    # (процесс был остановлен), передает в пул все задачи из очереди и удаляет
+    # устаревшие результаты. Выполняется один раз за процесс, при первом запросе.
+    global _resumed
+    if _resumed:
+        return
+    _resumed = True
+    stale_before = _now() - datetime.timedelta(seconds=app.config.get('JOBS_STALE_AFTER', 900))
+    with db.engine.begin() as connection:
+        connection.execute(
+            update(job_table)
+            .where(job_table.c.status == JOB_RUNNING,
+                   func.coalesce(job_table.c.heartbeat_at, job_table.c.updated_at) < stale_before)
+            .values(status=JOB_QUEUED, updated_at=_now())
+        )
+        queued = connection.execute(
+            select(job_table.c.id).where(job_table.c.status == JOB_QUEUED).order_by(job_table.c.created_at)
+        ).scalars().all()
+    cleanup_jobs(app.config.get('JOBS_RESULT_TTL', 24 * 3600))
+    for job_id in queued:
+        _submit(app, job_id)
+
+
+def cleanup_jobs(max_age):
+    # Удаляет завершенные задачи старше max_age секунд вместе с файлами результатов.
+    # Возвращает число удаленных задач.
+    cutoff = _now() - datetime.timedelta(seconds=max_age)
+    folder = jobs_folder()
+    with db.engine.begin() as connection:
+        finished = connection.execute(
+            select(job_table.c.id, job_table.c.result)
+            .where(job_table.c.status.in_(JOB_FINISHED), job_table.c.finished_at < cutoff)
+        ).all()
+        if not finished:
+            return 0
+        connection.execute(delete(job_table).where(job_table.c.id.in_([job_id for job_id, _ in finished])))
+    for _, result in finished:
+        if result and result.get('file'):
+            try:
+                os.remove(os.path.join(folder, os.path.basename(result['file'])))
+            except OSError:
+                pass
+    return len(finished)
+
+
+def init_jobs(app):
+    @app.before_request
+    def resume_background_jobs():
+        if not _resumed:
+            resume_jobs(app)
@@ -1,22 +1,91 @@
 from . import db
+from sqlalchemy import func, text
 # from flask_login import UserMixin # Убираем UserMixin
 
 class Faculty(db.Model):
+    __table_args__ = (
+        # Функциональные индексы для поиска/сортировки без учета регистра
+        db.Index('ix_faculty_lower_name', func.lower(text('name'))),
+        db.Index('ix_faculty_lower_short_name', func.lower(text('short_name'))),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(128), nullable=False)
     short_name = db.Column(db.String(32), nullable=False)
     description = db.Column(db.Text)
-    groups = db.relationship('Group', backref='faculty', cascade='all, delete-orphan')
+    # Счетчики поддерживаются app.counters; пересчет с нуля — flask recount
+    num_groups = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    num_students = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # Время создания и последнего изменения (UTC); ставятся триггерами БД (миграция d4b8e2f6a913)
+    created_at = db.Column(db.DateTime, nullable=False, server_default=func.now())
+    updated_at = db.Column(db.DateTime, nullable=False, server_default=func.now(), index=True)
+    # Коллекции не загружаются неявно (lazy='raise'): представления выбирают данные
+    # запросами или явно через selectinload, а случайное обращение сразу видно.
+    # Дочерние строки при удалении удаляет СУБД (ON DELETE CASCADE, passive_deletes):
+    # ORM не загружает их и не удаляет по одной
+    groups = db.relationship('Group', backref='faculty', cascade='all, delete-orphan', lazy='raise',
+                             passive_deletes=True)
 
 class Group(db.Model):
+    __table_args__ = (
+        # Индекс (faculty_id, year) покрывает и выборки только по faculty_id
+        db.Index('ix_group_faculty_id_year', 'faculty_id', 'year'),
+        db.UniqueConstraint('faculty_id', 'name', name='uq_group_faculty_id_name'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     year = db.Column(db.Integer, nullable=False)
     duration = db.Column(db.Integer, nullable=False)
     name = db.Column(db.String(64), nullable=False)
     course = db.Column(db.Integer, nullable=False)
     status = db.Column(db.String(32))
-    faculty_id = db.Column(db.Integer, db.ForeignKey('faculty.id'), nullable=False)
-    students = db.relationship('Student', backref='group', cascade='all, delete-orphan')
+    faculty_id = db.Column(db.Integer, db.ForeignKey('faculty.id', ondelete='CASCADE'), nullable=False)
+    num_students = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    created_at = db.Column(db.DateTime, nullable=False, server_default=func.now())
+    updated_at = db.Column(db.DateTime, nullable=False, server_default=func.now(), index=True)
+    students = db.relationship('Student', backref='group', cascade='all, delete-orphan', lazy='raise',
+                               passive_deletes=True)
+
+class GroupNameSequence(db.Model):
+    # Последний выданный номер группы "<сокращение>-<номер>-<год>" для пары
+    # (факультет, год поступления); выдается атомарно в app.group_names
+    __tablename__ = 'group_name_sequence'
+
+    faculty_id = db.Column(db.Integer, db.ForeignKey('faculty.id', ondelete='CASCADE'), primary_key=True)
+    year = db.Column(db.Integer, primary_key=True)
+    last_index = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+class DeletedRecord(db.Model):
+    # Отметка об удалении строки faculty/group/student (пишется триггером БД) —
+    # для инкрементального экспорта ?since=
+    __tablename__ = 'deleted_record'
+
+    id = db.Column(db.Integer, primary_key=True)
+    table_name = db.Column(db.String(32), nullable=False)
+    record_id = db.Column(db.Integer, nullable=False)
+    deleted_at = db.Column(db.DateTime, nullable=False, server_default=func.now(), index=True)
+
+class Job(db.Model):
+    # Фоновая задача app.jobs. Очередь хранится в БД: статус и результат видны
+    # любому процессу, а задачи, не завершенные при остановке, выполняются снова
+    __table_args__ = (
+        db.Index('ix_job_status_updated_at', 'status', 'updated_at'),
+        db.Index('ix_job_status_heartbeat_at', 'status', 'heartbeat_at'),
+    )
+
+    id = db.Column(db.String(32), primary_key=True)
+    kind = db.Column(db.String(32), nullable=False)
+    status = db.Column(db.String(16), nullable=False, default='queued', server_default='queued')
+    progress = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # проценты
+    message = db.Column(db.String(255))
+    params = db.Column(db.JSON, nullable=False)
+    result = db.Column(db.JSON)
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, nullable=False)
+    started_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime, nullable=False)
+    heartbeat_at = db.Column(db.DateTime)  # обновляется, пока задача выполняется
+    finished_at = db.Column(db.DateTime)
 
 class Student(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -24,8 +93,10 @@ class Student(db.Model):
     date_of_birth = db.Column(db.Date, nullable=False)
     phone_number = db.Column(db.String(32), nullable=False)
     email = db.Column(db.String(128), nullable=False, unique=True)
-    group_id = db.Column(db.Integer, db.ForeignKey('group.id'), nullable=False)
-    photo_filename = db.Column(db.String(255), nullable=True)
+    group_id = db.Column(db.Integer, db.ForeignKey('group.id', ondelete='CASCADE'), nullable=False, index=True)
+    photo_filename = db.Column(db.String(255), nullable=True, index=True)
+    created_at = db.Column(db.DateTime, nullable=False, server_default=func.now())
+    updated_at = db.Column(db.DateTime, nullable=False, server_default=func.now(), index=True)
 
     def __repr__(self):
         return f"<Student {self.full_name}>"
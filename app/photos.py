@@ -0,0 +1,164 @@
+import hashlib
+import os
+import re
+import tempfile
+
+from flask import current_app
+from sqlalchemy import select
+
+from app import db
+from app.jobs import enqueue, job_handler
+from app.models import Student
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow не установлен — миниатюры не создаются, отдается оригинал
+    Image = ImageOps = None
+
+# Фото хранятся по хешу содержимого: <UPLOAD_FOLDER>/ab/ab12…ef.jpg, поэтому
+# одинаковые файлы не дублируются, а разные файлы с одним именем не затирают
+# друг друга. Миниатюры — <UPLOAD_FOLDER>/thumbs/<размер>/ab12…ef.{webp,jpg}.
+
+THUMBNAIL_SIZES = {
+    'card': (400, 400),
+    'list': (96, 96),
+}
+THUMBNAIL_FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpg': ('JPEG', {'quality': 85, 'optimize': True, 'progressive': True}),
+}
+
+HASHED_NAME_RE = re.compile(r'^[0-9a-f]{2}/([0-9a-f]{64})\.(jpg|png)$')
+
+
+def upload_folder():
+    return os.path.abspath(current_app.config['UPLOAD_FOLDER'])
+
+
+def photo_hash(filename):
+    # Хеш содержимого для имен вида ab/<sha256>.ext; None для старых имен файлов
+    match = HASHED_NAME_RE.match(filename or '')
+    return match.group(1) if match else None
+
+
+def thumbnail_path(folder, size, digest, fmt):
+    return os.path.join(folder, 'thumbs', size, f'{digest}.{fmt}')
+
+
+def store_photo(file_storage):
+    # Сохраняет загруженный файл под хешем содержимого и ставит в очередь
+    # создание миниатюр. Возвращает имя для Student.photo_filename.
+    # Запись и хеширование остаются в запросе: тело запроса доступно только в нем,
+    # а имя по хешу нужно до commit студента. Это один последовательный проход по
+    # файлу; декодирование и масштабирование изображения — в фоновой задаче.
+    folder = upload_folder()
+    extension = file_storage.filename.rsplit('.', 1)[1].lower()
+    extension = 'jpg' if extension == 'jpeg' else extension
+
+    digest = hashlib.sha256()
+    fd, tmp_path = tempfile.mkstemp(dir=folder, suffix='.upload')
+    try:
+        with os.fdopen(fd, 'wb') as tmp:
+            for chunk in iter(lambda: file_storage.stream.read(64 * 1024), b''):
+                digest.update(chunk)
+                tmp.write(chunk)
+        name = f'{digest.hexdigest()[:2]}/{digest.hexdigest()}.{extension}'
+        target = os.path.join(folder, name)
+        if os.path.exists(target):
+            os.remove(tmp_path)  # Такой файл уже есть — используем его
+        else:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.replace(tmp_path, target)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    schedule_thumbnails(folder, name)
+    return name
+
+
+def schedule_thumbnails(folder, name):
+    # Миниатюры создаются фоновой задачей (app.jobs); возвращает id задачи
+    if Image is None:
+        return None
+    return enqueue('thumbnails', folder=folder, name=name)
+
+
+@job_handler('thumbnails')
+def thumbnails_job(job, folder, name):
+    generate_thumbnails(folder, name)
+
+
+def generate_thumbnails(folder, name):
+    digest = photo_hash(name)
+    if digest is None:
+        return
+    with Image.open(os.path.join(folder, name)) as source:
+        image = ImageOps.exif_transpose(source).convert('RGB')
+    for size, dimensions in THUMBNAIL_SIZES.items():
+        thumb = image.copy()
+        thumb.thumbnail(dimensions, Image.LANCZOS)
+        for fmt, (pil_format, options) in THUMBNAIL_FORMATS.items():
+            target = thumbnail_path(folder, size, digest, fmt)
+            if os.path.exists(target):
+                continue
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(target))
+            with os.fdopen(fd, 'wb') as tmp:
+                thumb.save(tmp, pil_format, **options)
+            os.replace(tmp_path, target)
+
+
+def _remove_photo_files(folder, name):
+    digest = photo_hash(name)
+    if digest is not None:
+        for size in THUMBNAIL_SIZES:
+            for fmt in THUMBNAIL_FORMATS:
+                try:
+                    os.remove(thumbnail_path(folder, size, digest, fmt))
+                except OSError:
+                    pass
+    try:
+        os.remove(os.path.join(folder, name))
+    except OSError:
+        return False
+    return True
+
+
+def release_photo(name):
+    # Удаляет файл и его миниатюры, если на него больше не ссылается ни один
+    # студент (вызывать после commit). Возвращает False, если файла не было на диске.
+    if not name:
+        return True
+    if db.session.query(Student.id).filter_by(photo_filename=name).first() is not None:
+        return True
+    return _remove_photo_files(upload_folder(), name)
+
+
+def release_photos(names, chunk_size=500):
+    # То же для множества файлов: ссылки проверяются одним запросом на chunk_size
+    # имен. Возвращает число удаленных файлов.
+    folder = upload_folder()
+    names = sorted(set(filter(None, names)))
+    removed = 0
+    for start in range(0, len(names), chunk_size):
+        chunk = names[start:start + chunk_size]
+        in_use = set(db.session.scalars(
+            select(Student.photo_filename).where(Student.photo_filename.in_(chunk)).distinct()
+        ))
+        removed += sum(_remove_photo_files(folder, name) for name in chunk if name not in in_use)
+    return removed
+
+
+def release_photos_later(names):
+    # Файлы удаленных студентов освобождаются фоновой задачей после commit; возвращает id задачи
+    names = sorted(set(filter(None, names)))
+    if not names:
+        return None
+    return enqueue('release_photos', names=names)
+
+
+@job_handler('release_photos')
+def release_photos_job(job, names):
+    return {'removed': release_photos(names)}
@@ -0,0 +1,357 @@
+from datetime import date
+
+from flask import Blueprint, jsonify, request
+from sqlalchemy.exc import IntegrityError
+from werkzeug.exceptions import HTTPException
+
+from app import db
+from app.cache import invalidate_group
+from app.models import Faculty, Group, Student
+from app.photos import release_photo
+from app.search import SEARCH_DEFAULT_LIMIT, search
+from app.utils import decode_cursor, keyset_paginate
+
+# JSON API для интеграций: те же модели, что и у HTML-страниц, но без рендеринга
+# шаблонов. Списки постраничные по курсору (ключ — id), ?fields= выбирает столбцы,
+# ответы на GET снабжаются ETag и поддерживают If-None-Match.
+
+api_bp = Blueprint('api', __name__, url_prefix='/api/v1')
+
+API_DEFAULT_LIMIT = 100
+API_MAX_LIMIT = 1000
+# Максимум операций в одном пакетном запросе
+API_BATCH_LIMIT = 1000
+
+# Поля ресурсов: имя в JSON -> SQL-выражение. id выдается всегда.
+FACULTY_FIELDS = {
+    'id': Faculty.id,
+    'name': Faculty.name,
+    'short_name': Faculty.short_name,
+    'description': Faculty.description,
+    'num_groups': Faculty.num_groups,
+    'num_students': Faculty.num_students,
+}
+GROUP_FIELDS = {
+    'id': Group.id,
+    'name': Group.name,
+    'year': Group.year,
+    'duration': Group.duration,
+    'course': Group.course,
+    'status': Group.status,
+    'faculty_id': Group.faculty_id,
+    'num_students': Group.num_students,
+}
+STUDENT_FIELDS = {
+    'id': Student.id,
+    'full_name': Student.full_name,
+    'date_of_birth': Student.date_of_birth,
+    'phone_number': Student.phone_number,
+    'email': Student.email,
+    'group_id': Student.group_id,
+    'photo_filename': Student.photo_filename,
+}
+
+# Поля студента, которые можно передавать при создании и изменении
+STUDENT_WRITABLE_FIELDS = ('full_name', 'date_of_birth', 'phone_number', 'email', 'group_id')
+
+
+class ApiError(Exception):
+    def __init__(self, status, message, errors=None):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.errors = errors
+
+
+@api_bp.errorhandler(ApiError)
+def handle_api_error(error):
+    payload = {'error': error.message}
+    if error.errors:
+        payload['errors'] = error.errors
+    return jsonify(payload), error.status
+
+
+@api_bp.errorhandler(HTTPException)
+def handle_http_error(error):
+    # get_or_404, abort и т.п. внутри API отвечают JSON, а не HTML-страницей
+    return jsonify({'error': error.description}), error.code
+
+
+def _serialize(value):
+    return value.isoformat() if isinstance(value, date) else value
+
+
+def _selected_fields(available):
+    raw = request.args.get('fields', '').strip()
+    if not raw:
+        return list(available)
+    names = [name.strip() for name in raw.split(',') if name.strip()]
+    unknown = [name for name in names if name not in available]
+    if unknown:
+        raise ApiError(400, f'Неизвестные поля: {", ".join(unknown)}.')
+    return ['id'] + [name for name in dict.fromkeys(names) if name != 'id']
+
+
+def _resource_query(available, fields):
+    return db.session.query(*(available[name].label(name) for name in fields))
+
+
+def _row_dict(row, fields):
+    return {name: _serialize(getattr(row, name)) for name in fields}
+
+
+def _limit():
+    limit = request.args.get('limit', API_DEFAULT_LIMIT, type=int)
+    return min(max(limit, 1), API_MAX_LIMIT)
+
+
+def _conditional(payload):
+    # ETag по содержимому ответа: повторный запрос без изменений получает 304 без тела
+    response = jsonify(payload)
+    response.add_etag()
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+
+def _list_response(available, id_column, filters):
+    fields = _selected_fields(available)
+    query = _resource_query(available, fields).add_columns(id_column.label('sort_key'))
+    for column, value in filters:
+        query = query.filter(column == value)
+    pagination = keyset_paginate(
+        query, id_column, id_column, _limit(),
+        after=decode_cursor(request.args.get('after')),
+        before=decode_cursor(request.args.get('before')),
+    )
+    return _conditional({
+        'data': [_row_dict(row, fields) for row in pagination.items],
+        'meta': {
+            'total': pagination.total,
+            'next_cursor': pagination.next_cursor,
+            'prev_cursor': pagination.prev_cursor,
+        },
+    })
+
+
+def _detail_response(available, id_column, object_id):
+    fields = _selected_fields(available)
+    row = _resource_query(available, fields).filter(id_column == object_id).first()
+    if row is None:
+        raise ApiError(404, 'Объект не найден.')
+    return _conditional({'data': _row_dict(row, fields)})
+
+
+def _int_filters(*params):
+    filters = []
+    for column, name in params:
+        raw = request.args.get(name)
+        if raw is None:
+            continue
+        try:
+            filters.append((column, int(raw)))
+        except ValueError:
+            raise ApiError(400, f'Параметр {name} должен быть целым числом.')
+    return filters
+
+
+@api_bp.route('/faculties')
+def list_faculties():
+    return _list_response(FACULTY_FIELDS, Faculty.id, [])
+
+
+@api_bp.route('/faculties/<int:faculty_id>')
+def get_faculty(faculty_id):
+    return _detail_response(FACULTY_FIELDS, Faculty.id, faculty_id)
+
+
+@api_bp.route('/groups')
+def list_groups():
+    return _list_response(GROUP_FIELDS, Group.id, _int_filters((Group.faculty_id, 'faculty_id')))
+
+
+@api_bp.route('/groups/<int:group_id>')
+def get_group(group_id):
+    return _detail_response(GROUP_FIELDS, Group.id, group_id)
+
+
+@api_bp.route('/students')
+def list_students():
+    return _list_response(STUDENT_FIELDS, Student.id, _int_filters((Student.group_id, 'group_id')))
+
+
+@api_bp.route('/students/<int:student_id>')
+def get_student(student_id):
+    return _detail_response(STUDENT_FIELDS, Student.id, student_id)
+
+
+@api_bp.route('/search')
+def global_search():
+    # ?q=строка&kind=student,group,faculty&limit=N — результаты по релевантности
+    query = request.args.get('q', '').strip()
+    if not query:
+        raise ApiError(400, 'Не указан параметр q.')
+    kinds = [kind.strip() for kind in request.args.get('kind', '').split(',') if kind.strip()]
+    results = search(query, kinds=kinds, limit=request.args.get('limit', SEARCH_DEFAULT_LIMIT, type=int))
+    return _conditional({'data': [result.to_dict() for result in results]})
+
+
+def _clean_student(data, required):
+    # Проверка одного объекта студента; возвращает (значения, ошибка)
+    if not isinstance(data, dict):
+        return None, 'Ожидается объект.'
+    unknown = [key for key in data if key not in STUDENT_WRITABLE_FIELDS and key != 'id']
+    if unknown:
+        return None, f'Неизвестные поля: {", ".join(unknown)}.'
+    values = {key: data[key] for key in STUDENT_WRITABLE_FIELDS if key in data}
+    missing = [key for key in required if values.get(key) in (None, '')]
+    if missing:
+        return None, f'Не заполнены поля: {", ".join(missing)}.'
+    for key in ('full_name', 'phone_number', 'email'):
+        if key in values:
+            if not isinstance(values[key], str) or not values[key].strip():
+                return None, f'Поле {key} должно быть непустой строкой.'
+            values[key] = values[key].strip()
+    if 'date_of_birth' in values:
+        try:
+            values['date_of_birth'] = date.fromisoformat(values['date_of_birth'])
+        except (TypeError, ValueError):
+            return None, 'Неверный формат даты рождения. Используйте ГГГГ-ММ-ДД.'
+    if 'group_id' in values and (not isinstance(values['group_id'], int) or isinstance(values['group_id'], bool)):
+        return None, 'Поле group_id должно быть целым числом.'
+    return values, None
+
+
+def _batch_list(payload, key):
+    items = payload.get(key) or []
+    if not isinstance(items, list):
+        raise ApiError(400, f'Поле {key} должно быть списком.')
+    return items
+
+
+@api_bp.route('/students/batch', methods=['POST'])
+def batch_students():
+    # Пакетное создание, изменение и удаление студентов одной транзакцией:
+    # {"create": [{...}], "update": [{"id": 1, ...}], "delete": [2, 3]}.
+    # Если хотя бы одна операция некорректна, не применяется ни одна.
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        raise ApiError(400, 'Ожидается JSON-объект с полями create, update, delete.')
+    to_create = _batch_list(payload, 'create')
+    to_update = _batch_list(payload, 'update')
+    to_delete = _batch_list(payload, 'delete')
+    if len(to_create) + len(to_update) + len(to_delete) > API_BATCH_LIMIT:
+        raise ApiError(413, f'Не больше {API_BATCH_LIMIT} операций в одном запросе.')
+
+    errors = []
+    creates, updates = [], {}
+    for index, data in enumerate(to_create):
+        values, error = _clean_student(data, STUDENT_WRITABLE_FIELDS)
+        if error:
+            errors.append({'op': 'create', 'index': index, 'message': error})
+        else:
+            creates.append((index, values))
+    for index, data in enumerate(to_update):
+        values, error = _clean_student(data, ())
+        if error is None and not isinstance(data.get('id'), int):
+            error = 'Не указан id студента.'
+        if error is None and data['id'] in updates:
+            error = 'id повторяется в запросе.'
+        if error:
+            errors.append({'op': 'update', 'index': index, 'message': error})
+        else:
+            updates[data['id']] = (index, values)
+    delete_ids = []
+    for index, student_id in enumerate(to_delete):
+        if not isinstance(student_id, int) or isinstance(student_id, bool):
+            errors.append({'op': 'delete', 'index': index, 'message': 'Ожидается id студента.'})
+        else:
+            delete_ids.append(student_id)
+
+    # Все нужные строки читаются несколькими запросами на весь пакет
+    students = {}
+    ids = list(updates) + delete_ids
+    if ids:
+        students = {s.id: s for s in Student.query.filter(Student.id.in_(ids))}
+    group_ids = {values['group_id'] for _, values in creates if 'group_id' in values}
+    group_ids |= {values['group_id'] for _, values in updates.values() if 'group_id' in values}
+    group_faculties = {}
+    if group_ids or students:
+        group_ids |= {s.group_id for s in students.values()}
+        group_faculties = dict(db.session.query(Group.id, Group.faculty_id)
+                               .filter(Group.id.in_(group_ids)).all())
+    emails = [values['email'] for _, values in creates if 'email' in values]
+    emails += [values['email'] for _, values in updates.values() if 'email' in values]
+    email_owners = {}
+    if emails:
+        email_owners = dict(db.session.query(Student.email, Student.id)
+                            .filter(Student.email.in_(emails)).all())
+
+    deleted_set = set(delete_ids)
+    seen_emails = {}
+    for op, index, student_id, values in (
+        [('create', index, None, values) for index, values in creates] +
+        [('update', index, student_id, values) for student_id, (index, values) in updates.items()]
+    ):
+        error = None
+        if student_id is not None and student_id not in students:
+            error = 'Студент не найден.'
+        elif student_id is not None and student_id in deleted_set:
+            error = 'Студент одновременно изменяется и удаляется.'
+        elif 'group_id' in values and values['group_id'] not in group_faculties:
+            error = 'Группа с таким id не найдена.'
+        elif 'email' in values:
+            owner = email_owners.get(values['email'])
+            # Email может освободиться, если его владелец удаляется в этом же пакете
+            if owner is not None and owner != student_id and owner not in deleted_set:
+                error = 'Студент с таким email уже существует.'
+            elif values['email'] in seen_emails:
+                error = 'Email повторяется в запросе.'
+            seen_emails[values['email']] = True
+        if error:
+            errors.append({'op': op, 'index': index, 'message': error})
+    for index, student_id in enumerate(to_delete):
+        if student_id in deleted_set and student_id not in students:
+            errors.append({'op': 'delete', 'index': index, 'message': 'Студент не найден.'})
+
+    if errors:
+        errors.sort(key=lambda e: (('create', 'update', 'delete').index(e['op']), e['index']))
+        raise ApiError(422, 'Пакет не применен: есть ошибки.', errors)
+
+    # Затронутые группы (старые и новые) — для сброса кеша страниц
+    touched_groups = {values['group_id'] for _, values in creates}
+    photos_to_release = []
+    created = []
+    try:
+        # Удаления выполняются первыми, чтобы освобожденные email можно было занять
+        # изменениями и вставками этого же пакета (flush ORM выполняет UPDATE до DELETE)
+        for student_id in dict.fromkeys(delete_ids):
+            student = students[student_id]
+            touched_groups.add(student.group_id)
+            if student.photo_filename:
+                photos_to_release.append(student.photo_filename)
+            db.session.delete(student)
+        db.session.flush()
+        for student_id, (_, values) in updates.items():
+            student = students[student_id]
+            touched_groups.add(student.group_id)
+            for key, value in values.items():
+                setattr(student, key, value)
+            touched_groups.add(student.group_id)
+        db.session.flush()
+        created = [Student(**values) for _, values in creates]
+        db.session.add_all(created)
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        raise ApiError(409, 'Конфликт данных (например, email уже занят).')
+
+    for group_id in touched_groups:
+        invalidate_group(group_faculties[group_id], group_id)
+    for filename in photos_to_release:
+        release_photo(filename)
+
+    return jsonify({
+        'created': [student.id for student in created],
+        'updated': list(updates),
+        'deleted': list(dict.fromkeys(delete_ids)),
+    })
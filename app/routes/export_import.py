@@ -1,47 +1,170 @@
-from flask import Blueprint, send_file
-from app import db
-from app.models import Faculty, Group, Student
-import pandas as pd
-import io
+from flask import Blueprint, Response, current_app, flash, render_template, request, stream_with_context, url_for
+from app.exporter import (COLUMNAR_FORMATS, PARTITIONED_TABLES, columnar_available, export_watermark,
+                          get_export_table, iter_csv, iter_ndjson, parse_since, write_columnar, write_xlsx)
+from app.cache import cache
+from app.importer import import_workbook
+from app.jobs import JOB_FAILED, JOB_SUCCEEDED, JobError, enqueue, get_job, job_handler, jobs_folder
+from app.routes.jobs import accepted
+import os
+import shutil
+import tempfile
+import zipfile
 
 export_import_bp = Blueprint('export_import', __name__, url_prefix='/data')
 
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+def _streamed(generator, mimetype, download_name, watermark=None):
+    response = Response(stream_with_context(generator), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename={download_name}'
+    if watermark:
+        response.headers['X-Export-Watermark'] = watermark
+    return response
+
+@job_handler('export_xlsx')
+def export_xlsx_job(job, since=None, watermark=None):
+    # XLSX — zip-архив, поэтому книга собирается в файл результата задачи.
+    # С since — только изменения (и лист Deleted), watermark — since для следующей выгрузки
+    path = job.result_path('xlsx')
+    try:
+        with open(path, 'wb') as output:
+            write_xlsx(output, progress=lambda done, total: job.progress(90 * done / (total or 1)),
+                       since=parse_since(since) if since else None)
+    except BaseException:
+        if os.path.exists(path):
+            os.remove(path)
+        raise
+    if since:
+        return job.file_result(path, 'university_data_export_delta.xlsx', XLSX_MIMETYPE, watermark=watermark)
+    return job.file_result(path, 'university_data_export.xlsx', XLSX_MIMETYPE)
+
+@job_handler('export_columnar')
+def export_columnar_job(job, export_format, table=None, partition=False, since=None, watermark=None):
+    # Одна таблица — файл .parquet/.arrow; вся база или разбиение по факультетам —
+    # zip-архив с файлами таблиц (для DuckDB: read_parquet('students/*/*.parquet', hive_partitioning=true))
+    extension, mimetype = COLUMNAR_FORMATS[export_format]
+    name = 'university_data_export' + (f'_{table}' if table else '') \
+        + ('_by_faculty' if partition else '') + ('_delta' if since else '')
+    directory = tempfile.mkdtemp(dir=jobs_folder())
+    try:
+        written = write_columnar(directory, export_format, table_key=table, partition=partition,
+                                 since=parse_since(since) if since else None,
+                                 progress=lambda done, total: job.progress(90 * done / (total or 1)))
+        if len(written) == 1 and os.path.isfile(os.path.join(directory, written[0])):
+            path = job.result_path(extension)
+            shutil.move(os.path.join(directory, written[0]), path)
+            download_name = f'{name}.{extension}'
+        else:
+            # Parquet уже сжат, Arrow IPC пишется без сжатия
+            compression = zipfile.ZIP_STORED if export_format == 'parquet' else zipfile.ZIP_DEFLATED
+            path = job.result_path('zip')
+            with zipfile.ZipFile(path, 'w', compression) as archive:
+                for root, _, files in os.walk(directory):
+                    for filename in sorted(files):
+                        full_path = os.path.join(root, filename)
+                        archive.write(full_path, os.path.relpath(full_path, directory))
+            mimetype, download_name = 'application/zip', f'{name}_{export_format}.zip'
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    return job.file_result(path, download_name, mimetype, watermark=watermark)
+
+@job_handler('import_excel')
+def import_excel_job(job, path, next_url):
+    try:
+        with open(path, 'rb') as fileobj:
+            # Прогресс — после commit каждой пачки: сессия задачи не держит запись в SQLite
+            report = import_workbook(fileobj, progress=lambda done, total: job.progress(
+                5 + 90 * done / (total or 1), f'Записано строк: {done} из {total}'))
+    except ValueError as e:
+        raise JobError(f'Не удалось прочитать файл: {str(e)}')
+    finally:
+        os.remove(path)
+    cache.clear()
+    return {'report': report.to_dict(), 'redirect': f'{next_url}?job={job.id}'}
+
 @export_import_bp.route('/export/excel')
 def export_excel():
-    try:
-        # Извлечение данных
-        faculties = Faculty.query.all()
-        groups = Group.query.all()
-        students = Student.query.all()
-
-        # Преобразование в списки словарей (для Pandas DataFrame)
-        faculties_data = [{'id': f.id, 'name': f.name, 'short_name': f.short_name, 'description': f.description} for f in faculties]
-        groups_data = [{'id': g.id, 'name': g.name, 'year': g.year, 'duration': g.duration, 'faculty_id': g.faculty_id, 'course': g.course, 'status': g.status} for g in groups]
-        students_data = [{'id': s.id, 'full_name': s.full_name, 'date_of_birth': s.date_of_birth.isoformat() if s.date_of_birth else None, 'phone_number': s.phone_number, 'email': s.email, 'group_id': s.group_id} for s in students]
-
-        # Создание DataFrame
-        df_faculties = pd.DataFrame(faculties_data)
-        df_groups = pd.DataFrame(groups_data)
-        df_students = pd.DataFrame(students_data)
-
-        # Создание Excel файла в памяти
-        output = io.BytesIO()
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            df_faculties.to_excel(writer, sheet_name='Faculties', index=False)
-            df_groups.to_excel(writer, sheet_name='Groups', index=False)
-            df_students.to_excel(writer, sheet_name='Students', index=False)
-        
-        output.seek(0)
-
-        return send_file(
-            output,
-            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-            as_attachment=True,
-            download_name='university_data_export.xlsx'
-        )
-
-    except Exception as e:
-        # Можно добавить логирование ошибки здесь
-        # flash(f"Ошибка при экспорте данных: {str(e)}", "danger")
-        # return redirect(url_for('main.welcome')) # или куда-то еще
-        return str(e), 500 # Простой ответ об ошибке для отладки 
\ No newline at end of file
+    export_format = request.args.get('format', 'xlsx')
+
+    # Инкрементальный экспорт: ?since=<ISO 8601> — строки, измененные с этого момента,
+    # и отметки об удаленных строках. Значение since для следующей выгрузки
+    # возвращается в заголовке X-Export-Watermark (для XLSX — в результате задачи)
+    since = watermark = None
+    if request.args.get('since'):
+        try:
+            since = parse_since(request.args['since'])
+        except ValueError:
+            return 'Неверный формат since: ожидается дата и время ISO 8601.', 400
+        watermark = export_watermark(current_app.config.get('EXPORT_DELTA_LAG', 60))
+    suffix = '_delta' if since is not None else ''
+
+    # CSV и NDJSON отдаются потоком по мере чтения строк из БД
+    if export_format == 'csv':
+        table = get_export_table(request.args.get('table', 'students'), since)
+        if table is None:
+            return 'Неизвестная таблица для экспорта в CSV.', 400
+        _, table_key, columns = table
+        return _streamed(iter_csv(columns, since=since), 'text/csv; charset=utf-8',
+                         f'university_data_export_{table_key}{suffix}.csv', watermark)
+    if export_format == 'ndjson':
+        return _streamed(iter_ndjson(since=since), 'application/x-ndjson',
+                         f'university_data_export{suffix}.ndjson', watermark)
+    # Parquet и Arrow IPC (для аналитики: DuckDB, pandas) — фоновой задачей, как XLSX.
+    # ?table= — одна таблица, ?partition=faculty — наборы групп и студентов по факультетам
+    if export_format in COLUMNAR_FORMATS:
+        if not columnar_available():
+            return 'Экспорт в Parquet и Arrow недоступен: не установлен пакет pyarrow.', 501
+        table = request.args.get('table') or None
+        if table is not None and get_export_table(table, since) is None:
+            return 'Неизвестная таблица для экспорта.', 400
+        partition = request.args.get('partition')
+        if partition not in (None, '', 'faculty'):
+            return 'Поддерживается только разбиение partition=faculty.', 400
+        job_id = enqueue('export_columnar', export_format=export_format, table=table,
+                         partition=bool(partition) and (table is None or table in PARTITIONED_TABLES),
+                         since=since.isoformat() if since is not None else None, watermark=watermark)
+        return accepted(job_id, f'Экспорт данных в {export_format.capitalize()}')
+    if export_format != 'xlsx':
+        return 'Неизвестный формат экспорта.', 400
+
+    # Книга XLSX собирается фоновой задачей; ответ 202 со страницей статуса,
+    # файл скачивается по /jobs/<id>/result
+    if since is not None:
+        job_id = enqueue('export_xlsx', since=since.isoformat(), watermark=watermark)
+        return accepted(job_id, 'Экспорт изменений в Excel')
+    return accepted(enqueue('export_xlsx'), 'Экспорт данных в Excel')
+
+@export_import_bp.route('/import/excel', methods=['GET', 'POST'])
+def import_excel():
+    report = None
+    if request.method == 'POST':
+        upload = request.files.get('file')
+        if not upload or not upload.filename:
+            flash('Выберите файл Excel для импорта.', 'danger')
+        elif not upload.filename.lower().endswith('.xlsx'):
+            flash('Поддерживаются только файлы .xlsx.', 'danger')
+        else:
+            # Файл сохраняется рядом с результатами задач и импортируется в фоне
+            fd, path = tempfile.mkstemp(dir=jobs_folder(), suffix='.xlsx')
+            with os.fdopen(fd, 'wb') as target:
+                upload.save(target)
+            try:
+                job_id = enqueue('import_excel', path=path, next_url=url_for('.import_excel'))
+            except Exception:
+                os.remove(path)
+                raise
+            return accepted(job_id, 'Импорт данных из Excel')
+
+    job = get_job(request.args['job']) if request.args.get('job') else None
+    if job is not None and job.kind == 'import_excel':
+        if job.status == JOB_SUCCEEDED:
+            report = job.result['report']
+            written = sum(report['written'].values())
+            if not report['errors']:
+                flash(f'Импорт завершен: записано строк — {written}.', 'success')
+            else:
+                flash(f'Импорт завершен с ошибками: записано строк — {written}, '
+                      f'пропущено — {sum(report["skipped"].values())}.', 'warning')
+        elif job.status == JOB_FAILED:
+            flash(job.error, 'danger')
+    return render_template('export_import/import.html', report=report)
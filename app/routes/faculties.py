@@ -1,20 +1,54 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash
 from app import db
 from app.models import Faculty, Group, Student
-from sqlalchemy import func, or_
+from app.cache import FACULTIES_TAG, cache, invalidate_faculty
+from app.deletion import delete_faculties
+from app.instrumentation import log_view_error
+from app.utils import paginate_with_total
+from sqlalchemy import func, or_, update
+from sqlalchemy.orm import aliased
 import re
 
 bp = Blueprint('faculties', __name__, url_prefix='/faculties')
 
-def get_sort_key_faculties(item, column):
-    val = item.get(column)
-    if isinstance(val, (int, float)):
-        return val
-    if isinstance(val, str):
-        return val.lower()
-    return val
+# Колонки, по которым разрешена сортировка списка факультетов.
+# 'groups'/'students' — старые ключи из шаблона, оставлены как синонимы.
+FACULTY_SORT_COLUMNS = {
+    'id': Faculty.id,
+    'name': func.lower(Faculty.name),
+    'short_name': func.lower(Faculty.short_name),
+    'description': func.lower(Faculty.description),
+    'num_groups': Faculty.num_groups,
+    'num_students': Faculty.num_students,
+    'groups': Faculty.num_groups,
+    'students': Faculty.num_students,
+}
+
+def rename_faculty_groups(faculty_id, old_short_name, new_short_name):
+    # Переименование групп вида "<сокращение>-<номер>-<год>" одним UPDATE.
+    # Совпадать должно сокращение целиком с дефисом и цифрой номера после него:
+    # при сокращении "ИВТ" группы "ИВТМ-1-21" и "ИВТ-М-21" не переименовываются.
+    # Группы, новое имя которых уже занято другой группой факультета, находятся
+    # одним запросом заранее и пропускаются. Возвращает (число переименованных
+    # групп, список имен пропущенных групп). Commit выполняет вызывающий код.
+    old_prefix = f'{old_short_name}-'
+    number_start = func.substr(Group.name, len(old_prefix) + 1, 1)
+    has_old_prefix = (func.substr(Group.name, 1, len(old_prefix)) == old_prefix) & number_start.between('0', '9')
+    new_name = new_short_name + '-' + func.substr(Group.name, len(old_prefix) + 1)
+
+    other = aliased(Group)
+    conflicts = db.session.query(Group.id, Group.name).join(
+        other, (other.faculty_id == Group.faculty_id) & (other.name == new_name) & (other.id != Group.id)
+    ).filter(Group.faculty_id == faculty_id, has_old_prefix).distinct().all()
+
+    stmt = update(Group).where(Group.faculty_id == faculty_id, has_old_prefix).values(name=new_name)
+    if conflicts:
+        stmt = stmt.where(Group.id.not_in([group_id for group_id, _ in conflicts]))
+    result = db.session.execute(stmt.execution_options(synchronize_session=False))
+    return result.rowcount, [name for _, name in conflicts]
 
 @bp.route('/')
+@cache.cached_view(lambda: [FACULTIES_TAG])
 def list_faculties():
     page = request.args.get('page', 1, type=int)
     per_page = 10
@@ -22,9 +56,19 @@ def list_faculties():
     sort_column = request.args.get('sort_by', 'default')
     sort_order = request.args.get('order', 'asc')
 
-    query = Faculty.query
+    # Один запрос без JOIN: количество групп и студентов хранится в счетчиках
+    # факультета; поиск, сортировка и LIMIT/OFFSET выполняются на стороне БД
+    query = db.session.query(
+        Faculty.id,
+        Faculty.name,
+        Faculty.short_name,
+        Faculty.description,
+        Faculty.num_groups,
+        Faculty.num_students,
+    )
+
     if search_query:
-        search_term = f"%{search_query.lower()}%".lower()
+        search_term = f"%{search_query.lower()}%"
         query = query.filter(
             or_(
                 func.lower(Faculty.name).like(search_term),
@@ -32,70 +76,15 @@ def list_faculties():
                 func.lower(Faculty.description).like(search_term)
             )
         )
-    
-    all_matching_faculties_from_db = query.all()
-    
-    faculties_processed = []
-    for faculty_obj in all_matching_faculties_from_db:
-        num_groups = Group.query.with_parent(faculty_obj).count()
-        num_students = Student.query.join(Group).filter(Group.faculty_id == faculty_obj.id).count() if hasattr(Student, 'group_id') else 0
-        faculties_processed.append({
-            'id': faculty_obj.id,
-            'name': faculty_obj.name,
-            'short_name': faculty_obj.short_name,
-            'description': faculty_obj.description,
-            'num_groups': num_groups,
-            'num_students': num_students
-        })
-
-    if sort_column != 'default' and faculties_processed and sort_column in faculties_processed[0].keys():
-        faculties_processed.sort(key=lambda x: get_sort_key_faculties(x, sort_column), reverse=(sort_order == 'desc'))
-    elif not faculties_processed:
-        pass
+
+    sort_expr = FACULTY_SORT_COLUMNS.get(sort_column)
+    if sort_expr is not None:
+        sort_expr = sort_expr.desc() if sort_order == 'desc' else sort_expr.asc()
+        query = query.order_by(sort_expr, Faculty.id)
     else:
-         faculties_processed.sort(key=lambda x: x['id'])
-
-    total_items = len(faculties_processed)
-    start_index = (page - 1) * per_page
-    end_index = start_index + per_page
-    paginated_faculties_list = faculties_processed[start_index:end_index]
-
-    class SimplePagination:
-        def __init__(self, page, per_page, total_items, items):
-            self.page = page
-            self.per_page = per_page
-            self.total = total_items
-            self.items = items
-            self.pages = (total_items + per_page - 1) // per_page if total_items > 0 else 0
-
-        @property
-        def has_prev(self):
-            return self.page > 1
-
-        @property
-        def has_next(self):
-            return self.page < self.pages
-
-        @property
-        def prev_num(self):
-            return self.page - 1 if self.has_prev else None
-
-        @property
-        def next_num(self):
-            return self.page + 1 if self.has_next else None
-
-        def iter_pages(self, left_edge=1, left_current=1, right_current=2, right_edge=1):
-            last = 0
-            for num in range(1, self.pages + 1):
-                if num <= left_edge or \
-                   (num > self.page - left_current - 1 and num < self.page + right_current) or \
-                   num > self.pages - right_edge:
-                    if last + 1 != num:
-                        yield None
-                    yield num
-                    last = num
-    
-    pagination_obj = SimplePagination(page, per_page, total_items, paginated_faculties_list)
+        query = query.order_by(Faculty.id)
+
+    pagination_obj = paginate_with_total(query, page, per_page)
 
     return render_template('faculties/list.html', 
                            pagination=pagination_obj,
@@ -120,6 +109,7 @@ def create_faculty():
                 new_faculty = Faculty(name=name, short_name=short_name, description=description)
                 db.session.add(new_faculty)
                 db.session.commit()
+                invalidate_faculty(new_faculty.id)
                 flash(f'Факультет "{new_faculty.name}" успешно создан!', 'success')
                 return redirect(url_for('.list_faculties'))
         else:
@@ -151,36 +141,24 @@ def edit_faculty(id):
                 
                 db.session.add(faculty_to_edit)
 
-                if original_short_name != new_short_name:
-                    related_groups = Group.query.filter_by(faculty_id=id).all()
-                    for group in related_groups:
-                        try:
-                            parts = group.name.split('-')
-                            if len(parts) == 3:
-                                number_str = parts[1]
-                                year_short_str = parts[2]
-                                new_group_name = f"{new_short_name}-{number_str}-{year_short_str}"
-                                
-                                check_existing = Group.query.filter_by(name=new_group_name, faculty_id=id).first()
-                                if check_existing and check_existing.id != group.id:
-                                    flash(f'Не удалось автоматически обновить имя группы {group.name} из-за конфликта. Обновите вручную.', 'warning')
-                                    continue
-
-                                group.name = new_group_name
-                                db.session.add(group)
-                            else:
-                                flash(f'Не удалось автоматически разобрать имя группы {group.name} для обновления.', 'warning')
-                        except Exception as e_group_rename:
-                            flash(f'Ошибка при попытке автоматического обновления имени группы {group.name}: {str(e_group_rename)}', 'warning')
-                
                 try:
+                    # Имена групп меняются в той же транзакции, что и сам факультет
+                    renamed_count, conflicting_groups = 0, []
+                    if original_short_name != new_short_name:
+                        db.session.flush()
+                        renamed_count, conflicting_groups = rename_faculty_groups(id, original_short_name, new_short_name)
                     db.session.commit()
+                    invalidate_faculty(id, renamed=True)
                     flash(f'Факультет "{faculty_to_edit.name}" успешно обновлен!', 'success')
                     if original_short_name != new_short_name:
-                         flash(f'Имена связанных групп были также обновлены с новым сокращением "{new_short_name}".', 'info')
+                        flash(f'Переименовано групп с новым сокращением "{new_short_name}": {renamed_count}.', 'info')
+                    if conflicting_groups:
+                        flash(f'Не удалось автоматически обновить имена групп из-за конфликта: '
+                              f'{", ".join(conflicting_groups)}. Обновите вручную.', 'warning')
                     return redirect(url_for('.list_faculties'))
                 except Exception as e_commit:
                     db.session.rollback()
+                    log_view_error()
                     flash(f'Ошибка при сохранении изменений: {str(e_commit)}', 'danger')
         else:
             flash('Название и сокращение являются обязательными полями.', 'danger')
@@ -193,14 +171,17 @@ def edit_faculty(id):
 @bp.route('/<int:id>/delete', methods=['POST'])
 def delete_faculty(id):
     faculty_to_delete = Faculty.query.get_or_404(id)
-    if faculty_to_delete.groups:
+    if db.session.query(Group.id).filter_by(faculty_id=id).first() is not None:
         flash(f'Факультет "{faculty_to_delete.name}" не может быть удален, так как за ним закреплены группы.', 'danger')
         return redirect(url_for('.list_faculties'))
+    faculty_name = faculty_to_delete.name
     try:
-        db.session.delete(faculty_to_delete)
+        delete_faculties([id])
         db.session.commit()
-        flash(f'Факультет "{faculty_to_delete.name}" успешно удален!', 'success')
+        invalidate_faculty(id, renamed=True)
+        flash(f'Факультет "{faculty_name}" успешно удален!', 'success')
     except Exception as e:
         db.session.rollback()
+        log_view_error()
         flash(f'Ошибка при удалении факультета: {str(e)}', 'danger')
     return redirect(url_for('.list_faculties'))
@@ -1,14 +1,19 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, abort
 from app.models import Faculty, Group, Student
 from app import db
-from sqlalchemy import func, or_
-import functools # для functools.cmp_to_key если понадобится сложная сортировка
+from app.cache import cache, faculty_tag, invalidate_faculty, invalidate_group
+from app.utils import paginate_with_total
+from app.academic import (STATUS_GRADUATED, STATUS_STUDYING, compute_course, compute_status,
+                          current_academic_year)
+from app.group_names import create_groups, next_group_name
+from app.deletion import delete_groups
+from app.instrumentation import log_view_error
+from app.photos import release_photos_later
+from sqlalchemy import String, cast, func, or_
+from sqlalchemy.orm import joinedload
 
-# Условный "текущий" год для всех расчетов курса и статуса в системе
-EFFECTIVE_SYSTEM_YEAR = 2025
-# Условный "текущий" месяц для определения начала учебного года (например, сентябрь)
-# Если EFFECTIVE_SYSTEM_YEAR используется как уже НАЧАЛО учебного года, то месяц не так важен.
-# Для простоты будем считать, что EFFECTIVE_SYSTEM_YEAR - это уже актуальный учебный год.
+# Курс и статус хранятся в Group.course/Group.status: они рассчитываются при
+# создании/изменении группы и обновляются при смене учебного года (app.academic)
 
 bp = Blueprint('groups', __name__, url_prefix='/groups') # Общий префикс для групп
 
@@ -16,17 +21,11 @@ bp = Blueprint('groups', __name__, url_prefix='/groups') # Общий префи
 # Он будет доступен через /faculties/<faculty_id>/groups/
 faculty_groups_bp = Blueprint('faculty_groups', __name__, url_prefix='/faculties/<int:faculty_id>/groups')
 
-def get_sort_key(item, column):
-    # Вспомогательная функция для получения ключа сортировки
-    # Для числовых полей возвращаем число, для строковых - строку в нижнем регистре
-    val = item.get(column)
-    if isinstance(val, (int, float)):
-        return val
-    if isinstance(val, str):
-        return val.lower()
-    return val # На случай None или других типов
+# Максимум групп в одном наборе (bulk_create_groups)
+GROUPS_BULK_MAX = 50
 
 @faculty_groups_bp.route('/')
+@cache.cached_view(lambda faculty_id: [faculty_tag(faculty_id)])
 def list_groups(faculty_id):
     faculty = Faculty.query.get_or_404(faculty_id)
     
@@ -36,95 +35,55 @@ def list_groups(faculty_id):
     sort_column_from_request = request.args.get('sort_by')
     current_sort_order = request.args.get('order', 'asc')
 
-    groups_from_db = Group.query.filter_by(faculty_id=faculty.id).all()
-    
-    processed_groups = []
-    for group_obj in groups_from_db:
-        course = (EFFECTIVE_SYSTEM_YEAR - group_obj.year) + 1
-        if course < 1: course = 1
-        elif course > group_obj.duration: course = group_obj.duration
-        
-        status = "Учится"
-        if (EFFECTIVE_SYSTEM_YEAR - group_obj.year + 1) > group_obj.duration: status = "Выпущена"
-        
-        num_students = Student.query.filter_by(group_id=group_obj.id).count() if hasattr(Student, 'group_id') else 0
-        
-        processed_groups.append({
-            'id': group_obj.id,
-            'name': group_obj.name,
-            'year': group_obj.year,
-            'duration': group_obj.duration,
-            'course': course,
-            'status': status,
-            'num_students': num_students,
-            'faculty_short_name': faculty.short_name # Это может не понадобиться в контексте этого списка
-        })
+    # Количество студентов берется из счетчика Group.num_students
+    query = db.session.query(
+        Group.id,
+        Group.name,
+        Group.year,
+        Group.duration,
+        Group.course,
+        Group.status,
+        Group.num_students,
+    ).filter(Group.faculty_id == faculty.id)
 
-    # Фильтрация (поиск)
+    # Фильтрация (поиск) — подстрока в любом из отображаемых столбцов
     if search_query:
-        filtered_groups = []
         sq_lower = search_query.lower()
-        for group_dict in processed_groups:
-            if (
-                sq_lower in str(group_dict['name']).lower() or
-                sq_lower in str(group_dict['year']).lower() or
-                sq_lower in str(group_dict['duration']).lower() or
-                sq_lower in str(group_dict['course']).lower() or
-                sq_lower in str(group_dict['status']).lower() or
-                sq_lower in str(group_dict['num_students']).lower()
-            ):
-                filtered_groups.append(group_dict)
-        processed_groups = filtered_groups
-
-    # Сортировка
-    # Определяем колонку для фактической сортировки данных
-    actual_sort_column = sort_column_from_request if sort_column_from_request else 'name' # Сортируем по имени по умолчанию
-    
-    if actual_sort_column != 'default' and processed_groups and actual_sort_column in processed_groups[0]:
-        processed_groups.sort(key=lambda x: get_sort_key(x, actual_sort_column), reverse=(current_sort_order == 'desc'))
-    elif not processed_groups:
-        pass
-    else: # Сортировка по умолчанию (если actual_sort_column == 'default' или его нет в ключах)
-        processed_groups.sort(key=lambda x: x['name'].lower()) # по имени asc
+        search_term = f"%{sq_lower}%"
+        conditions = [
+            func.lower(Group.name).like(search_term),
+            cast(Group.year, String).like(search_term),
+            cast(Group.duration, String).like(search_term),
+            cast(Group.course, String).like(search_term),
+            cast(Group.num_students, String).like(search_term),
+        ]
+        # Статусов всего два, поэтому сравнение без учета регистра (в т.ч. кириллицы)
+        # выполняется здесь, а в SQL уходит только список подходящих значений
+        matching_statuses = [s for s in (STATUS_STUDYING, STATUS_GRADUATED) if sq_lower in s.lower()]
+        if matching_statuses:
+            conditions.append(Group.status.in_(matching_statuses))
+        query = query.filter(or_(*conditions))
 
-    # Пагинация обработанного и отсортированного списка
-    total_items = len(processed_groups)
-    start_index = (page - 1) * per_page
-    end_index = start_index + per_page
-    paginated_groups_list = processed_groups[start_index:end_index]
+    # Сортировка (по умолчанию — по имени)
+    sort_columns = {
+        'id': Group.id,
+        'name': func.lower(Group.name),
+        'year': Group.year,
+        'duration': Group.duration,
+        'course': Group.course,
+        'status': Group.status,
+        'num_students': Group.num_students,
+    }
+    actual_sort_column = sort_column_from_request if sort_column_from_request else 'name'
+    sort_expr = sort_columns.get(actual_sort_column)
+    if sort_expr is not None and current_sort_order == 'desc':
+        query = query.order_by(sort_expr.desc(), Group.id)
+    elif sort_expr is not None:
+        query = query.order_by(sort_expr.asc(), Group.id)
+    else:
+        query = query.order_by(func.lower(Group.name), Group.id)
 
-    # Используем тот же SimplePagination класс (можно вынести его в utils, если используется в нескольких местах)
-    class SimplePagination:
-        def __init__(self, page, per_page, total_items, items):
-            self.page = page
-            self.per_page = per_page
-            self.total = total_items
-            self.items = items
-            self.pages = (total_items + per_page - 1) // per_page if total_items > 0 else 0
-        @property
-        def has_prev(self):
-            return self.page > 1
-        @property
-        def has_next(self):
-            return self.page < self.pages
-        @property
-        def prev_num(self):
-            return self.page - 1 if self.has_prev else None
-        @property
-        def next_num(self):
-            return self.page + 1 if self.has_next else None
-        def iter_pages(self, left_edge=1, left_current=1, right_current=2, right_edge=1):
-            last = 0
-            for num in range(1, self.pages + 1):
-                if num <= left_edge or \
-                   (num > self.page - left_current - 1 and num < self.page + right_current) or \
-                   num > self.pages - right_edge:
-                    if last + 1 != num:
-                        yield None
-                    yield num
-                    last = num
-
-    pagination_obj = SimplePagination(page, per_page, total_items, paginated_groups_list)
+    pagination_obj = paginate_with_total(query, page, per_page)
 
     return render_template('groups/list.html', 
                            pagination=pagination_obj, 
@@ -162,27 +121,12 @@ def create_group(faculty_id):
                 return render_template('groups/create_edit.html', faculty=faculty, form_action=url_for('.create_group', faculty_id=faculty.id), form_title="Создание новой группы", submitted_form_data=request.form)
 
             # Расчет курса и статуса для сохранения в БД
-            calculated_course = (EFFECTIVE_SYSTEM_YEAR - year) + 1
-            if calculated_course < 1:
-                calculated_course = 1
-            elif calculated_course > duration:
-                calculated_course = duration
-            
-            calculated_status = "Учится"
-            if (EFFECTIVE_SYSTEM_YEAR - year + 1) > duration:
-                calculated_status = "Выпущена"
+            academic_year = current_academic_year()
+            calculated_course = compute_course(year, duration, academic_year)
+            calculated_status = compute_status(year, duration, academic_year)
 
-            # Генерация имени группы
-            existing_groups_count = Group.query.filter_by(faculty_id=faculty.id, year=year).count()
-            group_index = existing_groups_count + 1
-            year_short = str(year)[-2:] # Получаем последние две цифры года
-            group_name = f"{faculty.short_name}-{group_index}-{year_short}"
-            check_existing = Group.query.filter_by(name=group_name, faculty_id=faculty.id).first()
-            while check_existing:
-                group_index += 1
-                # Обновляем имя с новым индексом
-                group_name = f"{faculty.short_name}-{group_index}-{year_short}"
-                check_existing = Group.query.filter_by(name=group_name, faculty_id=faculty.id).first()
+            # Генерация имени группы: следующий номер для (факультет, год) одним запросом
+            group_name = next_group_name(faculty, year)
 
             new_group = Group(name=group_name, 
                               year=year, 
@@ -192,6 +136,7 @@ def create_group(faculty_id):
                               status=calculated_status)  # Сохраняем рассчитанный статус
             db.session.add(new_group)
             db.session.commit()
+            invalidate_group(faculty.id, new_group.id)
             flash(f'Группа "{new_group.name}" успешно создана!', 'success')
             return redirect(url_for('.list_groups', faculty_id=faculty.id))
         
@@ -200,6 +145,7 @@ def create_group(faculty_id):
             return render_template('groups/create_edit.html', faculty=faculty, form_action=url_for('.create_group', faculty_id=faculty.id), form_title="Создание новой группы", submitted_form_data=request.form)
         except Exception as e:
             db.session.rollback()
+            log_view_error()
             flash(f'Произошла непредвиденная ошибка при создании группы: {str(e)}', 'danger')
             return render_template('groups/create_edit.html', faculty=faculty, form_action=url_for('.create_group', faculty_id=faculty.id), form_title="Создание новой группы", submitted_form_data=request.form)
 
@@ -208,10 +154,44 @@ def create_group(faculty_id):
                            form_action=url_for('.create_group', faculty_id=faculty.id), 
                            form_title="Создание новой группы")
 
+@faculty_groups_bp.route('/bulk-create', methods=['GET', 'POST'])
+def bulk_create_groups(faculty_id):
+    # Набор из нескольких групп одного года поступления (например, весь набор курса)
+    faculty = Faculty.query.get_or_404(faculty_id)
+    form_action = url_for('.bulk_create_groups', faculty_id=faculty.id)
+    form_title = "Создание набора групп"
+
+    if request.method == 'POST':
+        try:
+            year = int(request.form.get('year', ''))
+            duration = int(request.form.get('duration', ''))
+            count = int(request.form.get('count', ''))
+        except ValueError:
+            flash('Год поступления, срок обучения и количество групп должны быть корректными числами.', 'danger')
+            return render_template('groups/create_edit.html', faculty=faculty, form_action=form_action, form_title=form_title, bulk=GROUPS_BULK_MAX, submitted_form_data=request.form)
+
+        if not (2018 <= year <= 2042) or not (2 <= duration <= 6) or not (1 <= count <= GROUPS_BULK_MAX):
+            flash(f'Год поступления — от 2018 до 2042, срок обучения — от 2 до 6 лет, групп — от 1 до {GROUPS_BULK_MAX}.', 'danger')
+            return render_template('groups/create_edit.html', faculty=faculty, form_action=form_action, form_title=form_title, bulk=GROUPS_BULK_MAX, submitted_form_data=request.form)
+
+        try:
+            groups = create_groups(faculty, year, duration, count)
+            db.session.commit()
+            invalidate_faculty(faculty.id)
+            flash(f'Создано групп: {len(groups)} ({groups[0].name} — {groups[-1].name}).', 'success')
+            return redirect(url_for('.list_groups', faculty_id=faculty.id))
+        except Exception as e:
+            db.session.rollback()
+            log_view_error()
+            flash(f'Произошла непредвиденная ошибка при создании групп: {str(e)}', 'danger')
+            return render_template('groups/create_edit.html', faculty=faculty, form_action=form_action, form_title=form_title, bulk=GROUPS_BULK_MAX, submitted_form_data=request.form)
+
+    return render_template('groups/create_edit.html', faculty=faculty, form_action=form_action, form_title=form_title, bulk=GROUPS_BULK_MAX)
+
 @bp.route('/<int:id>/edit', methods=['GET', 'POST'])
 def edit_group(id):
-    group_to_edit = Group.query.get_or_404(id)
-    faculty = Faculty.query.get_or_404(group_to_edit.faculty_id)
+    group_to_edit = Group.query.options(joinedload(Group.faculty)).get_or_404(id)
+    faculty = group_to_edit.faculty
     if request.method == 'POST':
         try:
             original_year = group_to_edit.year # Сохраняем оригинальный год для возможной перегенерации имени
@@ -232,42 +212,20 @@ def edit_group(id):
                 flash('Срок обучения должен быть от 2 до 6 лет.', 'danger')
                 return render_template('groups/create_edit.html', group=group_to_edit, faculty=faculty, form_action=url_for('groups.edit_group', id=id), form_title=f"Редактирование группы {group_to_edit.name}", submitted_form_data=request.form)
 
-            # Логика перегенерации имени, если изменился год
+            # Логика перегенерации имени, если изменился год: новый номер в новом году
             if original_year != year:
-                # Нужно найти новый group_index для нового года, исключая текущую редактируемую группу из подсчета
-                # Это важно, чтобы не было конфликта 'сам с собой' и чтобы номер был корректным
-                existing_groups_count_for_new_year = Group.query.filter(
-                    Group.faculty_id == faculty.id, 
-                    Group.year == year,
-                    Group.id != group_to_edit.id # Исключаем текущую группу
-                ).count()
-                new_group_index = existing_groups_count_for_new_year + 1
-                year_short = str(year)[-2:] # Получаем последние две цифры года
-                new_group_name = f"{faculty.short_name}-{new_group_index}-{year_short}"
-                
-                # Проверка на уникальность, на всякий случай, если вдруг такой номер уже занят другой группой (маловероятно при правильном подсчете)
-                temp_check_existing = Group.query.filter_by(name=new_group_name, faculty_id=faculty.id).first()
-                while temp_check_existing and temp_check_existing.id != group_to_edit.id:
-                    new_group_index += 1
-                    new_group_name = f"{faculty.short_name}-{new_group_index}-{year_short}"
-                    temp_check_existing = Group.query.filter_by(name=new_group_name, faculty_id=faculty.id).first()
-                group_to_edit.name = new_group_name
+                group_to_edit.name = next_group_name(faculty, year)
             
             group_to_edit.year = year
             group_to_edit.duration = duration
             
-            # Пересчитываем курс и статус на основе новых данных и EFFECTIVE_SYSTEM_YEAR
-            calculated_course = (EFFECTIVE_SYSTEM_YEAR - year) + 1
-            if calculated_course < 1: calculated_course = 1
-            elif calculated_course > duration: calculated_course = duration
-            group_to_edit.course = calculated_course
-
-            calculated_status = "Учится"
-            if (EFFECTIVE_SYSTEM_YEAR - year + 1) > duration:
-                calculated_status = "Выпущена"
-            group_to_edit.status = calculated_status
+            # Пересчитываем курс и статус на основе новых данных и текущего учебного года
+            academic_year = current_academic_year()
+            group_to_edit.course = compute_course(year, duration, academic_year)
+            group_to_edit.status = compute_status(year, duration, academic_year)
             
             db.session.commit()
+            invalidate_group(faculty.id, group_to_edit.id)
             flash(f'Группа "{group_to_edit.name}" успешно обновлена!', 'success')
             return redirect(url_for('faculty_groups.list_groups', faculty_id=faculty.id))
 
@@ -276,6 +234,7 @@ def edit_group(id):
             return render_template('groups/create_edit.html', group=group_to_edit, faculty=faculty, form_action=url_for('groups.edit_group', id=id), form_title=f"Редактирование группы {group_to_edit.name}", submitted_form_data=request.form)
         except Exception as e:
             db.session.rollback()
+            log_view_error()
             flash(f'Произошла непредвиденная ошибка при обновлении группы: {str(e)}', 'danger')
             return render_template('groups/create_edit.html', group=group_to_edit, faculty=faculty, form_action=url_for('groups.edit_group', id=id), form_title=f"Редактирование группы {group_to_edit.name}", submitted_form_data=request.form)
 
@@ -284,20 +243,19 @@ def edit_group(id):
 @bp.route('/<int:id>/delete', methods=['POST'])
 def delete_group(id):
     group_to_delete = Group.query.get_or_404(id)
-    faculty_id_redirect = group_to_delete.faculty_id # Запоминаем для редиректа
-    group_name = group_to_delete.name
+    faculty_id, group_name = group_to_delete.faculty_id, group_to_delete.name
     try:
-        # Если есть студенты и модель Student имеет group_id, и настроено каскадное удаление в SQLAlchemy,
-        # то студенты удалятся автоматически. 
-        # Если нет, и мы хотим их удалить, нужно сделать это явно:
-        # Student.query.filter_by(group_id=id).delete()
-        # Сейчас, предполагая, что каскадное удаление настроено или студенты обрабатываются отдельно:
-        db.session.delete(group_to_delete)
+        # Один DELETE: студентов группы удаляет СУБД (ON DELETE CASCADE), их
+        # фотографии освобождаются фоновой задачей после commit
+        photos = delete_groups([id])
         db.session.commit()
-        flash(f'Группа "{group_name}" и все связанные с ней студенты были успешно удалены.', 'success')
+        invalidate_group(faculty_id, id)
+        release_photos_later(photos)
+        flash(f'Группа "{group_name}" и все ее студенты успешно удалены!', 'success')
     except Exception as e:
         db.session.rollback()
+        log_view_error()
         flash(f'Ошибка при удалении группы: {str(e)}', 'danger')
-    return redirect(url_for('faculty_groups.list_groups', faculty_id=faculty_id_redirect))
+    return redirect(url_for('faculty_groups.list_groups', faculty_id=faculty_id))
 
 # Маршруты для CRUD групп будут добавлены сюда и в bp (для /groups/<id>/edit и /groups/<id>/delete) 
\ No newline at end of file
@@ -0,0 +1,66 @@
+from flask import Blueprint, abort, jsonify, render_template, request, send_file, url_for
+from app.jobs import JOB_FINISHED, get_job, result_file
+
+# Статус фоновых задач (app.jobs): страница с индикатором выполнения, тот же
+# статус в JSON для опроса и скачивание файла результата
+
+jobs_bp = Blueprint('jobs', __name__, url_prefix='/jobs')
+
+
+def _wants_json():
+    best = request.accept_mimetypes.best_match(['application/json', 'text/html'])
+    return request.args.get('format') == 'json' or best == 'application/json'
+
+
+def job_to_dict(job):
+    result = job.result or {}
+    data = {
+        'id': job.id,
+        'kind': job.kind,
+        'status': job.status,
+        'progress': job.progress,
+        'message': job.message,
+        'error': job.error,
+        'created_at': job.created_at.isoformat() if job.created_at else None,
+        'started_at': job.started_at.isoformat() if job.started_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+        'status_url': url_for('jobs.job_status', job_id=job.id),
+        'result_url': url_for('jobs.job_result', job_id=job.id) if result.get('file') else None,
+        'redirect_url': result.get('redirect'),
+        # since для следующего инкрементального экспорта
+        'watermark': result.get('watermark'),
+    }
+    return data
+
+
+def accepted(job_id, title):
+    # Ответ 202 на запуск задачи: JSON для API-клиентов, иначе страница статуса,
+    # которая опрашивает задачу и по завершении скачивает результат или переходит дальше
+    job = get_job(job_id)
+    if _wants_json():
+        response = jsonify(job_to_dict(job))
+    else:
+        response = render_template('jobs/status.html', job=job, title=title)
+    return response, 202, {'Location': url_for('jobs.job_status', job_id=job_id)}
+
+
+@jobs_bp.route('/<job_id>')
+def job_status(job_id):
+    job = get_job(job_id) or abort(404)
+    if _wants_json():
+        response = jsonify(job_to_dict(job))
+        response.cache_control.no_store = True
+        return response
+    return render_template('jobs/status.html', job=job, title='Фоновая задача')
+
+
+@jobs_bp.route('/<job_id>/result')
+def job_result(job_id):
+    job = get_job(job_id) or abort(404)
+    if job.status not in JOB_FINISHED:
+        return 'Задача еще выполняется.', 409
+    path = result_file(job)
+    if path is None:
+        abort(404)
+    return send_file(path, mimetype=job.result.get('mimetype'), as_attachment=True,
+                     download_name=job.result.get('download_name') or job.result['file'])
@@ -1,7 +1,30 @@
-from flask import Blueprint, render_template
+from flask import Blueprint, Response, jsonify, render_template, request
+from app.cache import cache
+from app.instrumentation import metrics
+from app.search import search as run_search
 
 main_bp = Blueprint('main', __name__)
 
 @main_bp.route('/')
 def welcome():
-    return render_template('main/welcome.html') 
\ No newline at end of file
+    return render_template('main/welcome.html')
+
+@main_bp.route('/cache/stats')
+def cache_stats():
+    return jsonify(cache.stats())
+
+@main_bp.route('/metrics')
+def prometheus_metrics():
+    # Метрики этого процесса в текстовом формате Prometheus
+    stats = cache.stats()
+    body = metrics.render([
+        ('response_cache_hits_total', {}, stats['hits']),
+        ('response_cache_misses_total', {}, stats['misses']),
+    ])
+    return Response(body, mimetype='text/plain; version=0.0.4') 
+
+@main_bp.route('/search')
+def search():
+    query = request.args.get('q', '').strip()
+    results = run_search(query) if query else []
+    return render_template('main/search.html', query=query, results=results)
@@ -0,0 +1,44 @@
+import os
+
+from flask import Blueprint, abort, request, send_from_directory
+
+from app.photos import THUMBNAIL_SIZES, photo_hash, thumbnail_path, upload_folder
+
+photos_bp = Blueprint('photos', __name__, url_prefix='/photos')
+
+# Файлы с хешем в имени никогда не меняются — кешируются браузером на год
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+# Старые фото без хеша в имени могут быть перезаписаны
+LEGACY_MAX_AGE = 3600
+
+def _send(directory, filename, etag=None):
+    if etag is None:
+        return send_from_directory(directory, filename, max_age=LEGACY_MAX_AGE)
+    response = send_from_directory(directory, filename, max_age=IMMUTABLE_MAX_AGE, etag=etag)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+@photos_bp.route('/<path:filename>')
+def original(filename):
+    return _send(upload_folder(), filename, etag=photo_hash(filename))
+
+@photos_bp.route('/thumbs/<size>/<path:filename>')
+def thumbnail(size, filename):
+    if size not in THUMBNAIL_SIZES:
+        abort(404)
+    folder = upload_folder()
+    digest = photo_hash(filename)
+    if digest is not None:
+        # WebP, если браузер его принимает, иначе JPEG
+        accepts_webp = any(mimetype == 'image/webp' and quality > 0
+                           for mimetype, quality in request.accept_mimetypes)
+        fmt = 'webp' if accepts_webp else 'jpg'
+        path = thumbnail_path(folder, size, digest, fmt)
+        if os.path.exists(path):
+            response = _send(os.path.dirname(path), os.path.basename(path), etag=f'{digest}-{size}-{fmt}')
+            response.vary.add('Accept')
+            return response
+    # Миниатюра еще не готова (или старое имя файла) — отдаем оригинал, но без
+    # долгого кеширования, чтобы браузер потом получил саму миниатюру
+    return _send(folder, filename)
@@ -2,12 +2,15 @@ from flask import Blueprint, render_template, abort, request, redirect, url_for,
 from app.models import Group, Student # Нам понадобятся модели Group и Student
 from app import db # Если будем что-то менять в БД, но для списка пока не нужно
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy import or_ # Для более сложных фильтров SQLAlchemy, если понадобится
+from sqlalchemy import func, or_
+from sqlalchemy.orm import joinedload
+from app.bulk import BULK_EDIT_FIELDS, bulk_update_students, merge_groups, transfer_students
+from app.cache import FACULTY_NAMES_TAG, cache, group_tag, invalidate_group, invalidate_groups
+from app.utils import decode_cursor, format_date_ru, keyset_paginate
 from datetime import datetime # Для преобразования строки в дату
-from werkzeug.utils import secure_filename
 from flask import current_app
-import os
-import uuid
+from app.photos import release_photo, store_photo
+from app.instrumentation import log_view_error
 
 # Создаем два блюпринта:
 # 1. group_students_bp: для действий, связанных со студентами В КОНТЕКСТЕ группы 
@@ -20,19 +23,22 @@ import uuid
 group_students_bp = Blueprint('group_students', __name__, url_prefix='/groups/<int:group_id>/students')
 students_bp = Blueprint('students', __name__, url_prefix='/students')
 
-def get_student_sort_key(item, column):
-    val = item.get(column) # item - это словарь
-    if isinstance(val, (int, float)):
-        return val
-    if isinstance(val, datetime):
-        return val # Даты можно сравнивать напрямую
-    if isinstance(val, str):
-        return val.lower()
-    return str(val).lower() # Для None или других типов, приводим к строке
+STUDENTS_PER_PAGE = 25
+
+def _student_sort_columns():
+    # Строковые столбцы сортируются без учета регистра, как и раньше
+    return {
+        'id': Student.id,
+        'full_name': func.lower(Student.full_name),
+        'date_of_birth': Student.date_of_birth,
+        'phone_number': func.lower(Student.phone_number),
+        'email': func.lower(Student.email),
+    }
 
 @group_students_bp.route('/')
+@cache.cached_view(lambda group_id: [group_tag(group_id), FACULTY_NAMES_TAG])
 def list_students_in_group(group_id):
-    group = Group.query.get_or_404(group_id)
+    group = Group.query.options(joinedload(Group.faculty)).get_or_404(group_id)
     
     search_query = request.args.get('search_query', '').strip()
     
@@ -40,50 +46,55 @@ def list_students_in_group(group_id):
     sort_column_for_template = request.args.get('sort_by')
     current_sort_order = request.args.get('order', 'asc')
 
-    # Сначала получаем всех студентов группы из БД
-    students_from_db = Student.query.filter_by(group_id=group.id).all()
-
-    # Преобразуем в список словарей для удобства фильтрации и сортировки на Python
-    # т.к. поиск по форматированной дате сложен в SQLAlchemy напрямую
-    processed_students = []
-    for student_obj in students_from_db:
-        processed_students.append({
-            'id': student_obj.id,
-            'full_name': student_obj.full_name,
-            'date_of_birth': student_obj.date_of_birth, # Оставляем как объект date для сортировки
-            'date_of_birth_str': student_obj.date_of_birth.strftime('%d.%m.%Y') if student_obj.date_of_birth else '-', # Строка для отображения и поиска
-            'phone_number': student_obj.phone_number,
-            'email': student_obj.email,
-            # Не передаем student_obj целиком, чтобы случайно не изменить его в шаблоне
-        })
+    # Сортировка: по умолчанию (и для неизвестных столбцов) — full_name asc
+    sort_columns = _student_sort_columns()
+    if sort_column_for_template in sort_columns:
+        actual_sort_column_for_data = sort_column_for_template
+        descending = current_sort_order == 'desc'
+    else:
+        actual_sort_column_for_data = 'full_name'
+        descending = False
+    sort_expr = sort_columns[actual_sort_column_for_data]
+
+    # Дата форматируется в БД, поэтому поиск по 'дд.мм.ГГГГ' тоже выполняется в SQL
+    date_of_birth_str = format_date_ru(Student.date_of_birth)
+    query = db.session.query(
+        Student.id,
+        Student.full_name,
+        Student.date_of_birth,
+        date_of_birth_str.label('date_of_birth_str'),
+        Student.phone_number,
+        Student.email,
+        sort_expr.label('sort_key'),
+    ).filter(Student.group_id == group.id)
 
     # Фильтрация (поиск)
     if search_query:
-        filtered_students = []
-        sq_lower = search_query.lower()
-        for student_dict in processed_students:
-            if (
-                sq_lower in str(student_dict['full_name']).lower() or
-                sq_lower in student_dict['date_of_birth_str'].lower() or # Поиск по строке даты
-                (student_dict['phone_number'] and sq_lower in str(student_dict['phone_number']).lower()) or
-                (student_dict['email'] and sq_lower in str(student_dict['email']).lower())
-            ):
-                filtered_students.append(student_dict)
-        processed_students = filtered_students
-
-    # Сортировка
-    # Определяем колонку для ФАКТИЧЕСКОЙ сортировки данных
-    actual_sort_column_for_data = sort_column_for_template if sort_column_for_template else 'full_name'
-    valid_sort_columns = ['full_name', 'date_of_birth', 'phone_number', 'email']
-
-    if processed_students: # Только если есть что сортировать
-        if actual_sort_column_for_data != 'default' and actual_sort_column_for_data in valid_sort_columns:
-            processed_students.sort(key=lambda x: get_student_sort_key(x, actual_sort_column_for_data), reverse=(current_sort_order == 'desc'))
-        else: # Сортировка по умолчанию (full_name asc)
-            processed_students.sort(key=lambda x: get_student_sort_key(x, 'full_name')) # Явно указываем full_name
+        search_term = f"%{search_query.lower()}%"
+        query = query.filter(
+            or_(
+                func.lower(Student.full_name).like(search_term),
+                date_of_birth_str.like(search_term),
+                func.lower(Student.phone_number).like(search_term),
+                func.lower(Student.email).like(search_term)
+            )
+        )
+
+    value_parser = None
+    if actual_sort_column_for_data == 'date_of_birth':
+        value_parser = lambda value: datetime.strptime(value, '%Y-%m-%d').date()
+
+    pagination = keyset_paginate(
+        query, sort_expr, Student.id, STUDENTS_PER_PAGE,
+        descending=descending,
+        after=decode_cursor(request.args.get('after')),
+        before=decode_cursor(request.args.get('before')),
+        value_parser=value_parser
+    )
 
     return render_template('students/list.html', 
-                           students=processed_students, 
+                           students=pagination.items, 
+                           pagination=pagination,
                            group=group,
                            faculty=group.faculty, # Передаем факультет для хлебных крошек
                            search_query=search_query,
@@ -97,7 +108,7 @@ def allowed_file(filename):
 # TODO: Добавить другие маршруты для CRUD студентов:
 @group_students_bp.route('/create', methods=['GET', 'POST'])
 def create_student_in_group(group_id):
-    group = Group.query.get_or_404(group_id)
+    group = Group.query.options(joinedload(Group.faculty)).get_or_404(group_id)
     if request.method == 'POST':
         full_name = request.form.get('full_name')
         date_of_birth_str = request.form.get('date_of_birth')
@@ -109,24 +120,21 @@ def create_student_in_group(group_id):
         if not all([full_name, date_of_birth_str, phone_number, email]):
             flash('Все поля, кроме фото, обязательны для заполнения.', 'danger')
             # Передаем введенные данные обратно в шаблон
-            return render_template('students/create_edit.html', group=group, form_action=url_for('.create_student_in_group', group_id=group_id), form_title="Добавление нового студента", submitted_form_data=request.form)
+            return render_template('students/create_edit.html', group=group, faculty=group.faculty, form_action=url_for('.create_student_in_group', group_id=group_id), form_title="Добавление нового студента", submitted_form_data=request.form)
         
         try:
             date_of_birth = datetime.strptime(date_of_birth_str, '%Y-%m-%d').date()
         except ValueError:
             flash('Неверный формат даты рождения. Используйте ГГГГ-ММ-ДД.', 'danger')
-            return render_template('students/create_edit.html', group=group, form_action=url_for('.create_student_in_group', group_id=group_id), form_title="Добавление нового студента", submitted_form_data=request.form)
+            return render_template('students/create_edit.html', group=group, faculty=group.faculty, form_action=url_for('.create_student_in_group', group_id=group_id), form_title="Добавление нового студента", submitted_form_data=request.form)
 
         if photo:
             if allowed_file(photo.filename):
-                filename = secure_filename(photo.filename)
-                # Для уникальности можно добавить timestamp или uuid к имени файла
-                # Например: filename = str(uuid.uuid4()) + "_" + secure_filename(photo.filename)
-                photo.save(os.path.join(current_app.config['UPLOAD_FOLDER'], filename))
-                photo_filename_to_save = filename
+                # Файл сохраняется под хешем содержимого, миниатюры создаются в фоне
+                photo_filename_to_save = store_photo(photo)
             else:
                 flash('Недопустимый тип файла для фотографии. Разрешены PNG, JPG, JPEG.', 'danger')
-                return render_template('students/create_edit.html', group=group, form_action=url_for('.create_student_in_group', group_id=group_id), form_title="Добавление нового студента", submitted_form_data=request.form)
+                return render_template('students/create_edit.html', group=group, faculty=group.faculty, form_action=url_for('.create_student_in_group', group_id=group_id), form_title="Добавление нового студента", submitted_form_data=request.form)
 
         try:
             new_student = Student(
@@ -139,21 +147,26 @@ def create_student_in_group(group_id):
             )
             db.session.add(new_student)
             db.session.commit()
+            invalidate_group(group.faculty_id, group.id)
             flash(f'Студент "{new_student.full_name}" успешно добавлен в группу {group.name}!', 'success')
             return redirect(url_for('.list_students_in_group', group_id=group.id))
         except IntegrityError: # Обработка ошибки уникальности email
             db.session.rollback()
+            release_photo(photo_filename_to_save)
             flash('Студент с таким email уже существует.', 'danger')
         except Exception as e:
             db.session.rollback()
+            log_view_error()
+            release_photo(photo_filename_to_save)
             flash(f'Произошла ошибка при добавлении студента: {str(e)}', 'danger')
             
-    return render_template('students/create_edit.html', group=group, form_action=url_for('.create_student_in_group', group_id=group_id), form_title="Добавление нового студента")
+    return render_template('students/create_edit.html', group=group, faculty=group.faculty, form_action=url_for('.create_student_in_group', group_id=group_id), form_title="Добавление нового студента")
 
 @students_bp.route('/<int:student_id>/edit', methods=['GET', 'POST'])
 def edit_student(student_id):
-    student_to_edit = Student.query.get_or_404(student_id)
-    group = student_to_edit.group # Получаем группу студента для хлебных крошек и т.д.
+    # Группа и факультет для хлебных крошек загружаются тем же запросом
+    student_to_edit = Student.query.options(joinedload(Student.group).joinedload(Group.faculty)).get_or_404(student_id)
+    group = student_to_edit.group
 
     if request.method == 'POST':
         full_name = request.form.get('full_name')
@@ -165,88 +178,169 @@ def edit_student(student_id):
 
         if not all([full_name, date_of_birth_str, phone_number, email]):
             flash('Все поля, кроме фото, обязательны для заполнения.', 'danger')
-            return render_template('students/create_edit.html', student=student_to_edit, group=group, form_action=url_for('.edit_student', student_id=student_id), form_title=f"Редактирование студента: {student_to_edit.full_name}", submitted_form_data=request.form)
+            return render_template('students/create_edit.html', student=student_to_edit, group=group, faculty=group.faculty, form_action=url_for('.edit_student', student_id=student_id), form_title=f"Редактирование студента: {student_to_edit.full_name}", submitted_form_data=request.form)
 
         try:
             date_of_birth = datetime.strptime(date_of_birth_str, '%Y-%m-%d').date()
         except ValueError:
             flash('Неверный формат даты рождения. Используйте ГГГГ-ММ-ДД.', 'danger')
-            return render_template('students/create_edit.html', student=student_to_edit, group=group, form_action=url_for('.edit_student', student_id=student_id), form_title=f"Редактирование студента: {student_to_edit.full_name}", submitted_form_data=request.form)
+            return render_template('students/create_edit.html', student=student_to_edit, group=group, faculty=group.faculty, form_action=url_for('.edit_student', student_id=student_id), form_title=f"Редактирование студента: {student_to_edit.full_name}", submitted_form_data=request.form)
 
-        # Логика обработки фотографии
+        # Логика обработки фотографии. Файлы общие (хранятся по хешу содержимого),
+        # поэтому старый файл удаляется только после commit и только если на него
+        # больше не ссылается ни один студент
+        old_photo = student_to_edit.photo_filename
         if delete_photo_checkbox and student_to_edit.photo_filename:
-            # Удаляем старый файл
-            try:
-                os.remove(os.path.join(current_app.config['UPLOAD_FOLDER'], student_to_edit.photo_filename))
-            except OSError:
-                flash('Ошибка при удалении старой фотографии. Файл не найден.', 'warning')
             student_to_edit.photo_filename = None
         
         if photo: # Если загружен новый файл
             if allowed_file(photo.filename):
-                # Удаляем старый файл, если он был и не был помечен на удаление выше (на случай если грузят новый не удаляя старый явно)
-                if student_to_edit.photo_filename and not delete_photo_checkbox:
-                    try:
-                        os.remove(os.path.join(current_app.config['UPLOAD_FOLDER'], student_to_edit.photo_filename))
-                    except OSError:
-                        pass # Молча пропускаем, если старый файл не найден
-                
-                filename = secure_filename(photo.filename)
-                # filename = str(uuid.uuid4()) + "_" + secure_filename(photo.filename) # Для уникальности
-                photo.save(os.path.join(current_app.config['UPLOAD_FOLDER'], filename))
-                student_to_edit.photo_filename = filename
+                student_to_edit.photo_filename = store_photo(photo)
             else:
                 flash('Недопустимый тип файла для фотографии. Разрешены PNG, JPG, JPEG.', 'danger')
-                return render_template('students/create_edit.html', student=student_to_edit, group=group, form_action=url_for('.edit_student', student_id=student_id), form_title=f"Редактирование студента: {student_to_edit.full_name}", submitted_form_data=request.form)
+                return render_template('students/create_edit.html', student=student_to_edit, group=group, faculty=group.faculty, form_action=url_for('.edit_student', student_id=student_id), form_title=f"Редактирование студента: {student_to_edit.full_name}", submitted_form_data=request.form)
 
         student_to_edit.full_name = full_name
         student_to_edit.date_of_birth = date_of_birth
         student_to_edit.phone_number = phone_number
         student_to_edit.email = email
         
+        new_photo = student_to_edit.photo_filename
         try:
             db.session.commit()
+            invalidate_group(group.faculty_id, group.id)
+            if old_photo and old_photo != new_photo:
+                if not release_photo(old_photo) and delete_photo_checkbox:
+                    flash('Ошибка при удалении старой фотографии. Файл не найден.', 'warning')
             flash(f'Данные студента "{student_to_edit.full_name}" успешно обновлены!', 'success')
             return redirect(url_for('group_students.list_students_in_group', group_id=group.id)) # Редирект на список студентов группы
         except IntegrityError: # Обработка ошибки уникальности email
             db.session.rollback()
+            if new_photo != old_photo:
+                release_photo(new_photo)
             flash('Студент с таким email уже существует (и это не данный студент).', 'danger')
         except Exception as e:
             db.session.rollback()
+            log_view_error()
+            if new_photo != old_photo:
+                release_photo(new_photo)
             flash(f'Произошла ошибка при обновлении данных студента: {str(e)}', 'danger')
 
-    return render_template('students/create_edit.html', student=student_to_edit, group=group, form_action=url_for('.edit_student', student_id=student_id), form_title=f"Редактирование студента: {student_to_edit.full_name}")
+    return render_template('students/create_edit.html', student=student_to_edit, group=group, faculty=group.faculty, form_action=url_for('.edit_student', student_id=student_id), form_title=f"Редактирование студента: {student_to_edit.full_name}")
 
 @students_bp.route('/<int:student_id>/view_card')
 def view_student_card(student_id):
-    student = Student.query.get_or_404(student_id)
+    student = Student.query.options(joinedload(Student.group).joinedload(Group.faculty)).get_or_404(student_id)
     return render_template('students/view_card.html', student=student)
 
 @students_bp.route('/<int:student_id>/delete', methods=['POST'])
 def delete_student(student_id):
-    student_to_delete = Student.query.get_or_404(student_id)
+    student_to_delete = Student.query.options(joinedload(Student.group)).get_or_404(student_id)
     group_id_redirect = student_to_delete.group_id
     student_full_name = student_to_delete.full_name
     photo_to_delete = student_to_delete.photo_filename # Сохраняем имя файла перед удалением объекта
+    faculty_id_for_cache = student_to_delete.group.faculty_id
 
     try:
         db.session.delete(student_to_delete)
         db.session.commit()
+        invalidate_group(faculty_id_for_cache, group_id_redirect)
 
-        # Удаляем файл фотографии, если он был
+        # Удаляем файл фотографии, если он был и больше никому не принадлежит
         if photo_to_delete:
-            try:
-                os.remove(os.path.join(current_app.config['UPLOAD_FOLDER'], photo_to_delete))
-            except OSError:
+            if not release_photo(photo_to_delete):
                 flash(f'Фотография для студента {student_full_name} не найдена на диске, но запись из БД удалена.', 'warning')
 
         flash(f'Студент "{student_full_name}" успешно удален.', 'success')
     except Exception as e:
         db.session.rollback()
+        log_view_error()
         flash(f'Ошибка при удалении студента: {str(e)}', 'danger')
     
     return redirect(url_for('group_students.list_students_in_group', group_id=group_id_redirect))
 
+# Массовые действия над студентами группы (app.bulk): список студентов отправляет
+# выбранные id на страницу действий, оттуда — перевод в другую группу или
+# изменение поля; каждое действие — один UPDATE и один сброс кеша на пакет
+
+def _faculty_groups(faculty_id):
+    return db.session.query(Group.id, Group.name).filter(Group.faculty_id == faculty_id) \
+        .order_by(func.lower(Group.name), Group.id).all()
+
+def _bulk_redirect(group_id):
+    return redirect(url_for('group_students.list_students_in_group', group_id=group_id))
+
+@students_bp.route('/bulk', methods=['POST'])
+def bulk_students():
+    group = Group.query.options(joinedload(Group.faculty)).get_or_404(request.form.get('group_id', type=int))
+    student_ids = request.form.getlist('student_ids', type=int)
+    students = db.session.query(Student.id, Student.full_name) \
+        .filter(Student.id.in_(student_ids)).order_by(Student.full_name).all() if student_ids else []
+    if not students:
+        flash('Выберите студентов для массового действия.', 'warning')
+        return _bulk_redirect(group.id)
+    return render_template('students/bulk.html', group=group, faculty=group.faculty, students=students,
+                           target_groups=[g for g in _faculty_groups(group.faculty_id) if g.id != group.id],
+                           fields=BULK_EDIT_FIELDS)
+
+@students_bp.route('/bulk/transfer', methods=['POST'])
+def bulk_transfer_students():
+    group_id = request.form.get('group_id', type=int)
+    try:
+        result = transfer_students(request.form.getlist('student_ids'), request.form.get('target_group_id', type=int))
+        db.session.commit()
+        invalidate_groups(result.faculty_ids, result.group_ids)
+        flash(f'Переведено студентов: {result.updated}.', 'success')
+    except ValueError as e:
+        db.session.rollback()
+        flash(str(e), 'danger')
+    except Exception as e:
+        db.session.rollback()
+        log_view_error()
+        flash(f'Ошибка при переводе студентов: {str(e)}', 'danger')
+    return _bulk_redirect(group_id)
+
+@students_bp.route('/bulk/edit', methods=['POST'])
+def bulk_edit_students():
+    group_id = request.form.get('group_id', type=int)
+    field = request.form.get('field')
+    try:
+        result = bulk_update_students(request.form.getlist('student_ids'), field, request.form.get('value'))
+        db.session.commit()
+        invalidate_groups(result.faculty_ids, result.group_ids)
+        flash(f'{BULK_EDIT_FIELDS[field][0]}: изменено у студентов — {result.updated}.', 'success')
+    except ValueError as e:
+        db.session.rollback()
+        flash(str(e), 'danger')
+    except Exception as e:
+        db.session.rollback()
+        log_view_error()
+        flash(f'Ошибка при изменении студентов: {str(e)}', 'danger')
+    return _bulk_redirect(group_id)
+
+@group_students_bp.route('/merge', methods=['GET', 'POST'])
+def merge_group(group_id):
+    # Все студенты группы переводятся в выбранную группу, эта группа удаляется
+    group = Group.query.options(joinedload(Group.faculty)).get_or_404(group_id)
+    if request.method == 'POST':
+        target_group_id = request.form.get('target_group_id', type=int)
+        group_name = group.name
+        try:
+            result = merge_groups(group.id, target_group_id)
+            db.session.commit()
+            invalidate_groups(result.faculty_ids, result.group_ids)
+            flash(f'Группа "{group_name}" объединена: переведено студентов — {result.updated}.', 'success')
+            return _bulk_redirect(target_group_id)
+        except ValueError as e:
+            db.session.rollback()
+            flash(str(e), 'danger')
+        except Exception as e:
+            db.session.rollback()
+            log_view_error()
+            flash(f'Ошибка при объединении групп: {str(e)}', 'danger')
+    return render_template('students/merge.html', group=group, faculty=group.faculty,
+                           target_groups=[g for g in _faculty_groups(group.faculty_id) if g.id != group.id])
+
 # Дальнейшие TODO для поиска/сортировки и т.д. в list_students_in_group
 
 # @students_bp.route('/<int:student_id>/delete', methods=['POST'])
@@ -0,0 +1,194 @@
+import re
+
+from flask import url_for
+from sqlalchemy import text
+
+from app import db
+from app.models import Faculty, Group, Student
+
+# Глобальный поиск по студентам, группам и факультетам.
+# SQLite: таблицы FTS5 search_fts (слова и их начала, ранжирование bm25) и
+# search_trigram (любая подстрока от 3 символов, если по словам нашлось мало).
+# Обе заполняются триггерами из миграции 8d41f6b2c7e3, rowid = id * 4 + код типа.
+# PostgreSQL: tsvector и pg_trgm по функциональным GIN-индексам той же миграции.
+
+SEARCH_KINDS = {'faculty': 1, 'group': 2, 'student': 3}
+SEARCH_ROWID_STRIDE = 4
+SEARCH_DEFAULT_LIMIT = 20
+SEARCH_MAX_LIMIT = 100
+# Вес совпадения в названии/ФИО относительно email, телефона и сокращения
+SEARCH_TITLE_WEIGHT = 10.0
+TRIGRAM_MIN_LENGTH = 3
+
+# Документы для PostgreSQL — те же выражения, что и в индексах миграции
+PG_SEARCH_DOCUMENTS = {
+    'faculty': ('faculty', "name || ' ' || short_name"),
+    'group': ('"group"', 'name'),
+    'student': ('student', "full_name || ' ' || email || ' ' || phone_number"),
+}
+
+
+# Содержимое индекса SQLite: тип -> (таблица, столбцы title, столбцы detail);
+# совпадает с триггерами миграции
+SQLITE_SEARCH_SOURCES = {
+    'faculty': ('faculty', ['name'], ['short_name']),
+    'group': ('"group"', ['name'], []),
+    'student': ('student', ['full_name'], ['email', 'phone_number']),
+}
+SQLITE_SEARCH_TABLES = ('search_fts', 'search_trigram')
+
+
+class SearchResult:
+    def __init__(self, kind, id, title, subtitle, url):
+        self.kind = kind
+        self.id = id
+        self.title = title
+        self.subtitle = subtitle
+        self.url = url
+
+    def to_dict(self):
+        return {'kind': self.kind, 'id': self.id, 'title': self.title,
+                'subtitle': self.subtitle, 'url': self.url}
+
+
+def normalize(value):
+    return value.replace('ё', 'е').replace('Ё', 'Е')
+
+
+def _tokens(query):
+    return [token for token in normalize(query).split() if token]
+
+
+def _quoted(token):
+    return '"' + token.replace('"', '""') + '"'
+
+
+def _sqlite_match(table, match, kinds, limit, exclude):
+    kind_filter = ''
+    if kinds:
+        codes = ', '.join(str(SEARCH_KINDS[kind]) for kind in kinds)
+        kind_filter = f' AND rowid % {SEARCH_ROWID_STRIDE} IN ({codes})'
+    rows = db.session.execute(text(
+        f'SELECT rowid FROM {table} WHERE {table} MATCH :match{kind_filter} '
+        f'ORDER BY bm25({table}, {SEARCH_TITLE_WEIGHT}, 1.0) LIMIT :limit'
+    ), {'match': match, 'limit': limit + len(exclude)}).scalars()
+    found = [rowid for rowid in rows if rowid not in exclude]
+    return [(rowid % SEARCH_ROWID_STRIDE, rowid // SEARCH_ROWID_STRIDE) for rowid in found[:limit]]
+
+
+def _sqlite_search(tokens, kinds, limit):
+    # Сначала по словам (каждое слово запроса — начало слова в документе)
+    hits = _sqlite_match('search_fts', ' '.join(_quoted(t) + '*' for t in tokens), kinds, limit, set())
+    # Затем по подстрокам для частичных совпадений внутри слов (Иванов по "ванов", телефон по "5-67")
+    trigram_tokens = [token for token in tokens if len(token) >= TRIGRAM_MIN_LENGTH]
+    if len(hits) < limit and len(trigram_tokens) == len(tokens):
+        seen = {object_id * SEARCH_ROWID_STRIDE + code for code, object_id in hits}
+        hits += _sqlite_match('search_trigram', ' '.join(_quoted(t) for t in trigram_tokens),
+                              kinds, limit - len(hits), seen)
+    codes = {code: kind for kind, code in SEARCH_KINDS.items()}
+    return [(codes[code], object_id) for code, object_id in hits]
+
+
+def _postgresql_search(tokens, kinds, limit):
+    kinds = kinds or list(SEARCH_KINDS)
+    words = [word for token in tokens for word in re.findall(r'\w+', token)]
+    params = {'limit': limit}
+    hits = []
+    if words:
+        params['tsquery'] = ' & '.join(f'{word}:*' for word in words)
+        selects = [
+            f"SELECT '{kind}' AS kind, id, "
+            f"ts_rank(to_tsvector('simple', translate({document}, 'ёЁ', 'еЕ')), to_tsquery('simple', :tsquery)) AS rank "
+            f"FROM {table} WHERE to_tsvector('simple', translate({document}, 'ёЁ', 'еЕ')) @@ to_tsquery('simple', :tsquery)"
+            for kind, (table, document) in PG_SEARCH_DOCUMENTS.items() if kind in kinds
+        ]
+        hits = db.session.execute(text(
+            ' UNION ALL '.join(selects) + ' ORDER BY rank DESC LIMIT :limit'
+        ), params).tuples().all()
+        hits = [(kind, object_id) for kind, object_id, _ in hits]
+    trigram_tokens = [token for token in tokens if len(token) >= TRIGRAM_MIN_LENGTH]
+    if len(hits) < limit and len(trigram_tokens) == len(tokens):
+        for index, token in enumerate(trigram_tokens):
+            params[f'like{index}'] = '%' + token.lower().replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+        params['query'] = ' '.join(trigram_tokens).lower()
+        params['limit'] = limit + len(hits)
+        selects = []
+        for kind, (table, document) in PG_SEARCH_DOCUMENTS.items():
+            if kind not in kinds:
+                continue
+            expression = f"lower(translate({document}, 'ёЁ', 'еЕ'))"
+            conditions = ' AND '.join(f'{expression} LIKE :like{i}' for i in range(len(trigram_tokens)))
+            selects.append(f"SELECT '{kind}' AS kind, id, similarity({expression}, :query) AS rank "
+                           f"FROM {table} WHERE {conditions}")
+        seen = set(hits)
+        for kind, object_id, _ in db.session.execute(text(
+            ' UNION ALL '.join(selects) + ' ORDER BY rank DESC LIMIT :limit'
+        ), params):
+            if (kind, object_id) not in seen and len(hits) < limit:
+                hits.append((kind, object_id))
+    return hits
+
+
+def _hydrate(hits):
+    # Данные для вывода — по одному запросу на тип
+    ids = {kind: [object_id for hit_kind, object_id in hits if hit_kind == kind] for kind in SEARCH_KINDS}
+    details = {}
+    if ids['student']:
+        for row in db.session.query(Student.id, Student.full_name, Student.email,
+                                     Group.name.label('group_name'), Faculty.short_name) \
+                .join(Group, Student.group_id == Group.id).join(Faculty, Group.faculty_id == Faculty.id) \
+                .filter(Student.id.in_(ids['student'])):
+            details[('student', row.id)] = SearchResult(
+                'student', row.id, row.full_name, f'{row.email} · {row.short_name}, {row.group_name}',
+                url_for('students.view_student_card', student_id=row.id))
+    if ids['group']:
+        for row in db.session.query(Group.id, Group.name, Faculty.name.label('faculty_name')) \
+                .join(Faculty, Group.faculty_id == Faculty.id).filter(Group.id.in_(ids['group'])):
+            details[('group', row.id)] = SearchResult(
+                'group', row.id, row.name, row.faculty_name,
+                url_for('group_students.list_students_in_group', group_id=row.id))
+    if ids['faculty']:
+        for row in db.session.query(Faculty.id, Faculty.name, Faculty.short_name) \
+                .filter(Faculty.id.in_(ids['faculty'])):
+            details[('faculty', row.id)] = SearchResult(
+                'faculty', row.id, row.name, row.short_name,
+                url_for('faculty_groups.list_groups', faculty_id=row.id))
+    return [details[hit] for hit in hits if hit in details]
+
+
+def search(query, kinds=None, limit=SEARCH_DEFAULT_LIMIT):
+    # Результаты в порядке релевантности; kinds — подмножество SEARCH_KINDS
+    tokens = _tokens(query or '')
+    if not tokens:
+        return []
+    kinds = [kind for kind in (kinds or ()) if kind in SEARCH_KINDS] or None
+    limit = min(max(limit, 1), SEARCH_MAX_LIMIT)
+    if db.engine.dialect.name == 'postgresql':
+        hits = _postgresql_search(tokens, kinds, limit)
+    else:
+        hits = _sqlite_search(tokens, kinds, limit)
+    return _hydrate(hits)
+
+
+def _sqlite_text(columns):
+    if not columns:
+        return "''"
+    joined = " || ' ' || ".join(columns)
+    return f"replace(replace({joined}, 'ё', 'е'), 'Ё', 'Е')"
+
+
+def rebuild_search_index(connection):
+    # Полное перестроение индекса SQLite (например, если пересоздание таблицы
+    # в миграции batch_alter_table удалило триггеры). В PostgreSQL индексы
+    # обычные и поддерживаются СУБД.
+    if connection.dialect.name != 'sqlite':
+        return
+    for table in SQLITE_SEARCH_TABLES:
+        connection.execute(text(f'DELETE FROM {table}'))
+        for kind, (source, title, detail) in SQLITE_SEARCH_SOURCES.items():
+            connection.execute(text(
+                f'INSERT INTO {table} (rowid, title, detail) '
+                f'SELECT id * {SEARCH_ROWID_STRIDE} + {SEARCH_KINDS[kind]}, '
+                f'{_sqlite_text(title)}, {_sqlite_text(detail)} FROM {source}'
+            ))
+        connection.execute(text(f"INSERT INTO {table} ({table}) VALUES ('optimize')"))
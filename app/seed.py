@@ -0,0 +1,133 @@
+import datetime
+import random
+
+from sqlalchemy import func, insert, select
+
+from app import db
+from app.academic import compute_course, compute_status, current_academic_year
+from app.counters import recount_counters
+from app.group_names import group_name, sync_group_name_sequences
+from app.models import Faculty, Group, Student
+
+# Генератор синтетических данных для разработки и нагрузочных тестов (flask seed).
+# Записи вставляются пачками через Core INSERT, затем одним проходом
+# пересчитываются счетчики и номера групп. При одинаковом seed данные одинаковые.
+
+SEED_BATCH_SIZE = 5000
+
+FACULTY_NAMES = [
+    ('Информационных технологий', 'ФИТ'),
+    ('Экономический', 'ЭФ'),
+    ('Юридический', 'ЮФ'),
+    ('Физико-математический', 'ФМФ'),
+    ('Филологический', 'ФФ'),
+    ('Исторический', 'ИФ'),
+    ('Химический', 'ХФ'),
+    ('Биологический', 'БФ'),
+    ('Психологии', 'ФП'),
+    ('Журналистики', 'ФЖ'),
+]
+
+MALE_NAMES = ['Александр', 'Дмитрий', 'Максим', 'Сергей', 'Андрей', 'Алексей', 'Артём',
+              'Илья', 'Кирилл', 'Михаил', 'Никита', 'Егор', 'Иван', 'Павел', 'Роман']
+FEMALE_NAMES = ['Анастасия', 'Мария', 'Дарья', 'Анна', 'Елизавета', 'Полина', 'Виктория',
+                'Екатерина', 'Софья', 'Алёна', 'Ксения', 'Ольга', 'Юлия', 'Наталья', 'Ирина']
+# Фамилии в мужской форме; женская получается окончанием -а
+SURNAMES = ['Иванов', 'Смирнов', 'Кузнецов', 'Попов', 'Васильев', 'Петров', 'Соколов',
+            'Михайлов', 'Новиков', 'Фёдоров', 'Морозов', 'Волков', 'Алексеев', 'Лебедев',
+            'Семёнов', 'Егоров', 'Павлов', 'Козлов', 'Степанов', 'Николаев', 'Орлов',
+            'Андреев', 'Макаров', 'Никитин', 'Захаров', 'Зайцев', 'Соловьёв', 'Борисов']
+PATRONYMIC_ROOTS = ['Александров', 'Дмитриев', 'Сергеев', 'Андреев', 'Алексеев',
+                    'Михайлов', 'Иванов', 'Павлов', 'Николаев', 'Викторов']
+
+_TRANSLIT = dict(zip(
+    'абвгдеёжзийклмнопрстуфхцчшщъыьэюя',
+    ['a', 'b', 'v', 'g', 'd', 'e', 'e', 'zh', 'z', 'i', 'y', 'k', 'l', 'm', 'n', 'o', 'p',
+     'r', 's', 't', 'u', 'f', 'kh', 'ts', 'ch', 'sh', 'shch', '', 'y', '', 'e', 'yu', 'ya']
+))
+
+
+def _translit(value):
+    return ''.join(_TRANSLIT.get(char, char) for char in value.lower())
+
+
+def _full_name(rng):
+    surname, root = rng.choice(SURNAMES), rng.choice(PATRONYMIC_ROOTS)
+    if rng.random() < 0.5:
+        return f'{surname} {rng.choice(MALE_NAMES)} {root}ич', surname
+    return f'{surname}а {rng.choice(FEMALE_NAMES)} {root}на', surname
+
+
+def _insert_batches(table, rows, batch_size):
+    for start in range(0, len(rows), batch_size):
+        db.session.execute(insert(table), rows[start:start + batch_size])
+
+
+def seed_database(faculties=10, groups_per_faculty=10, students=1000, seed=0,
+                  batch_size=SEED_BATCH_SIZE):
+    # Добавляет данные к уже существующим; возвращает число созданных записей по таблицам
+    rng = random.Random(seed)
+    academic_year = current_academic_year()
+    connection = db.session.connection()
+
+    faculty_offset = connection.execute(select(func.count(Faculty.id))).scalar_one()
+    faculty_rows = []
+    for index in range(faculties):
+        base_name, base_short = FACULTY_NAMES[(faculty_offset + index) % len(FACULTY_NAMES)]
+        number = (faculty_offset + index) // len(FACULTY_NAMES)
+        suffix = f' {number + 1}' if number else ''
+        faculty_rows.append({
+            'name': f'Факультет: {base_name}{suffix}',
+            'short_name': f'{base_short}{number + 1 if number else ""}',
+            'description': f'Сгенерированный факультет ({base_name.lower()}).',
+        })
+    faculty_ids = connection.execute(
+        insert(Faculty.__table__).returning(Faculty.__table__.c.id, sort_by_parameter_order=True),
+        faculty_rows
+    ).scalars().all()
+
+    # Группы распределяются по годам поступления последних 4 лет
+    group_rows = []
+    for faculty_id, faculty_row in zip(faculty_ids, faculty_rows):
+        per_year = {}
+        for _ in range(groups_per_faculty):
+            year = academic_year - rng.randrange(4)
+            duration = rng.choice((4, 4, 4, 2, 5, 6))
+            per_year[year] = per_year.get(year, 0) + 1
+            group_rows.append({
+                'name': group_name(faculty_row['short_name'], per_year[year], year),
+                'year': year,
+                'duration': duration,
+                'course': compute_course(year, duration, academic_year),
+                'status': compute_status(year, duration, academic_year),
+                'faculty_id': faculty_id,
+            })
+    group_ids = connection.execute(
+        insert(Group.__table__).returning(Group.__table__.c.id, sort_by_parameter_order=True),
+        group_rows
+    ).scalars().all() if group_rows else []
+
+    if group_ids and students:
+        email_offset = connection.execute(select(func.coalesce(func.max(Student.id), 0))).scalar_one()
+        today = datetime.date.today()
+        student_rows = []
+        for index in range(students):
+            full_name, surname = _full_name(rng)
+            student_rows.append({
+                'full_name': full_name,
+                'date_of_birth': today.replace(year=today.year - 17 - rng.randrange(8), day=1)
+                                 - datetime.timedelta(days=rng.randrange(365)),
+                'phone_number': f'+7 9{rng.randrange(10, 100)} {rng.randrange(100, 1000)}-'
+                                f'{rng.randrange(10, 100)}-{rng.randrange(10, 100)}',
+                'email': f'{_translit(surname)}.{email_offset + index + 1}@students.example.edu',
+                'group_id': rng.choice(group_ids),
+            })
+            if len(student_rows) >= batch_size:
+                _insert_batches(Student.__table__, student_rows, batch_size)
+                student_rows = []
+        _insert_batches(Student.__table__, student_rows, batch_size)
+
+    recount_counters(connection)
+    sync_group_name_sequences(connection)
+    db.session.commit()
+    return {'faculties': len(faculty_ids), 'groups': len(group_ids), 'students': students if group_ids else 0}
@@ -0,0 +1,148 @@
+import base64
+import datetime
+import json
+
+from sqlalchemy import String, func, tuple_
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import FunctionElement
+
+
+class SimplePagination:
+    def __init__(self, page, per_page, total_items, items):
+        self.page = page
+        self.per_page = per_page
+        self.total = total_items
+        self.items = items
+        self.pages = (total_items + per_page - 1) // per_page if total_items > 0 else 0
+
+    @property
+    def has_prev(self):
+        return self.page > 1
+
+    @property
+    def has_next(self):
+        return self.page < self.pages
+
+    @property
+    def prev_num(self):
+        return self.page - 1 if self.has_prev else None
+
+    @property
+    def next_num(self):
+        return self.page + 1 if self.has_next else None
+
+    def iter_pages(self, left_edge=1, left_current=1, right_current=2, right_edge=1):
+        last = 0
+        for num in range(1, self.pages + 1):
+            if num <= left_edge or \
+               (num > self.page - left_current - 1 and num < self.page + right_current) or \
+               num > self.pages - right_edge:
+                if last + 1 != num:
+                    yield None
+                yield num
+                last = num
+
+
+def paginate_with_total(query, page, per_page):
+    # Страница и общее число строк за один запрос: COUNT(*) OVER () считается
+    # по всей выборке до применения LIMIT/OFFSET.
+    page = max(page, 1)
+    rows = query.add_columns(func.count().over().label('total_count')) \
+                .limit(per_page).offset((page - 1) * per_page).all()
+    if rows:
+        total = rows[0].total_count
+    elif page > 1:
+        # Страница за пределами выборки — общее число нужно только для навигации
+        total = query.order_by(None).count()
+    else:
+        total = 0
+    return SimplePagination(page, per_page, total, rows)
+
+
+class format_date_ru(FunctionElement):
+    # Дата в виде 'дд.мм.ГГГГ' на стороне БД (для поиска по отображаемой дате)
+    type = String()
+    name = 'format_date_ru'
+    inherit_cache = True
+
+
+@compiles(format_date_ru)
+def _format_date_ru_default(element, compiler, **kw):
+    return "strftime('%%d.%%m.%%Y', %s)" % compiler.process(element.clauses, **kw)
+
+
+@compiles(format_date_ru, 'postgresql')
+def _format_date_ru_postgresql(element, compiler, **kw):
+    return "to_char(%s, 'DD.MM.YYYY')" % compiler.process(element.clauses, **kw)
+
+
+def encode_cursor(*values):
+    payload = [v.isoformat() if isinstance(v, datetime.date) else v for v in values]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(token):
+    if not token:
+        return None
+    try:
+        values = json.loads(base64.urlsafe_b64decode(token.encode('ascii')))
+    except (ValueError, UnicodeError):
+        return None
+    return values if isinstance(values, list) else None
+
+
+class KeysetPagination:
+    def __init__(self, items, total, has_prev, has_next, prev_cursor, next_cursor):
+        self.items = items
+        self.total = total
+        self.has_prev = has_prev
+        self.has_next = has_next
+        self.prev_cursor = prev_cursor
+        self.next_cursor = next_cursor
+
+
+def keyset_paginate(query, sort_expr, id_column, per_page, descending=False,
+                    after=None, before=None, value_parser=None):
+    # Постраничный вывод по ключу (sort_expr, id) без OFFSET: следующая страница
+    # начинается строго после последней строки предыдущей. В выборке query
+    # должны быть столбцы 'sort_key' (значение sort_expr) и 'id'.
+    total = query.order_by(None).count()
+    key = tuple_(sort_expr, id_column)
+
+    def bound(cursor):
+        # Некорректный курсор (подделанный или устаревший) — просто первая страница
+        if cursor is None or len(cursor) != 2:
+            return None
+        value, row_id = cursor
+        try:
+            return (value_parser(value) if value_parser else value), int(row_id)
+        except (TypeError, ValueError):
+            return None
+
+    after, before = bound(after), bound(before)
+    backwards = False
+    if after is not None:
+        query = query.filter(key < after if descending else key > after)
+    elif before is not None:
+        query = query.filter(key > before if descending else key < before)
+        backwards = True
+
+    # При движении назад читаем в обратном порядке и разворачиваем страницу
+    if descending != backwards:
+        query = query.order_by(sort_expr.desc(), id_column.desc())
+    else:
+        query = query.order_by(sort_expr.asc(), id_column.asc())
+
+    rows = query.limit(per_page + 1).all()
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if backwards:
+        rows.reverse()
+        has_prev, has_next = has_more, True
+    else:
+        has_prev, has_next = after is not None, has_more
+
+    prev_cursor = encode_cursor(rows[0].sort_key, rows[0].id) if rows and has_prev else None
+    next_cursor = encode_cursor(rows[-1].sort_key, rows[-1].id) if rows and has_next else None
+    return KeysetPagination(rows, total, has_prev and bool(rows), has_next and bool(rows),
+                            prev_cursor, next_cursor)
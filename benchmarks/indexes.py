@@ -0,0 +1,155 @@
+"""Сравнение планов запросов и времени выполнения до и после миграции с индексами.
+
+Создает две временные SQLite-базы с одинаковыми данными: схему без индексов
+(как до миграции 3f9a1c2d4e5b) и схему из текущих моделей, затем выполняет
+запросы списков и генерации имен групп и печатает EXPLAIN QUERY PLAN и медиану.
+
+    python benchmarks/indexes.py --faculties 200 --groups 20 --students 25
+"""
+import argparse
+import datetime
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+from sqlalchemy import column, create_engine, insert, table, text
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from app import db  # noqa: E402
+from app import models  # noqa: E402,F401
+
+# Схема до миграции с индексами (без индексов и ограничения (faculty_id, name))
+BASELINE_DDL = [
+    """CREATE TABLE faculty (
+        id INTEGER NOT NULL PRIMARY KEY,
+        name VARCHAR(128) NOT NULL,
+        short_name VARCHAR(32) NOT NULL,
+        description TEXT)""",
+    """CREATE TABLE "group" (
+        id INTEGER NOT NULL PRIMARY KEY,
+        year INTEGER NOT NULL,
+        duration INTEGER NOT NULL,
+        name VARCHAR(64) NOT NULL,
+        course INTEGER NOT NULL,
+        status VARCHAR(32),
+        faculty_id INTEGER NOT NULL REFERENCES faculty (id))""",
+    """CREATE TABLE student (
+        id INTEGER NOT NULL PRIMARY KEY,
+        full_name VARCHAR(100) NOT NULL,
+        email VARCHAR(128) NOT NULL UNIQUE,
+        group_id INTEGER NOT NULL REFERENCES "group" (id),
+        date_of_birth DATE NOT NULL,
+        phone_number VARCHAR(32) NOT NULL,
+        photo_filename VARCHAR(255))""",
+]
+
+# Вставка только столбцов исходной схемы: подходит и для BASELINE_DDL, и для
+# схемы из текущих моделей (остальные столбцы заполняются значениями по умолчанию)
+BASELINE_TABLES = {
+    'faculty': table('faculty', *map(column, ('id', 'name', 'short_name', 'description'))),
+    'group': table('group', *map(column, ('id', 'year', 'duration', 'name', 'course', 'status', 'faculty_id'))),
+    'student': table('student', *map(column, ('id', 'full_name', 'email', 'group_id', 'date_of_birth',
+                                              'phone_number', 'photo_filename'))),
+}
+
+QUERIES = {
+    'Список студентов группы': (
+        'SELECT id, full_name FROM student WHERE group_id = :group_id '
+        'ORDER BY lower(full_name), id LIMIT 26'
+    ),
+    'Количество студентов группы': 'SELECT count(*) FROM student WHERE group_id = :group_id',
+    'Группы факультета за год (генерация имени)': (
+        'SELECT count(*) FROM "group" WHERE faculty_id = :faculty_id AND year = :year'
+    ),
+    'Поиск группы по имени': (
+        'SELECT id FROM "group" WHERE faculty_id = :faculty_id AND name = :group_name'
+    ),
+    'Группы факультета (переименование)': 'SELECT id, name FROM "group" WHERE faculty_id = :faculty_id',
+    'Список факультетов со счетчиками': (
+        'SELECT faculty.id, count(DISTINCT "group".id), count(student.id) FROM faculty '
+        'LEFT OUTER JOIN "group" ON "group".faculty_id = faculty.id '
+        'LEFT OUTER JOIN student ON student.group_id = "group".id '
+        'GROUP BY faculty.id ORDER BY faculty.id LIMIT 10'
+    ),
+    'Факультеты по имени без учета регистра': 'SELECT id FROM faculty ORDER BY lower(name) LIMIT 10',
+}
+
+
+def seed(engine, faculties, groups_per_faculty, students_per_group):
+    rnd = random.Random(42)
+    faculty_rows, group_rows, student_rows = [], [], []
+    group_id = student_id = 0
+    for f in range(1, faculties + 1):
+        faculty_rows.append({'id': f, 'name': f'Факультет {f}', 'short_name': f'F{f}', 'description': None})
+        for g in range(groups_per_faculty):
+            group_id += 1
+            year = 2018 + g % 8
+            group_rows.append({'id': group_id, 'year': year, 'duration': 4, 'name': f'F{f}-{g + 1}-{str(year)[-2:]}',
+                               'course': 1, 'status': 'Учится', 'faculty_id': f})
+            for _ in range(students_per_group):
+                student_id += 1
+                student_rows.append({
+                    'id': student_id, 'full_name': f'Студент {rnd.randrange(10 ** 6)}',
+                    'email': f's{student_id}@example.com', 'group_id': group_id,
+                    'date_of_birth': datetime.date(2000 + rnd.randrange(8), 1 + rnd.randrange(12), 1),
+                    'phone_number': '+7 900 000-00-00', 'photo_filename': None,
+                })
+    with engine.begin() as conn:
+        conn.execute(insert(BASELINE_TABLES['faculty']), faculty_rows)
+        conn.execute(insert(BASELINE_TABLES['group']), group_rows)
+        conn.execute(insert(BASELINE_TABLES['student']), student_rows)
+        conn.exec_driver_sql('ANALYZE')
+    return group_id
+
+
+def measure(engine, sql, params, repeat):
+    timings = []
+    with engine.connect() as conn:
+        plan = [row[-1] for row in conn.execute(text('EXPLAIN QUERY PLAN ' + sql), params)]
+        for _ in range(repeat):
+            started = time.perf_counter()
+            conn.execute(text(sql), params).fetchall()
+            timings.append((time.perf_counter() - started) * 1000)
+    return plan, statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--faculties', type=int, default=200)
+    parser.add_argument('--groups', type=int, default=20, help='групп на факультет')
+    parser.add_argument('--students', type=int, default=25, help='студентов в группе')
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        baseline = create_engine(f'sqlite:///{os.path.join(tmp, "baseline.sqlite3")}')
+        indexed = create_engine(f'sqlite:///{os.path.join(tmp, "indexed.sqlite3")}')
+        with baseline.begin() as conn:
+            for ddl in BASELINE_DDL:
+                conn.exec_driver_sql(ddl)
+        db.metadata.create_all(indexed, tables=[db.metadata.tables[name] for name in ('faculty', 'group', 'student')])
+
+        total_groups = seed(baseline, args.faculties, args.groups, args.students)
+        seed(indexed, args.faculties, args.groups, args.students)
+        print(f'Данные: {args.faculties} факультетов, {total_groups} групп, '
+              f'{total_groups * args.students} студентов\n')
+
+        faculty_id = args.faculties // 2 or 1
+        params = {'group_id': total_groups // 2 or 1, 'faculty_id': faculty_id, 'year': 2020,
+                  'group_name': f'F{faculty_id}-3-20'}
+        for title, sql in QUERIES.items():
+            before_plan, before_ms = measure(baseline, sql, params, args.repeat)
+            after_plan, after_ms = measure(indexed, sql, params, args.repeat)
+            print(f'== {title}')
+            print(f'   без индексов: {before_ms:8.3f} мс  | {"; ".join(before_plan)}')
+            print(f'   с индексами:  {after_ms:8.3f} мс  | {"; ".join(after_plan)}')
+        baseline.dispose()
+        indexed.dispose()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,210 @@
+"""Нагрузочный прогон основных страниц на синтетических данных разного объема.
+
+Для каждого объема создает временную SQLite-базу, применяет миграции, заполняет ее
+генератором flask seed и измеряет через тестовый клиент Flask (без сети и кеша
+страниц) время ответа страниц: p50/p95/p99, среднее и пропускную способность.
+Результат можно сохранить как эталон и сравнивать с ним последующие прогоны:
+
+    python benchmarks/run.py --save-baseline benchmarks/baseline.json
+    python benchmarks/run.py --sizes 1k,10k --compare benchmarks/baseline.json
+
+При сравнении код возврата 1, если p95 какого-либо сценария вырос больше порога.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from flask_migrate import upgrade  # noqa: E402
+
+from app import create_app, db  # noqa: E402
+from app.models import Faculty, Group, Student  # noqa: E402
+from app.seed import seed_database  # noqa: E402
+
+# Объем -> (факультетов, групп на факультет, студентов)
+SIZES = {
+    '1k': (10, 10, 1000),
+    '10k': (20, 20, 10000),
+    '100k': (50, 40, 100000),
+}
+
+# Сценарий -> (функция, возвращающая URL по выборке id, число итераций относительно --iterations)
+SCENARIOS = {
+    'list_faculties': (lambda ids, rnd: '/faculties/', 1.0),
+    'list_groups': (lambda ids, rnd: f'/faculties/{rnd.choice(ids["faculty"])}/groups/', 1.0),
+    'list_students_in_group': (lambda ids, rnd: f'/groups/{rnd.choice(ids["group"])}/students/', 1.0),
+    'view_student_card': (lambda ids, rnd: f'/students/{rnd.choice(ids["student"])}/view_card', 1.0),
+    # Экспорт всей базы заметно дольше остальных страниц
+    'export_excel': (lambda ids, rnd: '/data/export/excel', 0.1),
+    'export_parquet': (lambda ids, rnd: '/data/export/excel?format=parquet', 0.1),
+}
+
+# Сколько случайных id каждого типа использовать для запросов
+SAMPLE_SIZE = 200
+
+
+def percentile(values, percent):
+    ordered = sorted(values)
+    index = (len(ordered) - 1) * percent / 100
+    lower = int(index)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (index - lower)
+
+
+def sample_ids(rnd):
+    ids = {}
+    for kind, model in (('faculty', Faculty), ('group', Group), ('student', Student)):
+        all_ids = [row[0] for row in db.session.query(model.id)]
+        ids[kind] = rnd.sample(all_ids, min(SAMPLE_SIZE, len(all_ids)))
+    return ids
+
+
+def measure(client, url_for_iteration, iterations, warmup):
+    for _ in range(warmup):
+        client.get(url_for_iteration())
+    timings = []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        url = url_for_iteration()
+        request_started = time.perf_counter()
+        response = client.get(url)
+        timings.append((time.perf_counter() - request_started) * 1000)
+        if response.status_code not in (200, 202):
+            raise RuntimeError(f'{url}: HTTP {response.status_code}')
+    elapsed = time.perf_counter() - started
+    return {
+        'iterations': iterations,
+        'p50_ms': round(percentile(timings, 50), 3),
+        'p95_ms': round(percentile(timings, 95), 3),
+        'p99_ms': round(percentile(timings, 99), 3),
+        'mean_ms': round(statistics.fmean(timings), 3),
+        'rps': round(iterations / elapsed, 1),
+    }
+
+
+def run_size(size, scenarios, iterations, warmup, seed):
+    faculties, groups_per_faculty, students = SIZES[size]
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app({
+            'SQLALCHEMY_DATABASE_URI': f'sqlite:///{os.path.join(tmp, "bench.sqlite3")}',
+            'UPLOAD_FOLDER': os.path.join(tmp, 'uploads'),
+            'CACHE_TYPE': 'null',
+            'LOG_LEVEL': 'ERROR',
+            # Экспорт XLSX — фоновая задача; в замере она выполняется в самом запросе
+            'JOBS_EAGER': True,
+            'JOBS_FOLDER': os.path.join(tmp, 'jobs'),
+        })
+        with app.app_context():
+            upgrade(directory=os.path.join(ROOT, 'migrations'))
+            started = time.perf_counter()
+            seed_database(faculties, groups_per_faculty, students, seed=seed)
+            print(f'[{size}] данные созданы за {time.perf_counter() - started:.1f} с', file=sys.stderr)
+            rnd = random.Random(seed)
+            ids = sample_ids(rnd)
+            db.session.remove()
+
+        results = {}
+        client = app.test_client()
+        for name in scenarios:
+            make_url, weight = SCENARIOS[name]
+            count = max(int(iterations * weight), 5)
+            results[name] = measure(client, lambda: make_url(ids, rnd), count, max(int(warmup * weight), 1))
+            print(f'[{size}] {name:24} p50 {results[name]["p50_ms"]:9.2f} мс  '
+                  f'p95 {results[name]["p95_ms"]:9.2f} мс  {results[name]["rps"]:8.1f} req/s', file=sys.stderr)
+        with app.app_context():
+            db.engine.dispose()
+    return {'faculties': faculties, 'groups': faculties * groups_per_faculty,
+            'students': students, 'scenarios': results}
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current, baseline, threshold):
+    # Возвращает список регрессий: p95 вырос больше чем на threshold (доля)
+    regressions = []
+    for size, data in current['sizes'].items():
+        base_size = baseline.get('sizes', {}).get(size)
+        if not base_size:
+            continue
+        for name, result in data['scenarios'].items():
+            base = base_size['scenarios'].get(name)
+            if not base:
+                continue
+            change = result['p95_ms'] / base['p95_ms'] - 1 if base['p95_ms'] else 0.0
+            mark = 'РЕГРЕССИЯ' if change > threshold else 'ok'
+            print(f'{size:>5} {name:24} p95 {base["p95_ms"]:9.2f} -> {result["p95_ms"]:9.2f} мс '
+                  f'({change:+.0%}) {mark}')
+            if change > threshold:
+                regressions.append((size, name, change))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default=','.join(SIZES), help=f'объемы через запятую: {", ".join(SIZES)}')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help='сценарии через запятую')
+    parser.add_argument('--iterations', type=int, default=200, help='запросов на сценарий')
+    parser.add_argument('--warmup', type=int, default=20, help='прогревочных запросов на сценарий')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='записать результат в JSON-файл')
+    parser.add_argument('--save-baseline', metavar='PATH', help='сохранить результат как эталон')
+    parser.add_argument('--compare', metavar='PATH', help='сравнить с эталоном')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='допустимый рост p95 при сравнении (доля, по умолчанию 0.2)')
+    args = parser.parse_args()
+
+    sizes = [size for size in args.sizes.split(',') if size]
+    scenarios = [name for name in args.scenarios.split(',') if name]
+    unknown = [value for value in sizes if value not in SIZES] + [value for value in scenarios if value not in SCENARIOS]
+    if unknown:
+        parser.error(f'неизвестные значения: {", ".join(unknown)}')
+
+    result = {
+        'meta': {
+            'date': datetime.datetime.now().isoformat(timespec='seconds'),
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+            'iterations': args.iterations,
+            'seed': args.seed,
+        },
+        'sizes': {size: run_size(size, scenarios, args.iterations, args.warmup, args.seed) for size in sizes},
+    }
+
+    for path in filter(None, (args.output, args.save_baseline)):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+            f.write('\n')
+    if not args.output and not args.save_baseline:
+        json.dump(result, sys.stdout, ensure_ascii=False, indent=2)
+        print()
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(result, baseline, args.threshold)
+        if regressions:
+            print(f'Регрессий: {len(regressions)} (порог {args.threshold:.0%})')
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+# Настройки gunicorn (gunicorn -c gunicorn.conf.py wsgi:app). Значения берутся из
+# переменных окружения, чтобы один файл подходил для разных машин.
+import multiprocessing
+import os
+
+
+def _env_int(name, default):
+    value = os.environ.get(name)
+    return int(value) if value not in (None, '') else default
+
+
+def _env_bool(name, default):
+    value = os.environ.get(name)
+    if value in (None, ''):
+        return default
+    return value.lower() in ('1', 'true', 'yes', 'on')
+
+
+bind = os.environ.get('BIND') or f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+
+# По процессу на ядро; в каждом несколько потоков для запросов, ждущих БД/диск
+workers = _env_int('WEB_CONCURRENCY', multiprocessing.cpu_count())
+# Число процессов видно приложению (app.cache отказывается от кеша memory при > 1)
+os.environ['WEB_CONCURRENCY'] = str(workers)
+worker_class = 'gthread'
+threads = _env_int('GUNICORN_THREADS', 4)
+
+# Приложение создается один раз в мастер-процессе и наследуется рабочими при fork:
+# быстрее старт и меньше памяти. Соединения с БД после fork пересоздаются (post_fork).
+# С preload HUP перезапускает рабочие процессы, но не перечитывает код — для
+# обновления кода: kill -USR2 <master> (новый мастер), затем kill -QUIT <старый master>.
+preload_app = _env_bool('GUNICORN_PRELOAD', True)
+
+# Keep-alive за обратным прокси: держать соединение чуть дольше, чем прокси
+keepalive = _env_int('GUNICORN_KEEPALIVE', 5)
+timeout = _env_int('GUNICORN_TIMEOUT', 60)
+graceful_timeout = _env_int('GUNICORN_GRACEFUL_TIMEOUT', 30)
+
+# Плановый перезапуск рабочих процессов (утечки памяти), со случайным разбросом,
+# чтобы процессы не перезапускались одновременно
+max_requests = _env_int('GUNICORN_MAX_REQUESTS', 2000)
+max_requests_jitter = _env_int('GUNICORN_MAX_REQUESTS_JITTER', 200)
+
+# Heartbeat рабочих процессов — в памяти, а не на диске
+if os.path.isdir('/dev/shm'):
+    worker_tmp_dir = '/dev/shm'
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-')
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
+forwarded_allow_ips = os.environ.get('FORWARDED_ALLOW_IPS', '127.0.0.1')
+
+
+def post_fork(server, worker):
+    # Пул соединений, унаследованный от мастера, рабочему процессу не принадлежит:
+    # соединения сбрасываются без закрытия (их сокеты остаются у мастера),
+    # каждый процесс открывает свои при первом запросе
+    from app import db
+    from wsgi import app
+
+    with app.app_context():
+        db.engine.dispose(close=False)
@@ -97,6 +97,14 @@ def run_migrations_online():
     connectable = get_engine()
 
     with connectable.connect() as connection:
+        # SQLite: batch-миграции пересоздают таблицы (DROP TABLE), а с включенными
+        # внешними ключами удаление таблицы group каскадно удалило бы студентов.
+        # PRAGMA действует только вне транзакции; после миграций соединение
+        # закрывается, а не возвращается в пул с выключенными ключами
+        sqlite = connection.dialect.name == 'sqlite'
+        if sqlite:
+            connection.exec_driver_sql('PRAGMA foreign_keys=OFF')
+            connection.commit()  # иначе Alembic не начнет и не зафиксирует свою транзакцию
         context.configure(
             connection=connection,
             target_metadata=get_metadata(),
@@ -106,6 +114,9 @@ def run_migrations_online():
         with context.begin_transaction():
             context.run_migrations()
 
+        if sqlite:
+            connection.invalidate()
+
 
 if context.is_offline_mode():
     run_migrations_offline()
@@ -0,0 +1,42 @@
+"""Add indexes for foreign keys and search columns
+
+Revision ID: 3f9a1c2d4e5b
+Revises: fddc5a34cac0
+Create Date: 2026-10-18 10:12:40.512903
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f9a1c2d4e5b'
+down_revision = 'fddc5a34cac0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Отдельный индекс на group.faculty_id не создается: его роль выполняют
+    # ix_group_faculty_id_year и uq_group_faculty_id_name, где faculty_id — первый столбец
+    with op.batch_alter_table('group', schema=None) as batch_op:
+        batch_op.create_index('ix_group_faculty_id_year', ['faculty_id', 'year'], unique=False)
+        batch_op.create_unique_constraint('uq_group_faculty_id_name', ['faculty_id', 'name'])
+
+    with op.batch_alter_table('student', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_student_group_id'), ['group_id'], unique=False)
+
+    op.create_index('ix_faculty_lower_name', 'faculty', [sa.text('lower(name)')], unique=False)
+    op.create_index('ix_faculty_lower_short_name', 'faculty', [sa.text('lower(short_name)')], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_faculty_lower_short_name', table_name='faculty')
+    op.drop_index('ix_faculty_lower_name', table_name='faculty')
+
+    with op.batch_alter_table('student', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_student_group_id'))
+
+    with op.batch_alter_table('group', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_group_faculty_id_name', type_='unique')
+        batch_op.drop_index('ix_group_faculty_id_year')
@@ -0,0 +1,46 @@
+"""Add denormalized group and student counters
+
+Revision ID: 5c2e8b7a9d14
+Revises: 3f9a1c2d4e5b
+Create Date: 2026-10-18 11:03:17.228641
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5c2e8b7a9d14'
+down_revision = '3f9a1c2d4e5b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('faculty', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('num_groups', sa.Integer(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('num_students', sa.Integer(), server_default='0', nullable=False))
+
+    with op.batch_alter_table('group', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('num_students', sa.Integer(), server_default='0', nullable=False))
+
+    # Начальное заполнение счетчиков по существующим данным
+    op.execute(
+        'UPDATE "group" SET num_students = '
+        '(SELECT count(*) FROM student WHERE student.group_id = "group".id)'
+    )
+    op.execute(
+        'UPDATE faculty SET '
+        'num_groups = (SELECT count(*) FROM "group" WHERE "group".faculty_id = faculty.id), '
+        'num_students = (SELECT count(*) FROM student JOIN "group" ON student.group_id = "group".id '
+        'WHERE "group".faculty_id = faculty.id)'
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('group', schema=None) as batch_op:
+        batch_op.drop_column('num_students')
+
+    with op.batch_alter_table('faculty', schema=None) as batch_op:
+        batch_op.drop_column('num_students')
+        batch_op.drop_column('num_groups')
@@ -0,0 +1,110 @@
+"""Add full-text search index
+
+Revision ID: 8d41f6b2c7e3
+Revises: 5c2e8b7a9d14
+Create Date: 2026-10-18 14:26:41.518203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8d41f6b2c7e3'
+down_revision = '5c2e8b7a9d14'
+branch_labels = None
+depends_on = None
+
+
+# SQLite: две таблицы FTS5 с общим rowid = id * 4 + код типа (1 — факультет,
+# 2 — группа, 3 — студент). search_fts ищет по словам и их началу, search_trigram —
+# по любой подстроке от 3 символов. Заполняются триггерами на исходных таблицах.
+SEARCH_TABLES = {
+    'search_fts': "unicode61 remove_diacritics 2",
+    'search_trigram': "trigram",
+}
+
+# таблица, код типа, столбцы title и detail. Индекс обновляется только при изменении
+# этих столбцов (изменения счетчиков его не трогают).
+SEARCH_SOURCES = [
+    ('faculty', 1, ['name'], ['short_name']),
+    ('group', 2, ['name'], []),
+    ('student', 3, ['full_name'], ['email', 'phone_number']),
+]
+
+# PostgreSQL: функциональные GIN-индексы по тем же полям (tsvector и pg_trgm),
+# отдельная таблица и триггеры не нужны
+PG_SEARCH_DOCUMENTS = [
+    ('faculty', "name || ' ' || short_name"),
+    ('group', 'name'),
+    ('student', "full_name || ' ' || email || ' ' || phone_number"),
+]
+
+
+def _text(alias, columns):
+    # Столбцы через пробел; 'ё' и 'е' считаются одной буквой (как и в app.search)
+    if not columns:
+        return "''"
+    joined = " || ' ' || ".join(f'{alias}.{column}' for column in columns)
+    return f"replace(replace({joined}, 'ё', 'е'), 'Ё', 'Е')"
+
+
+def _sqlite_upgrade():
+    for table, tokenizer in SEARCH_TABLES.items():
+        op.execute(f"CREATE VIRTUAL TABLE {table} USING fts5(title, detail, tokenize='{tokenizer}')")
+
+    for source, code, title, detail in SEARCH_SOURCES:
+        columns = ', '.join(title + detail)
+        for table in SEARCH_TABLES:
+            insert = (f'INSERT INTO {table} (rowid, title, detail) VALUES '
+                      f'(new.id * 4 + {code}, {_text("new", title)}, {_text("new", detail)});')
+            delete = f'DELETE FROM {table} WHERE rowid = old.id * 4 + {code};'
+            op.execute(f'CREATE TRIGGER {table}_{source}_ai AFTER INSERT ON "{source}" BEGIN {insert} END')
+            op.execute(f'CREATE TRIGGER {table}_{source}_ad AFTER DELETE ON "{source}" BEGIN {delete} END')
+            op.execute(f'CREATE TRIGGER {table}_{source}_au AFTER UPDATE OF {columns} ON "{source}" '
+                       f'BEGIN {delete} {insert} END')
+            # Начальное заполнение по существующим данным
+            op.execute(f'INSERT INTO {table} (rowid, title, detail) '
+                       f'SELECT s.id * 4 + {code}, {_text("s", title)}, {_text("s", detail)} '
+                       f'FROM "{source}" AS s')
+
+
+def _sqlite_downgrade():
+    for source, _, _, _ in SEARCH_SOURCES:
+        for table in SEARCH_TABLES:
+            for suffix in ('ai', 'ad', 'au'):
+                op.execute(f'DROP TRIGGER IF EXISTS {table}_{source}_{suffix}')
+    for table in SEARCH_TABLES:
+        op.execute(f'DROP TABLE IF EXISTS {table}')
+
+
+def _postgresql_upgrade():
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for source, document in PG_SEARCH_DOCUMENTS:
+        document = f"translate({document}, 'ёЁ', 'еЕ')"
+        op.execute(f'CREATE INDEX ix_{source}_search_tsv ON "{source}" '
+                   f"USING gin (to_tsvector('simple', {document}))")
+        op.execute(f'CREATE INDEX ix_{source}_search_trgm ON "{source}" '
+                   f'USING gin (lower({document}) gin_trgm_ops)')
+
+
+def _postgresql_downgrade():
+    for source, _ in PG_SEARCH_DOCUMENTS:
+        op.execute(f'DROP INDEX IF EXISTS ix_{source}_search_tsv')
+        op.execute(f'DROP INDEX IF EXISTS ix_{source}_search_trgm')
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        _sqlite_upgrade()
+    elif dialect == 'postgresql':
+        _postgresql_upgrade()
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        _sqlite_downgrade()
+    elif dialect == 'postgresql':
+        _postgresql_downgrade()
@@ -0,0 +1,49 @@
+"""Add group name sequence
+
+Revision ID: a6e3d9f1b284
+Revises: 8d41f6b2c7e3
+Create Date: 2026-10-18 15:42:09.731566
+
+"""
+import re
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a6e3d9f1b284'
+down_revision = '8d41f6b2c7e3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    sequence = op.create_table('group_name_sequence',
+    sa.Column('faculty_id', sa.Integer(), nullable=False),
+    sa.Column('year', sa.Integer(), nullable=False),
+    sa.Column('last_index', sa.Integer(), server_default='0', nullable=False),
+    sa.ForeignKeyConstraint(['faculty_id'], ['faculty.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('faculty_id', 'year')
+    )
+
+    # Начальные значения — наибольший номер среди существующих имен групп
+    rows = op.get_bind().execute(sa.text(
+        'SELECT g.faculty_id, g.year, g.name, f.short_name '
+        'FROM "group" AS g JOIN faculty AS f ON f.id = g.faculty_id'
+    ))
+    last_indexes = {}
+    for faculty_id, year, name, short_name in rows:
+        match = re.fullmatch(rf'{re.escape(short_name)}-(\d+)-{str(year)[-2:]}', name)
+        if match:
+            key = (faculty_id, year)
+            last_indexes[key] = max(last_indexes.get(key, 0), int(match.group(1)))
+    if last_indexes:
+        op.bulk_insert(sequence, [
+            {'faculty_id': faculty_id, 'year': year, 'last_index': last_index}
+            for (faculty_id, year), last_index in last_indexes.items()
+        ])
+
+
+def downgrade():
+    op.drop_table('group_name_sequence')
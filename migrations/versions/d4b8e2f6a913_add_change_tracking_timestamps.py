@@ -0,0 +1,134 @@
+"""Add change tracking timestamps and deletion tombstones
+
+Revision ID: d4b8e2f6a913
+Revises: c1f7a3e5d920
+Create Date: 2026-10-18 18:31:12.402987
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd4b8e2f6a913'
+down_revision = 'c1f7a3e5d920'
+branch_labels = None
+depends_on = None
+
+
+# created_at/updated_at (UTC) и таблица deleted_record поддерживаются триггерами,
+# поэтому учитываются любые изменения: ORM, массовые UPDATE (rollover,
+# переименование групп), импорт и каскадные удаления. updated_at меняется только
+# при фактическом изменении перечисленных столбцов (счетчики его не трогают).
+TRACKED_COLUMNS = {
+    'faculty': ['name', 'short_name', 'description'],
+    'group': ['name', 'year', 'duration', 'faculty_id', 'course', 'status'],
+    'student': ['full_name', 'date_of_birth', 'phone_number', 'email', 'group_id', 'photo_filename'],
+}
+
+# Текущее время UTC в формате, в котором SQLAlchemy хранит DateTime в SQLite
+# (микросекунды), чтобы сравнение строк совпадало со сравнением времени
+SQLITE_NOW = "strftime('%Y-%m-%d %H:%M:%f000', 'now')"
+PG_NOW = "(now() at time zone 'utc')"
+
+
+def _create_tombstone_table(now):
+    op.create_table('deleted_record',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('table_name', sa.String(length=32), nullable=False),
+    sa.Column('record_id', sa.Integer(), nullable=False),
+    sa.Column('deleted_at', sa.DateTime(), server_default=sa.text(f'({now})'), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_deleted_record_deleted_at', 'deleted_record', ['deleted_at'], unique=False)
+
+
+def _sqlite_upgrade():
+    _create_tombstone_table(SQLITE_NOW)
+    for table, columns in TRACKED_COLUMNS.items():
+        # ALTER TABLE ADD COLUMN в SQLite допускает только постоянное значение по
+        # умолчанию; время вставки проставляет триггер _touch_ai
+        for column in ('created_at', 'updated_at'):
+            op.add_column(table, sa.Column(column, sa.DateTime(), nullable=False,
+                                           server_default='1970-01-01 00:00:00.000000'))
+        op.execute(f'UPDATE "{table}" SET created_at = {SQLITE_NOW}, updated_at = {SQLITE_NOW}')
+        op.create_index(f'ix_{table}_updated_at', table, ['updated_at'], unique=False)
+
+        changed = ' OR '.join(f'new.{column} IS NOT old.{column}' for column in columns)
+        op.execute(f'CREATE TRIGGER {table}_touch_ai AFTER INSERT ON "{table}" BEGIN '
+                   f'UPDATE "{table}" SET created_at = {SQLITE_NOW}, updated_at = {SQLITE_NOW} '
+                   f'WHERE id = new.id; END')
+        op.execute(f'CREATE TRIGGER {table}_touch_au AFTER UPDATE OF {", ".join(columns)} ON "{table}" '
+                   f'WHEN {changed} BEGIN '
+                   f'UPDATE "{table}" SET updated_at = {SQLITE_NOW} WHERE id = new.id; END')
+        op.execute(f'CREATE TRIGGER {table}_tombstone_ad AFTER DELETE ON "{table}" BEGIN '
+                   f"INSERT INTO deleted_record (table_name, record_id, deleted_at) "
+                   f"VALUES ('{table}', old.id, {SQLITE_NOW}); END")
+
+
+def _sqlite_downgrade():
+    for table in TRACKED_COLUMNS:
+        for suffix in ('touch_ai', 'touch_au', 'tombstone_ad'):
+            op.execute(f'DROP TRIGGER IF EXISTS {table}_{suffix}')
+        op.drop_index(f'ix_{table}_updated_at', table_name=table)
+        # DROP COLUMN без пересоздания таблицы (SQLite 3.35+): пересоздание
+        # удалило бы триггеры поискового индекса
+        op.execute(f'ALTER TABLE "{table}" DROP COLUMN updated_at')
+        op.execute(f'ALTER TABLE "{table}" DROP COLUMN created_at')
+    op.drop_index('ix_deleted_record_deleted_at', table_name='deleted_record')
+    op.drop_table('deleted_record')
+
+
+def _postgresql_upgrade():
+    _create_tombstone_table(PG_NOW)
+    op.execute(
+        'CREATE FUNCTION record_tombstone() RETURNS trigger AS $$ BEGIN '
+        f'INSERT INTO deleted_record (table_name, record_id, deleted_at) VALUES (TG_TABLE_NAME, OLD.id, {PG_NOW}); '
+        'RETURN OLD; END $$ LANGUAGE plpgsql'
+    )
+    for table, columns in TRACKED_COLUMNS.items():
+        for column in ('created_at', 'updated_at'):
+            op.add_column(table, sa.Column(column, sa.DateTime(), nullable=False,
+                                           server_default=sa.text(PG_NOW)))
+        op.create_index(f'ix_{table}_updated_at', table, ['updated_at'], unique=False)
+
+        new_values = ', '.join(f'NEW.{column}' for column in columns)
+        old_values = ', '.join(f'OLD.{column}' for column in columns)
+        op.execute(
+            f'CREATE FUNCTION {table}_touch() RETURNS trigger AS $$ BEGIN '
+            f'IF ({new_values}) IS DISTINCT FROM ({old_values}) THEN NEW.updated_at := {PG_NOW}; END IF; '
+            f'RETURN NEW; END $$ LANGUAGE plpgsql'
+        )
+        op.execute(f'CREATE TRIGGER {table}_touch_bu BEFORE UPDATE ON "{table}" '
+                   f'FOR EACH ROW EXECUTE FUNCTION {table}_touch()')
+        op.execute(f'CREATE TRIGGER {table}_tombstone_ad AFTER DELETE ON "{table}" '
+                   f'FOR EACH ROW EXECUTE FUNCTION record_tombstone()')
+
+
+def _postgresql_downgrade():
+    for table in TRACKED_COLUMNS:
+        op.execute(f'DROP TRIGGER IF EXISTS {table}_touch_bu ON "{table}"')
+        op.execute(f'DROP TRIGGER IF EXISTS {table}_tombstone_ad ON "{table}"')
+        op.execute(f'DROP FUNCTION IF EXISTS {table}_touch()')
+        op.drop_index(f'ix_{table}_updated_at', table_name=table)
+        op.drop_column(table, 'updated_at')
+        op.drop_column(table, 'created_at')
+    op.execute('DROP FUNCTION IF EXISTS record_tombstone()')
+    op.drop_index('ix_deleted_record_deleted_at', table_name='deleted_record')
+    op.drop_table('deleted_record')
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        _sqlite_upgrade()
+    elif dialect == 'postgresql':
+        _postgresql_upgrade()
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        _sqlite_downgrade()
+    elif dialect == 'postgresql':
+        _postgresql_downgrade()
@@ -0,0 +1,70 @@
+"""Add ON DELETE CASCADE to group and student foreign keys
+
+Revision ID: e7c2a9f4b615
+Revises: d4b8e2f6a913
+Create Date: 2026-10-18 20:12:47.903114
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7c2a9f4b615'
+down_revision = 'd4b8e2f6a913'
+branch_labels = None
+depends_on = None
+
+
+# Удаление группы или факультета — один DELETE, дочерние строки удаляет СУБД.
+# таблица, столбец, таблица-родитель, имя ограничения в PostgreSQL (по умолчанию
+# для безымянных ограничений начальной миграции)
+FOREIGN_KEYS = [
+    ('group', 'faculty_id', 'faculty', 'group_faculty_id_fkey'),
+    ('student', 'group_id', 'group', 'student_group_id_fkey'),
+]
+
+# В SQLite внешние ключи безымянные; batch-режим именует отраженные ограничения
+# по этому шаблону, чтобы их можно было удалить
+SQLITE_NAMING_CONVENTION = {'fk': 'fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s'}
+
+
+def _sqlite_set_ondelete(ondelete):
+    # SQLite не изменяет ограничения: таблица пересоздается (batch-режим). Триггеры
+    # поиска и учета изменений при этом удаляются вместе со старой таблицей,
+    # поэтому они сохраняются заранее и создаются заново
+    bind = op.get_bind()
+    for table, column, referent, _ in FOREIGN_KEYS:
+        triggers = bind.exec_driver_sql(
+            "SELECT sql FROM sqlite_master WHERE type = 'trigger' AND tbl_name = ?", (table,)
+        ).scalars().all()
+        name = f'fk_{table}_{column}_{referent}'
+        with op.batch_alter_table(table, recreate='always',
+                                  naming_convention=SQLITE_NAMING_CONVENTION) as batch_op:
+            batch_op.drop_constraint(name, type_='foreignkey')
+            batch_op.create_foreign_key(name, referent, [column], ['id'], ondelete=ondelete)
+        for sql in triggers:
+            op.execute(sql)
+
+
+def _postgresql_set_ondelete(ondelete):
+    for table, column, referent, name in FOREIGN_KEYS:
+        op.drop_constraint(name, table, type_='foreignkey')
+        op.create_foreign_key(name, table, referent, [column], ['id'], ondelete=ondelete)
+
+
+def upgrade():
+    if op.get_bind().dialect.name == 'sqlite':
+        _sqlite_set_ondelete('CASCADE')
+    else:
+        _postgresql_set_ondelete('CASCADE')
+    # Проверка, не используются ли фотографии удаленных студентов другими студентами
+    op.create_index('ix_student_photo_filename', 'student', ['photo_filename'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_student_photo_filename', table_name='student')
+    if op.get_bind().dialect.name == 'sqlite':
+        _sqlite_set_ondelete(None)
+    else:
+        _postgresql_set_ondelete(None)
@@ -0,0 +1,29 @@
+"""Add job heartbeat
+
+Revision ID: f3a8c6d2b417
+Revises: e7c2a9f4b615
+Create Date: 2026-10-18 22:41:05.517320
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3a8c6d2b417'
+down_revision = 'e7c2a9f4b615'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Время последнего сигнала выполняемой задачи: по нему зависшие задачи
+    # возвращаются в очередь (раньше — по updated_at, который меняется только с прогрессом)
+    op.add_column('job', sa.Column('heartbeat_at', sa.DateTime(), nullable=True))
+    op.create_index('ix_job_status_heartbeat_at', 'job', ['status', 'heartbeat_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_job_status_heartbeat_at', table_name='job')
+    with op.batch_alter_table('job', schema=None) as batch_op:
+        batch_op.drop_column('heartbeat_at')
@@ -1,3 +1,5 @@
+# Сервер разработки Flask (один процесс, отладчик). В продакшене — serve.py или
+# gunicorn -c gunicorn.conf.py wsgi:app
 from app import create_app
 
 app = create_app()
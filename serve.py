@@ -0,0 +1,58 @@
+"""Запуск приложения в продакшене.
+
+На Linux/macOS — gunicorn с настройками из gunicorn.conf.py (несколько процессов,
+по несколько потоков в каждом), на Windows или без gunicorn — waitress (один
+процесс, пул потоков). Параметры командной строки переопределяют переменные
+окружения, которые читает gunicorn.conf.py.
+
+    python serve.py --port 8000 --workers 16 --threads 4
+"""
+import argparse
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def _has(module):
+    try:
+        __import__(module)
+    except ImportError:
+        return False
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default=os.environ.get('HOST', '0.0.0.0'))
+    parser.add_argument('--port', type=int, default=int(os.environ.get('PORT', 8000)))
+    parser.add_argument('--workers', type=int, help='процессов gunicorn (по умолчанию — по числу ядер)')
+    parser.add_argument('--threads', type=int, help='потоков на процесс')
+    parser.add_argument('--server', choices=('auto', 'gunicorn', 'waitress'), default='auto')
+    args = parser.parse_args()
+
+    server = args.server
+    if server == 'auto':
+        server = 'gunicorn' if os.name != 'nt' and _has('gunicorn') else 'waitress'
+
+    if server == 'gunicorn':
+        os.environ['BIND'] = f'{args.host}:{args.port}'
+        if args.workers:
+            os.environ['WEB_CONCURRENCY'] = str(args.workers)
+        if args.threads:
+            os.environ['GUNICORN_THREADS'] = str(args.threads)
+        os.chdir(ROOT)
+        # Процесс заменяется мастером gunicorn: сигналы (HUP, USR2, TERM) идут прямо ему
+        os.execv(sys.executable, [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app'])
+
+    from waitress import serve
+    sys.path.insert(0, ROOT)
+    from wsgi import app
+
+    threads = args.threads or int(os.environ.get('WAITRESS_THREADS', 8))
+    serve(app, host=args.host, port=args.port, threads=threads,
+          channel_timeout=int(os.environ.get('WAITRESS_CHANNEL_TIMEOUT', 120)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+import os
+
+import pytest
+from flask_migrate import upgrade
+
+from app import create_app, db
+from app.seed import seed_database
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+# Объем тестовых данных: факультетов, групп на факультет, студентов
+SEED_SIZE = (3, 5, 300)
+
+
+@pytest.fixture(scope='module')
+def app(tmp_path_factory):
+    # Временная SQLite-база со схемой из миграций (триггеры поиска и учета изменений)
+    # и данными flask seed; одна база на модуль тестов
+    tmp = tmp_path_factory.mktemp('app')
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp / "test.sqlite3"}',
+        'UPLOAD_FOLDER': str(tmp / 'uploads'),
+        'JOBS_FOLDER': str(tmp / 'jobs'),
+        'JOBS_EAGER': True,
+        'CACHE_TYPE': 'null',
+        'INSTRUMENTATION_ENABLED': True,
+        'JINJA_BYTECODE_CACHE': False,
+        'COMPRESS_ENABLED': False,
+        'LOG_LEVEL': 'ERROR',
+    })
+    with app.app_context():
+        upgrade(directory=os.path.join(ROOT, 'migrations'))
+        seed_database(*SEED_SIZE)
+        db.session.remove()
+    yield app
+    with app.app_context():
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
@@ -0,0 +1,23 @@
+from app import db
+from app.academic import compute_course, compute_status, current_academic_year
+from app.models import Group
+
+
+def _groups(app):
+    with app.app_context():
+        groups = db.session.query(Group.year, Group.duration, Group.course, Group.status).all()
+        db.session.remove()
+    return groups
+
+
+def test_rollover_year_option(app, client):
+    with app.app_context():
+        academic_year = current_academic_year() + 2
+    result = app.test_cli_runner().invoke(args=['rollover', '--year', str(academic_year)])
+    assert result.exit_code == 0, result.output
+    # Запросы не пересчитывают группы (ACADEMIC_AUTO_ROLLOVER выключен по умолчанию)
+    assert client.get('/faculties/').status_code == 200
+    for year, duration, course, status in _groups(app):
+        assert course == compute_course(year, duration, academic_year)
+        assert status == compute_status(year, duration, academic_year)
+    app.test_cli_runner().invoke(args=['rollover'])
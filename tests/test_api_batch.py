@@ -0,0 +1,62 @@
+import datetime
+
+from sqlalchemy import event, insert
+
+from app import db
+from app.models import Student
+
+BATCH_URL = '/api/v1/students/batch'
+
+
+def _students(app, count):
+    with app.app_context():
+        students = db.session.query(Student.id, Student.email, Student.group_id) \
+            .order_by(Student.id.desc()).limit(count).all()
+        db.session.remove()
+    return students
+
+
+def test_delete_and_take_email_in_one_batch(app, client):
+    # Email удаляемого студента A занимает студент B того же пакета
+    student_a, student_b = _students(app, 2)
+    response = client.post(BATCH_URL, json={
+        'delete': [student_a.id],
+        'update': [{'id': student_b.id, 'email': student_a.email}],
+    })
+    assert response.status_code == 200
+    assert response.get_json() == {'created': [], 'updated': [student_b.id], 'deleted': [student_a.id]}
+    with app.app_context():
+        assert db.session.get(Student, student_a.id) is None
+        assert db.session.get(Student, student_b.id).email == student_a.email
+
+
+def test_conflict_on_commit_returns_409(app, client):
+    # Email занимает параллельная запись уже после проверки пакета: ответ 409,
+    # ни одна операция пакета не применяется
+    (student,) = _students(app, 1)
+    email = 'batch-conflict@example.com'
+    new_student = {'full_name': 'Конфликт Тест', 'date_of_birth': '2005-01-01',
+                   'phone_number': '+7 900 000-00-00', 'email': email, 'group_id': student.group_id}
+
+    inserted = []
+
+    def concurrent_insert(session, flush_context, instances):
+        if not inserted:
+            inserted.append(True)
+            session.connection().execute(insert(Student.__table__).values(
+                dict(new_student, full_name='Другой Студент', date_of_birth=datetime.date(2005, 1, 1))))
+
+    with app.app_context():
+        event.listen(db.session, 'before_flush', concurrent_insert)
+        try:
+            response = client.post(BATCH_URL, json={
+                'create': [new_student],
+                'update': [{'id': student.id, 'phone_number': '+7 999 999-99-99'}],
+            })
+        finally:
+            event.remove(db.session, 'before_flush', concurrent_insert)
+    assert inserted
+    assert response.status_code == 409
+    with app.app_context():
+        assert db.session.query(Student).filter_by(email=email).count() == 0
+        assert db.session.get(Student, student.id).phone_number != '+7 999 999-99-99'
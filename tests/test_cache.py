@@ -0,0 +1,11 @@
+import pytest
+
+from app.cache import ResponseCache
+
+
+def test_memory_cache_refused_with_several_workers(app, monkeypatch):
+    monkeypatch.setenv('WEB_CONCURRENCY', '4')
+    app.config['CACHE_TYPE'] = 'memory'
+    with pytest.raises(ValueError):
+        ResponseCache().init_app(app)
+
@@ -0,0 +1,95 @@
+import datetime
+
+import pytest
+from sqlalchemy import func
+
+from app import db
+from app.models import Faculty, Group, Student
+
+
+def _assert_counters_match():
+    # Сохраненные счетчики совпадают с подсчетом по данным
+    group_counts = dict(db.session.query(Student.group_id, func.count(Student.id)).group_by(Student.group_id))
+    for group_id, num_students in db.session.query(Group.id, Group.num_students):
+        assert num_students == group_counts.get(group_id, 0), f'группа {group_id}'
+    faculty_groups = dict(db.session.query(Group.faculty_id, func.count(Group.id)).group_by(Group.faculty_id))
+    faculty_students = dict(db.session.query(Group.faculty_id, func.count(Student.id))
+                            .join(Student, Student.group_id == Group.id).group_by(Group.faculty_id))
+    for faculty_id, num_groups, num_students in db.session.query(Faculty.id, Faculty.num_groups,
+                                                                 Faculty.num_students):
+        assert num_groups == faculty_groups.get(faculty_id, 0), f'факультет {faculty_id}'
+        assert num_students == faculty_students.get(faculty_id, 0), f'факультет {faculty_id}'
+
+
+@pytest.fixture
+def session(app):
+    with app.app_context():
+        yield db.session
+        db.session.remove()
+
+
+def _two_groups_of_different_faculties(session):
+    first = session.query(Group).order_by(Group.id).first()
+    second = session.query(Group).filter(Group.faculty_id != first.faculty_id).order_by(Group.id).first()
+    return first, second
+
+
+def test_student_changes(session):
+    first, second = _two_groups_of_different_faculties(session)
+    student = Student(full_name='Счетчик Тест', date_of_birth=datetime.date(2005, 1, 1),
+                      phone_number='+7 900 000-00-00', email='counter@example.com', group_id=first.id)
+    session.add(student)
+    session.commit()
+    _assert_counters_match()
+
+    student.group_id = second.id
+    session.commit()
+    _assert_counters_match()
+
+    student.group = first
+    session.commit()
+    _assert_counters_match()
+
+    session.delete(student)
+    session.commit()
+    _assert_counters_match()
+
+
+def test_group_changes(session):
+    first, second = _two_groups_of_different_faculties(session)
+    group = Group(name='СЧТ-1-25', year=2025, duration=4, course=1, status='Учится', faculty_id=first.faculty_id)
+    session.add(group)
+    session.flush()
+    session.add(Student(full_name='Счетчик Группы', date_of_birth=datetime.date(2005, 1, 1),
+                        phone_number='+7 900 000-00-00', email='counter-group@example.com', group_id=group.id))
+    session.commit()
+    _assert_counters_match()
+
+    group.faculty_id = second.faculty_id
+    session.commit()
+    _assert_counters_match()
+
+    session.delete(group)
+    session.commit()
+    _assert_counters_match()
+
+
+def test_insert_does_not_count_rows(app, session):
+    # Добавление студента меняет счетчики на 1 и не пересчитывает COUNT(*) по факультету
+    (group,) = _two_groups_of_different_faculties(session)[:1]
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    from sqlalchemy import event
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        session.add(Student(full_name='Счетчик Вставка', date_of_birth=datetime.date(2005, 1, 1),
+                            phone_number='+7 900 000-00-00', email='counter-insert@example.com',
+                            group_id=group.id))
+        session.flush()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+    session.rollback()
+    assert not any('count(' in statement.lower() for statement in statements)
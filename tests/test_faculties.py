@@ -0,0 +1,35 @@
+from app import db
+from app.models import Faculty, Group
+
+
+def _group(faculty, name):
+    return Group(name=name, year=2025, duration=4, course=1, status='Учится', faculty=faculty)
+
+
+def test_rename_short_name_renames_only_own_groups(app, client):
+    with app.app_context():
+        faculty = Faculty(name='Тестовый факультет', short_name='ТСТ')
+        db.session.add_all([
+            faculty,
+            _group(faculty, 'ТСТ-1-25'),
+            _group(faculty, 'ТСТ-2-25'),
+            _group(faculty, 'ТСТМ-1-25'),  # другое сокращение с тем же началом
+            _group(faculty, 'ТСТ-М-25'),  # не по шаблону <сокращение>-<номер>-<год>
+            _group(faculty, 'НОВ-2-25'),  # новое имя группы ТСТ-2-25 уже занято
+        ])
+        db.session.commit()
+        faculty_id = faculty.id
+        db.session.remove()
+
+    response = client.post(f'/faculties/{faculty_id}/edit', data={
+        'name': 'Тестовый факультет', 'short_name': 'НОВ', 'description': '',
+    }, follow_redirects=True)
+    assert response.status_code == 200
+    page = response.get_data(as_text=True)
+    assert 'Переименовано групп с новым сокращением &#34;НОВ&#34;: 1.' in page
+    assert 'ТСТ-2-25' in page  # пропущенная группа названа в сообщении
+
+    with app.app_context():
+        names = sorted(name for name, in db.session.query(Group.name).filter(Group.faculty_id == faculty_id))
+        db.session.remove()
+    assert names == ['НОВ-1-25', 'НОВ-2-25', 'ТСТ-2-25', 'ТСТ-М-25', 'ТСТМ-1-25']
@@ -0,0 +1,16 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from app import db
+
+
+def test_failed_statement_does_not_leave_timing_entry(app):
+    with app.test_request_context('/'):
+        app.preprocess_request()
+        connection = db.session.connection()
+        with pytest.raises(OperationalError):
+            connection.execute(text('SELECT * FROM missing_table'))
+        assert not connection.info.get('_query_started')
+        db.session.rollback()
+        db.session.remove()
@@ -0,0 +1,50 @@
+import datetime
+import io
+
+from sqlalchemy import insert, select
+
+from app import db, jobs
+from app.importer import import_workbook
+from app.models import Job
+
+job_table = Job.__table__
+
+
+def _running_job(job_id, started, heartbeat):
+    db.session.execute(insert(job_table).values(
+        id=job_id, kind='thumbnails', status=jobs.JOB_RUNNING, params={'folder': '', 'name': ''},
+        created_at=started, started_at=started, updated_at=started, heartbeat_at=heartbeat,
+    ))
+    db.session.commit()
+
+
+def test_resume_requeues_only_jobs_without_heartbeat(app, monkeypatch):
+    submitted = []
+    monkeypatch.setattr(jobs, '_resumed', False)
+    monkeypatch.setattr(jobs, '_submit', lambda app, job_id: submitted.append(job_id))
+    now = datetime.datetime.utcnow()
+    long_ago = now - datetime.timedelta(hours=2)
+    with app.app_context():
+        # Долгая задача, процесс которой жив (свежий heartbeat), и задача остановленного процесса
+        _running_job('alive', long_ago, now)
+        _running_job('stale', long_ago, long_ago)
+        jobs.resume_jobs(app)
+        statuses = dict(db.session.execute(select(job_table.c.id, job_table.c.status)).all())
+        db.session.remove()
+    assert statuses['alive'] == jobs.JOB_RUNNING
+    assert statuses['stale'] == jobs.JOB_QUEUED
+    assert submitted == ['stale']
+
+
+def test_import_reports_progress_per_batch(app, client):
+    response = client.get('/data/export/excel')
+    job_id = response.headers['Location'].rsplit('/', 1)[1]
+    workbook = client.get(f'/jobs/{job_id}/result').data
+    calls = []
+    with app.app_context():
+        import_workbook(io.BytesIO(workbook), batch_size=100, progress=lambda done, total: calls.append((done, total)))
+        db.session.remove()
+    total = calls[-1][1]
+    assert len(calls) > 3
+    assert calls[-1] == (total, total)
+    assert [done for done, _ in calls] == sorted(done for done, _ in calls)
@@ -0,0 +1,51 @@
+import pytest
+
+from app import db
+from app.instrumentation import query_count
+from app.models import Group, Student
+
+# Число SQL-запросов на страницу (защита от N+1 и неявных загрузок). Коллекции
+# Faculty.groups и Group.students объявлены с lazy='raise': обращение к ним в
+# представлении или шаблоне дает ошибку, поэтому здесь открываются все списки и
+# карточки. Страница -> (URL по id факультета, группы и студента, наибольшее число запросов)
+QUERY_BUDGETS = {
+    'faculties.list_faculties': (lambda f, g, s: '/faculties/', 1),
+    'faculties.edit_faculty': (lambda f, g, s: f'/faculties/{f}/edit', 1),
+    'faculty_groups.list_groups': (lambda f, g, s: f'/faculties/{f}/groups/', 2),
+    'faculty_groups.create_group': (lambda f, g, s: f'/faculties/{f}/groups/create', 1),
+    'groups.edit_group': (lambda f, g, s: f'/groups/{g}/edit', 1),
+    'group_students.list_students_in_group': (lambda f, g, s: f'/groups/{g}/students/', 3),
+    'group_students.create_student_in_group': (lambda f, g, s: f'/groups/{g}/students/create', 1),
+    'group_students.merge_group': (lambda f, g, s: f'/groups/{g}/students/merge', 2),
+    'students.view_student_card': (lambda f, g, s: f'/students/{s}/view_card', 1),
+    'students.edit_student': (lambda f, g, s: f'/students/{s}/edit', 1),
+    'main.search': (lambda f, g, s: '/search?q=иванов', 6),
+    'api.list_faculties': (lambda f, g, s: '/api/v1/faculties', 2),
+    'api.get_faculty': (lambda f, g, s: f'/api/v1/faculties/{f}', 1),
+    'api.list_groups': (lambda f, g, s: f'/api/v1/groups?faculty_id={f}', 2),
+    'api.get_group': (lambda f, g, s: f'/api/v1/groups/{g}', 1),
+    'api.list_students': (lambda f, g, s: f'/api/v1/students?group_id={g}', 2),
+    'api.get_student': (lambda f, g, s: f'/api/v1/students/{s}', 1),
+    'api.global_search': (lambda f, g, s: '/api/v1/search?q=иванов', 6),
+}
+
+
+@pytest.fixture(scope='module')
+def ids(app):
+    # id факультета, группы и студента, на страницах которых считаются запросы
+    with app.app_context():
+        student = db.session.query(Student.id, Student.group_id).order_by(Student.id).first()
+        faculty_id = db.session.query(Group.faculty_id).filter(Group.id == student.group_id).scalar()
+        db.session.remove()
+    return faculty_id, student.group_id, student.id
+
+
+@pytest.mark.parametrize('endpoint', QUERY_BUDGETS)
+def test_query_budget(client, ids, endpoint):
+    make_url, budget = QUERY_BUDGETS[endpoint]
+    client.get('/')  # первый запрос процесса подбирает фоновые задачи
+    response = client.get(make_url(*ids))
+    assert response.status_code == 200
+    count = query_count(response)
+    assert count is not None
+    assert count <= budget, f'{endpoint}: {count} SQL-запросов при бюджете {budget}'
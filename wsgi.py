@@ -0,0 +1,10 @@
+# Точка входа WSGI для продакшена: gunicorn -c gunicorn.conf.py wsgi:app,
+# waitress-serve wsgi:app или python serve.py
+import os
+
+from app import create_app
+
+# Несколько рабочих процессов: кеш страниц по умолчанию общий (filesystem), иначе
+# запись в одном процессе не сбрасывала бы кеш остальных. CACHE_TYPE=redis — для
+# нескольких машин
+app = create_app({'CACHE_TYPE': os.environ.get('CACHE_TYPE') or 'filesystem'})